@@ -1,7 +1,9 @@
 from flask import Blueprint, request, jsonify
-from database import get_db_connection
+from database import get_db
 from middleware import require_admin
 from utils import dict_from_row
+import query_trace
+from config import Config
 
 admin_bp = Blueprint('admin', __name__)
 
@@ -9,7 +11,7 @@ admin_bp = Blueprint('admin', __name__)
 @require_admin
 def get_students():
     """Get all students (Admin only)"""
-    conn = get_db_connection()
+    conn = get_db()
     cursor = conn.cursor()
 
     cursor.execute('''
@@ -20,7 +22,6 @@ def get_students():
     ''')
 
     students = cursor.fetchall()
-    conn.close()
 
     return jsonify({
         "success": True,
@@ -36,7 +37,7 @@ def get_job_applications():
     if not job_id:
         return jsonify({"success": False, "error": "Missing job_id parameter"}), 400
 
-    conn = get_db_connection()
+    conn = get_db()
     cursor = conn.cursor()
 
     cursor.execute('''
@@ -48,7 +49,6 @@ def get_job_applications():
     ''', (job_id,))
 
     applications = cursor.fetchall()
-    conn.close()
 
     return jsonify({
         "success": True,
@@ -59,7 +59,7 @@ def get_job_applications():
 @require_admin
 def get_flagged_exams():
     """Get exams flagged for review (Admin only)"""
-    conn = get_db_connection()
+    conn = get_db()
     cursor = conn.cursor()
 
     cursor.execute('''
@@ -72,7 +72,6 @@ def get_flagged_exams():
     ''')
 
     flagged = cursor.fetchall()
-    conn.close()
 
     return jsonify({
         "success": True,
@@ -83,7 +82,7 @@ def get_flagged_exams():
 @require_admin
 def get_exam_results(exam_id):
     """Get results for all students in an exam (Admin only)"""
-    conn = get_db_connection()
+    conn = get_db()
     cursor = conn.cursor()
 
     cursor.execute('''
@@ -96,7 +95,6 @@ def get_exam_results(exam_id):
     ''', (exam_id,))
 
     results = cursor.fetchall()
-    conn.close()
 
     return jsonify({
         "success": True,
@@ -107,7 +105,7 @@ def get_exam_results(exam_id):
 @require_admin
 def get_student_details(student_id):
     """Get detailed student information (Admin only)"""
-    conn = get_db_connection()
+    conn = get_db()
     cursor = conn.cursor()
 
     # Get student info
@@ -115,7 +113,6 @@ def get_student_details(student_id):
     student = cursor.fetchone()
 
     if not student:
-        conn.close()
         return jsonify({"success": False, "error": "Student not found"}), 404
 
     # Get enrolled courses
@@ -146,8 +143,6 @@ def get_student_details(student_id):
     ''', (student_id,))
     exams = cursor.fetchall()
 
-    conn.close()
-
     return jsonify({
         "success": True,
         "student": dict_from_row(student),
@@ -155,3 +150,101 @@ def get_student_details(student_id):
         "applications": [dict_from_row(a) for a in applications],
         "exams": [dict_from_row(e) for e in exams]
     }), 200
+
+@admin_bp.route('/sql-stats', methods=['GET'])
+@require_admin
+def get_sql_stats():
+    """Get the top SQL statements by total time (Admin only)"""
+    order_by = request.args.get('order_by', 'total_ms')
+    if order_by not in ['total_ms', 'calls', 'avg_ms', 'max_ms', 'rows']:
+        return jsonify({"success": False, "error": "Invalid order_by"}), 400
+
+    try:
+        limit = int(request.args.get('limit', 20))
+    except ValueError:
+        return jsonify({"success": False, "error": "Invalid limit"}), 400
+
+    return jsonify({
+        "success": True,
+        "statements": query_trace.top_statements(limit, order_by)
+    }), 200
+
+@admin_bp.route('/sql-stats', methods=['DELETE'])
+@require_admin
+def reset_sql_stats():
+    """Reset collected SQL statement stats (Admin only)"""
+    query_trace.reset_stats()
+    return jsonify({"success": True, "message": "SQL stats reset"}), 200
+
+@admin_bp.route('/exam-cache', methods=['GET'])
+@require_admin
+def get_exam_cache_stats():
+    """Get exam paper cache hit/miss counters (Admin only)"""
+    if 'exams' not in Config.ENABLED_BLUEPRINTS:
+        return jsonify({"success": False, "error": "Exams are not served by this process"}), 404
+
+    # Imported here so admin-only processes don't start the exam services
+    from exams import exam_papers
+
+    return jsonify({
+        "success": True,
+        "exam_cache": exam_papers.stats()
+    }), 200
+
+@admin_bp.route('/autosave', methods=['GET'])
+@require_admin
+def get_autosave_stats():
+    """Get answer autosave buffer counters (Admin only)"""
+    if 'exams' not in Config.ENABLED_BLUEPRINTS:
+        return jsonify({"success": False, "error": "Exams are not served by this process"}), 404
+
+    from autosave import answer_buffer
+
+    return jsonify({
+        "success": True,
+        "autosave": answer_buffer.stats()
+    }), 200
+
+@admin_bp.route('/judge', methods=['GET'])
+@require_admin
+def get_judge_stats():
+    """Get automatic judge queue and counters (Admin only)"""
+    if 'exams' not in Config.ENABLED_BLUEPRINTS:
+        return jsonify({"success": False, "error": "Exams are not served by this process"}), 404
+
+    from judge import judge_service
+
+    return jsonify({
+        "success": True,
+        "judge": judge_service.stats()
+    }), 200
+
+@admin_bp.route('/proctoring', methods=['GET'])
+@require_admin
+def get_proctoring_stats():
+    """Get per-stage frame analysis latency and queue depth (Admin only)"""
+    if 'proctoring' not in Config.ENABLED_BLUEPRINTS:
+        return jsonify({"success": False, "error": "Proctoring is not served by this process"}), 404
+
+    # Imported here so admin-only processes don't load OpenCV
+    from proctoring import frame_pipeline, frame_queue, cascade_stats, readiness
+    from session_state import proctoring_sessions
+    from frame_dedupe import frame_deduper
+    from proctoring_risk import risk_stats
+    from evidence_store import evidence_store
+    from violation_ledger import violation_ledger
+    from proctoring_events import proctoring_events
+
+    return jsonify({
+        "success": True,
+        "pipeline": frame_pipeline.stats.snapshot(),
+        "queue": frame_queue.stats(),
+        "cascade": cascade_stats(),
+        "dedupe": frame_deduper.stats(),
+        "capture": risk_stats(),
+        "evidence": evidence_store.stats(),
+        "violations": violation_ledger.stats(),
+        "stream": proctoring_events.stats(),
+        "sessions": proctoring_sessions.stats(),
+        "readiness": readiness()
+    }), 200
@@ -1,18 +1,25 @@
 from flask import Flask, session
 from flask_cors import CORS
 from flask_session import Session
+import importlib
 import os
+import threading
 
 # Import configuration
 from config import Config
+import database
+import query_trace
 
-# Import blueprints
-from auth import auth_bp
-from students import students_bp
-from jobs import jobs_bp
-from exams import exams_bp
-from proctoring import proctoring_bp
-from admin import admin_bp
+# Blueprints by name: (module, blueprint, url prefix). Only the modules named
+# in Config.ENABLED_BLUEPRINTS are imported.
+BLUEPRINTS = {
+    'auth': ('auth', 'auth_bp', '/api/auth'),
+    'students': ('students', 'students_bp', '/api/student'),
+    'jobs': ('jobs', 'jobs_bp', '/api/jobs'),
+    'exams': ('exams', 'exams_bp', '/api/exams'),
+    'proctoring': ('proctoring', 'proctoring_bp', '/api/proctoring'),
+    'admin': ('admin', 'admin_bp', '/api/admin')
+}
 
 app = Flask(__name__)
 
@@ -20,19 +27,55 @@ app = Flask(__name__)
 Config.init_app(app)
 
 # Configure CORS for frontend (allow file:// origin and localhost)
-CORS(app, supports_credentials=True, origins=["*"], allow_headers=["Content-Type"], expose_headers=["*"])
+# Raw frame uploads send their attempt and token in headers; cache the preflight
+CORS(app, supports_credentials=True, origins=["*"],
+     allow_headers=["Content-Type", "X-Student-Exam-Id", "X-Frame-Token"], expose_headers=["*"], max_age=3600)
+
+# Return pooled database connections at the end of each request
+database.init_app(app)
+
+# Per-request SQL totals, statement stats and slow-query log
+query_trace.init_app(app)
 
 # Configure server-side sessions
 app.config['SESSION_TYPE'] = 'filesystem'
 Session(app)
 
 # Register blueprints
-app.register_blueprint(auth_bp, url_prefix='/api/auth')
-app.register_blueprint(students_bp, url_prefix='/api/student')
-app.register_blueprint(jobs_bp, url_prefix='/api/jobs')
-app.register_blueprint(exams_bp, url_prefix='/api/exams')
-app.register_blueprint(proctoring_bp, url_prefix='/api/proctoring')
-app.register_blueprint(admin_bp, url_prefix='/api/admin')
+for name in Config.ENABLED_BLUEPRINTS:
+    if name not in BLUEPRINTS:
+        raise ValueError(f"Unknown blueprint in ENABLED_BLUEPRINTS: {name}")
+    module_name, blueprint_name, url_prefix = BLUEPRINTS[name]
+    app.register_blueprint(getattr(importlib.import_module(module_name), blueprint_name), url_prefix=url_prefix)
+
+_warm_up_lock = threading.Lock()
+_warmed_up = False
+
+def warm_up():
+    """
+    Load what this process's blueprints need ahead of the first request
+    Runs once per serving process; later calls do nothing. Call it from a
+    WSGI server's post-fork hook, or let the first request call it.
+    """
+    global _warmed_up
+    with _warm_up_lock:
+        if _warmed_up:
+            return
+        _warmed_up = True
+
+    if 'proctoring' in Config.ENABLED_BLUEPRINTS:
+        importlib.import_module('proctoring').warm_up()
+
+@app.before_request
+def warm_up_on_first_request():
+    """
+    With MODEL_WARMUP, start warming up on the first request a process serves
+    Importing the app loads nothing, so tools, benchmarks and the debug
+    reloader's watcher stay light. The readiness probe is usually that first
+    request; warm_up() doesn't block, so the probe answers 503 until done.
+    """
+    if Config.MODEL_WARMUP and not _warmed_up:
+        warm_up()
 
 @app.route('/')
 def index():
@@ -50,6 +93,20 @@ def health_check():
         "service": "SkillSpark Pro API"
     }, 200
 
+@app.route('/api/ready', methods=['GET'])
+def readiness_check():
+    """Readiness probe: 503 until models being warmed up have loaded"""
+    checks = {}
+    if 'proctoring' in Config.ENABLED_BLUEPRINTS:
+        checks['proctoring'] = importlib.import_module('proctoring').readiness()
+
+    ready = all(check['ready'] for check in checks.values())
+    return {
+        "status": "ready" if ready else "starting",
+        "blueprints": Config.ENABLED_BLUEPRINTS,
+        "checks": checks
+    }, 200 if ready else 503
+
 if __name__ == '__main__':
     # Ensure proctoring images directory exists
     proctoring_dir = os.path.join(os.path.dirname(__file__), 'proctoring_images')
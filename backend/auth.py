@@ -1,6 +1,6 @@
 from flask import Blueprint, request, jsonify, session
 from werkzeug.security import generate_password_hash, check_password_hash
-from database import get_db_connection
+from database import get_db
 from utils import validate_usn, validate_email, validate_cgpa, dict_from_row
 
 auth_bp = Blueprint('auth', __name__)
@@ -36,7 +36,7 @@ def register():
     if data['year'] not in [1, 2, 3, 4]:
         return jsonify({"success": False, "error": "Year must be 1, 2, 3, or 4"}), 400
 
-    conn = get_db_connection()
+    conn = get_db()
     cursor = conn.cursor()
 
     # Check if first user (for admin flag support)
@@ -51,13 +51,11 @@ def register():
     # Check if USN already exists
     cursor.execute("SELECT id FROM users WHERE usn=?", (data['usn'],))
     if cursor.fetchone():
-        conn.close()
         return jsonify({"success": False, "error": "USN already exists"}), 400
 
     # Check if email already exists
     cursor.execute("SELECT id FROM users WHERE email=?", (data['email'],))
     if cursor.fetchone():
-        conn.close()
         return jsonify({"success": False, "error": "Email already exists"}), 400
 
     # Hash password
@@ -89,8 +87,6 @@ def register():
         cursor.execute("SELECT * FROM users WHERE id=?", (user_id,))
         user = dict_from_row(cursor.fetchone())
 
-        conn.close()
-
         # Create session
         session['user_id'] = user['id']
         session['role'] = user['role']
@@ -110,7 +106,6 @@ def register():
         }), 201
 
     except Exception as e:
-        conn.close()
         return jsonify({"success": False, "error": str(e)}), 500
 
 @auth_bp.route('/login', methods=['POST'])
@@ -121,13 +116,12 @@ def login():
     if 'usn' not in data or 'password' not in data:
         return jsonify({"success": False, "error": "Missing USN or password"}), 400
 
-    conn = get_db_connection()
+    conn = get_db()
     cursor = conn.cursor()
 
     # Find user by USN
     cursor.execute("SELECT * FROM users WHERE usn=?", (data['usn'],))
     user = cursor.fetchone()
-    conn.close()
 
     if not user:
         return jsonify({"success": False, "error": "Invalid credentials"}), 401
@@ -0,0 +1,156 @@
+"""
+Write-behind buffer for incremental answer autosave.
+
+Autosave requests only touch memory; a background thread upserts the
+buffered answers into student_answers in batches, every
+AUTOSAVE_FLUSH_INTERVAL seconds or as soon as AUTOSAVE_FLUSH_THRESHOLD
+answers are pending. Final submit takes an attempt's pending answers
+directly, including answers a concurrent flush is still writing, so
+nothing buffered is needed after an attempt is sealed.
+"""
+import atexit
+import sqlite3
+import threading
+from config import Config
+from database import get_pool, immediate_transaction
+
+# Upsert that silently drops answers for attempts no longer in progress,
+# so a late flush can never overwrite a sealed (graded) answer sheet
+UPSERT_ANSWER_SQL = '''
+    INSERT INTO student_answers (student_exam_id, question_id, answer_type, answer_value)
+    SELECT ?, ?, ?, ?
+    WHERE (SELECT status FROM student_exams WHERE id=?) = 'in_progress'
+    ON CONFLICT(student_exam_id, question_id) DO UPDATE SET
+        answer_type=excluded.answer_type,
+        answer_value=excluded.answer_value
+'''
+
+class AnswerBuffer:
+    """In-memory latest-answer-per-question buffer with batched flushing"""
+
+    def __init__(self, flush_interval, flush_threshold):
+        self.flush_interval = flush_interval
+        self.flush_threshold = flush_threshold
+        self._pending = {}  # student_exam_id -> {question_id: (answer_type, answer_value)}
+        self._in_flight = {}  # the same, for answers being written by flush()
+        self._count = 0
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self.flushed = 0
+        self.flushes = 0
+
+    def add(self, student_exam_id, answers):
+        """Buffer changed answers for an attempt; later values replace earlier ones"""
+        with self._lock:
+            attempt = self._pending.setdefault(student_exam_id, {})
+            for answer in answers:
+                if answer['question_id'] not in attempt:
+                    self._count += 1
+                attempt[answer['question_id']] = (answer['answer_type'], answer['answer_value'])
+
+            if self._thread is None:
+                # Started on first use so processes that never autosave stay thread-free
+                self._thread = threading.Thread(target=self._run, name='autosave-flush', daemon=True)
+                self._thread.start()
+
+            if self._count >= self.flush_threshold:
+                self._wakeup.set()
+
+    def take(self, student_exam_id):
+        """
+        Remove and return an attempt's pending answers as {question_id: (answer_type, answer_value)}
+        Answers a flush is still writing are included: once the attempt is
+        sealed that flush skips them
+        """
+        with self._lock:
+            pending = self._pending.pop(student_exam_id, {})
+            self._count -= len(pending)
+            attempt = dict(self._in_flight.get(student_exam_id, {}))
+            attempt.update(pending)
+            return attempt
+
+    def peek(self, student_exam_id):
+        """An attempt's answers not yet written, without taking them"""
+        with self._lock:
+            attempt = dict(self._in_flight.get(student_exam_id, {}))
+            attempt.update(self._pending.get(student_exam_id, {}))
+            return attempt
+
+    def restore(self, student_exam_id, attempt):
+        """Put back answers taken by take() without clobbering newer ones"""
+        if not attempt:
+            return
+        with self._lock:
+            current = self._pending.setdefault(student_exam_id, {})
+            for question_id, value in attempt.items():
+                if question_id not in current:
+                    current[question_id] = value
+                    self._count += 1
+
+    def pending_count(self):
+        """Number of answers waiting to be flushed"""
+        with self._lock:
+            return self._count
+
+    def flush(self):
+        """Write every pending answer in one transaction; returns rows written"""
+        with self._flush_lock:
+            with self._lock:
+                pending = self._pending
+                self._pending = {}
+                self._count = 0
+                # Still visible to take() until committed
+                self._in_flight = pending
+
+            rows = [
+                (student_exam_id, question_id, answer_type, answer_value, student_exam_id)
+                for student_exam_id, attempt in pending.items()
+                for question_id, (answer_type, answer_value) in attempt.items()
+            ]
+            if not rows:
+                return 0
+
+            pool = get_pool()
+            conn = pool.acquire()
+            try:
+                with immediate_transaction(conn):
+                    conn.executemany(UPSERT_ANSWER_SQL, rows)
+            except sqlite3.Error:
+                # Keep the answers for the next attempt
+                for student_exam_id, attempt in pending.items():
+                    self.restore(student_exam_id, attempt)
+                raise
+            finally:
+                pool.release(conn)
+                with self._lock:
+                    self._in_flight = {}
+
+            self.flushes += 1
+            self.flushed += len(rows)
+            return len(rows)
+
+    def stats(self):
+        """Returns buffer and flush counters"""
+        return {
+            "pending": self.pending_count(),
+            "flushes": self.flushes,
+            "flushed_answers": self.flushed,
+            "flush_interval": self.flush_interval,
+            "flush_threshold": self.flush_threshold
+        }
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"Warning: autosave flush failed: {e}")
+
+answer_buffer = AnswerBuffer(Config.AUTOSAVE_FLUSH_INTERVAL, Config.AUTOSAVE_FLUSH_THRESHOLD)
+
+# Don't lose buffered answers on a clean shutdown
+atexit.register(answer_buffer.flush)
@@ -0,0 +1,144 @@
+"""
+Benchmark: per-call sqlite3.connect (legacy) vs pooled WAL connections.
+
+Simulates exam-day handler traffic: many threads each running short
+request-sized units of work (ownership check, proctoring log insert,
+counter update) against a scratch database.
+
+Usage: python backend/bench_database.py [--threads 16] [--requests 500] [--write-ratio 0.3]
+"""
+import argparse
+import os
+import random
+import sqlite3
+import statistics
+import tempfile
+import threading
+import time
+
+import database
+
+
+def legacy_connection():
+    """Connection exactly as get_db_connection used to open it"""
+    conn = sqlite3.connect(database.DB_PATH)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+
+def seed(student_exam_count):
+    """Create the schema and a batch of in-progress attempts"""
+    database.init_database()
+    conn = database.get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute('''
+        INSERT INTO exams (title, exam_type, duration_minutes, total_marks, passing_marks, status)
+        VALUES ('Benchmark Exam', 'mcq', 60, 100, 40, 'published')
+    ''')
+    exam_id = cursor.lastrowid
+    cursor.executemany('''
+        INSERT INTO student_exams (exam_id, student_id, status, start_time)
+        VALUES (?, ?, 'in_progress', CURRENT_TIMESTAMP)
+    ''', [(exam_id, i + 1) for i in range(student_exam_count)])
+    conn.commit()
+    conn.close()
+
+
+def unit_of_work(conn, student_exam_id, write):
+    """One handler-sized request"""
+    cursor = conn.cursor()
+    cursor.execute("SELECT * FROM student_exams WHERE id=?", (student_exam_id,))
+    cursor.fetchone()
+    if write:
+        cursor.execute('''
+            INSERT INTO proctoring_logs (student_exam_id, violation_type, severity, details)
+            VALUES (?, 'tab_switch', 'medium', '{}')
+        ''', (student_exam_id,))
+        cursor.execute('''
+            UPDATE student_exams SET violation_count = violation_count + 1 WHERE id=?
+        ''', (student_exam_id,))
+        conn.commit()
+
+
+def run(mode, threads, requests, write_ratio, student_exam_count):
+    """Run the workload in one mode and return latency samples"""
+    pool = database.get_pool() if mode == 'pooled' else None
+    latencies = []
+    errors = []
+    lock = threading.Lock()
+
+    def worker(seed_value):
+        rng = random.Random(seed_value)
+        local = []
+        for _ in range(requests):
+            student_exam_id = rng.randint(1, student_exam_count)
+            write = rng.random() < write_ratio
+            started = time.perf_counter()
+            try:
+                if pool:
+                    conn = pool.acquire()
+                    try:
+                        unit_of_work(conn, student_exam_id, write)
+                    finally:
+                        pool.release(conn)
+                else:
+                    conn = legacy_connection()
+                    try:
+                        unit_of_work(conn, student_exam_id, write)
+                    finally:
+                        conn.close()
+            except sqlite3.OperationalError as e:
+                with lock:
+                    errors.append(str(e))
+                continue
+            local.append(time.perf_counter() - started)
+        with lock:
+            latencies.extend(local)
+
+    workers = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    started = time.perf_counter()
+    for t in workers:
+        t.start()
+    for t in workers:
+        t.join()
+    elapsed = time.perf_counter() - started
+
+    if pool:
+        pool.close_all()
+    return latencies, errors, elapsed
+
+
+def report(mode, latencies, errors, elapsed):
+    """Print throughput and latency percentiles for one run"""
+    latencies.sort()
+    p50 = statistics.median(latencies) * 1000 if latencies else 0
+    p99 = latencies[int(len(latencies) * 0.99) - 1] * 1000 if latencies else 0
+    print(f"{mode:>8}: {len(latencies) / elapsed:10.1f} req/s   "
+          f"p50 {p50:7.2f} ms   p99 {p99:7.2f} ms   errors {len(errors)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--requests', type=int, default=500, help='requests per thread')
+    parser.add_argument('--write-ratio', type=float, default=0.3)
+    parser.add_argument('--attempts', type=int, default=2000, help='seeded student_exams rows')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for mode in ('legacy', 'pooled'):
+            # Fresh file per mode so WAL state from one run cannot help the other
+            database.DB_PATH = os.path.join(tmp, f'{mode}.db')
+            seed(args.attempts)
+            if mode == 'legacy':
+                # init_database leaves the file in WAL; restore rollback journaling
+                conn = sqlite3.connect(database.DB_PATH)
+                conn.execute("PRAGMA journal_mode=DELETE")
+                conn.close()
+            latencies, errors, elapsed = run(mode, args.threads, args.requests,
+                                             args.write_ratio, args.attempts)
+            report(mode, latencies, errors, elapsed)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,110 @@
+"""
+Benchmark: micro-batched vs single-frame proctoring analysis.
+
+Pushes synthetic webcam frames from many simulated candidates through the
+frame analysis queue and worker processes, once with one frame per worker
+call and once micro-batched, and reports throughput, latency percentiles
+(enqueue to result) and the mean batch size. YOLO benefits most from
+batching; without ultralytics installed only the OpenCV stages are timed.
+
+Usage: python backend/bench_frame_batch.py [--frames 400] [--rate 0] [--workers 2]
+                                           [--batch-size 8] [--batch-wait-ms 20]
+"""
+import argparse
+import statistics
+import threading
+import time
+
+import cv2
+import numpy as np
+
+import proctoring
+from frame_workers import FrameAnalysisQueue
+
+
+def synthetic_frames(count, width=640, height=480):
+    """JPEG frames of a face-sized blob on a noisy background, varied per frame"""
+    rng = np.random.default_rng(0)
+    frames = []
+    for i in range(count):
+        img = np.full((height, width, 3), 120, np.uint8)
+        img += rng.integers(0, 20, img.shape, dtype=np.uint8)
+        center = (width // 2 + int(rng.integers(-40, 40)), height // 2 + int(rng.integers(-30, 30)))
+        cv2.ellipse(img, center, (70, 95), 0, 0, 360, (150, 170, 200), -1)
+        frames.append(cv2.imencode('.jpg', img, [cv2.IMWRITE_JPEG_QUALITY, 80])[1].tobytes())
+    return frames
+
+
+def run(frames, rate, workers, batch_size, batch_wait_ms):
+    """Push every frame through a fresh queue; returns (elapsed, latencies, stats)"""
+    latencies = []
+    lock = threading.Lock()
+    done = threading.Event()
+
+    def on_result(job, result):
+        with lock:
+            latencies.append(time.time() - job['submitted_at'])
+            if len(latencies) == len(frames):
+                done.set()
+        return result
+
+    queue = FrameAnalysisQueue(
+        analyze_batch=proctoring.evaluate_frames,
+        on_result=on_result,
+        workers=workers,
+        queue_size=len(frames),
+        result_ttl=600,
+        batch_size=batch_size,
+        batch_wait_ms=batch_wait_ms
+    )
+
+    # Warm up: spawn the workers and load their models outside the timed run
+    queue.submit(0, 0, frames[0])
+    while queue.stats()['completed'] + queue.stats()['failed'] < 1:
+        time.sleep(0.05)
+    with lock:
+        latencies.clear()
+    queue.completed = queue.batches = queue.batched_frames = 0
+
+    started = time.perf_counter()
+    for i, frame in enumerate(frames):
+        if rate:
+            # Open loop: frames arrive on a fixed schedule whatever the backlog
+            time.sleep(max(0.0, started + i / rate - time.perf_counter()))
+        queue.submit(i % 1000, 0, frame)
+    done.wait()
+    elapsed = time.perf_counter() - started
+
+    stats = queue.stats()
+    queue.shutdown()
+    return elapsed, sorted(latencies), stats
+
+
+def report(label, frames, elapsed, latencies, stats):
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+    print(f"{label:<12} {len(frames) / elapsed:8.1f} frames/s   "
+          f"p50 {statistics.median(latencies) * 1000:7.1f} ms   p99 {p99 * 1000:7.1f} ms   "
+          f"mean batch {stats['mean_batch_size']:.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--frames', type=int, default=400)
+    parser.add_argument('--rate', type=float, default=0,
+                        help='arrival rate in frames/s across all candidates (0 = all at once)')
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--batch-size', type=int, default=8)
+    parser.add_argument('--batch-wait-ms', type=int, default=20)
+    args = parser.parse_args()
+
+    frames = synthetic_frames(args.frames)
+    print(f"{args.frames} frames, {args.workers} workers, arrival "
+          f"{'burst' if not args.rate else f'{args.rate:g} frames/s'}, "
+          f"YOLO {'enabled' if proctoring.model_registry.get('yolo') is not None else 'unavailable'}")
+
+    report('single', frames, *run(frames, args.rate, args.workers, 1, 0))
+    report('batched', frames, *run(frames, args.rate, args.workers, args.batch_size, args.batch_wait_ms))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,134 @@
+"""
+Benchmark: object detector backends for the proctoring YOLO stage.
+
+Runs each backend (and input resolution) over the same frames and reports
+throughput, per-frame latency and agreement with the first backend listed,
+which serves as the reference: detection precision/recall (same class,
+IoU >= 0.5) and the share of frames where the suspicious objects found
+(phone, book, ...) match, which is what decides a violation.
+
+Usage: python backend/bench_object_detectors.py [--frames-dir DIR] [--limit 200]
+           [--backends ultralytics onnx onnx:int8] [--imgsz 640 320]
+           [--batch-size 8] [--repeat 3]
+"""
+import argparse
+import glob
+import os
+import statistics
+import time
+
+from bench_frame_batch import synthetic_frames
+from frame_pipeline import Frame
+from object_detectors import load_detector
+from proctoring import SUSPICIOUS_CLASSES
+
+MATCH_IOU = 0.5
+
+
+def load_frames(frames_dir, limit):
+    """Decoded frames at analysis resolution, from a JPEG directory or synthetic"""
+    if frames_dir:
+        paths = sorted(glob.glob(os.path.join(frames_dir, '*.jpg')) + glob.glob(os.path.join(frames_dir, '*.jpeg')))
+        frame_bytes = []
+        for path in paths[:limit]:
+            with open(path, 'rb') as f:
+                frame_bytes.append(f.read())
+    else:
+        frame_bytes = synthetic_frames(limit)
+
+    images = [Frame(data).image for data in frame_bytes]
+    return [image for image in images if image is not None]
+
+
+def iou(a, b):
+    x1, y1 = max(a[0], b[0]), max(a[1], b[1])
+    x2, y2 = min(a[2], b[2]), min(a[3], b[3])
+    inter = max(0.0, x2 - x1) * max(0.0, y2 - y1)
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter
+    return inter / union if union > 0 else 0.0
+
+
+def agreement(reference, candidate):
+    """(precision, recall, suspicious-object agreement) of candidate against reference detections"""
+    matched = ref_total = cand_total = same_suspicious = 0
+    for ref, cand in zip(reference, candidate):
+        ref_total += len(ref)
+        cand_total += len(cand)
+        unmatched = list(ref)
+        for detection in cand:
+            best = max(
+                (r for r in unmatched if r['object'] == detection['object']),
+                key=lambda r: iou(r['box'], detection['box']), default=None
+            )
+            if best is not None and iou(best['box'], detection['box']) >= MATCH_IOU:
+                unmatched.remove(best)
+                matched += 1
+
+        def suspicious(detections):
+            return {d['object'] for d in detections if d['object'] in SUSPICIOUS_CLASSES}
+        same_suspicious += suspicious(ref) == suspicious(cand)
+
+    return (
+        matched / cand_total if cand_total else 1.0,
+        matched / ref_total if ref_total else 1.0,
+        same_suspicious / len(reference)
+    )
+
+
+def run(detector, images, batch_size, repeat):
+    """Returns (detections per frame, frames/s, per-frame latency samples in ms)"""
+    detector.detect(images[:batch_size])  # warm-up
+    per_frame_ms = []
+    detections = []
+    started = time.perf_counter()
+    for _ in range(repeat):
+        detections = []
+        for i in range(0, len(images), batch_size):
+            batch = images[i:i + batch_size]
+            batch_started = time.perf_counter()
+            detections.extend(detector.detect(batch))
+            per_frame_ms.append((time.perf_counter() - batch_started) * 1000 / len(batch))
+    elapsed = time.perf_counter() - started
+    return detections, len(images) * repeat / elapsed, sorted(per_frame_ms)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--frames-dir', help='directory of JPEG frames (default: synthetic frames)')
+    parser.add_argument('--limit', type=int, default=200)
+    parser.add_argument('--backends', nargs='+', default=['ultralytics', 'onnx', 'onnx:int8'],
+                        help="backend names; 'onnx:int8' for quantized weights")
+    parser.add_argument('--imgsz', type=int, nargs='+', default=[640])
+    parser.add_argument('--batch-size', type=int, default=8)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    images = load_frames(args.frames_dir, args.limit)
+    print(f"{len(images)} frames from {args.frames_dir or 'synthetic set'}, batch size {args.batch_size}")
+    print(f"{'backend':<20} {'load ms':>8} {'frames/s':>9} {'p50 ms':>7} {'p99 ms':>7} "
+          f"{'precision':>9} {'recall':>7} {'suspicious':>10}")
+
+    reference = None
+    for spec in args.backends:
+        backend, _, option = spec.partition(':')
+        for imgsz in args.imgsz:
+            label = f"{spec}@{imgsz}"
+            started = time.perf_counter()
+            try:
+                detector = load_detector(backend, imgsz=imgsz, int8=option == 'int8')
+            except Exception as e:
+                print(f"{label:<20} unavailable: {e}")
+                continue
+            load_ms = (time.perf_counter() - started) * 1000
+
+            detections, fps, latencies = run(detector, images, args.batch_size, args.repeat)
+            p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+            if reference is None:
+                reference = detections
+            precision, recall, suspicious = agreement(reference, detections)
+            print(f"{label:<20} {load_ms:8.0f} {fps:9.1f} {statistics.median(latencies):7.1f} {p99:7.1f} "
+                  f"{precision:9.3f} {recall:7.3f} {suspicious:10.3f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,347 @@
+"""
+Benchmark: proctoring frame analysis, stage by stage and end to end.
+
+Frames come from synthetic scenes (no face, one face, two faces, at several
+resolutions) or from a directory of recorded JPEGs. For each scene it times
+- decode, faces (Haar), gaze (MediaPipe) and objects (YOLO), each stage on
+  every frame
+- cascade: the analysis the server actually runs for an attempt, where
+  faces are tracked between frames and MediaPipe and YOLO only run on
+  escalated frames
+- endpoint: POST /api/proctoring/frame through the Flask app, analysed
+  inline, including logging violations and saving evidence
+and reports latency percentiles, frames per CPU-second (what one core
+sustains) and the process's peak RSS.
+
+--json writes the results for later runs to compare against with
+--baseline, which lists the stages whose p50 latency or throughput got more
+than --tolerance worse and exits non-zero if any did.
+
+Usage: python backend/bench_proctoring.py [--frames 30] [--resolutions 640x480 1280x720]
+           [--scenes no_face one_face two_faces] [--frames-dir DIR]
+           [--json results.json] [--baseline baseline.json] [--tolerance 0.15]
+"""
+import argparse
+import glob
+import io
+import json
+import os
+import platform
+import resource
+import sys
+import tempfile
+import time
+
+import cv2
+import numpy as np
+
+import database
+from config import Config
+
+SCENES = {'no_face': [], 'one_face': [(0.5, 0.5)], 'two_faces': [(0.3, 0.5), (0.7, 0.5)]}
+STAGES = ['decode', 'faces', 'gaze', 'objects', 'analysis', 'cascade', 'endpoint']
+
+
+def draw_face(img, cx, cy, scale):
+    """A schematic frontal face: enough eye/brow/nose contrast for the Haar cascade"""
+    def s(v):
+        return max(1, int(v * scale))
+    cv2.ellipse(img, (cx, cy), (s(60), s(80)), 0, 0, 360, (150, 170, 205), -1)
+    for dx in (-25, 25):
+        cv2.ellipse(img, (cx + s(dx), cy - s(20)), (s(14), s(7)), 0, 0, 360, (40, 40, 40), -1)
+        cv2.line(img, (cx + s(dx - 16), cy - s(36)), (cx + s(dx + 16), cy - s(36)), (50, 50, 60), s(5))
+    cv2.ellipse(img, (cx, cy + s(12)), (s(7), s(14)), 0, 0, 360, (120, 140, 175), -1)
+    cv2.ellipse(img, (cx, cy + s(42)), (s(22), s(7)), 0, 0, 360, (70, 70, 130), -1)
+
+
+def synthetic_scene(faces, width, height, count, seed=0):
+    """JPEG frames of a noisy background with faces at (x, y) fractions, jittered per frame"""
+    rng = np.random.default_rng(seed)
+    scale = height / 480
+    frames = []
+    for _ in range(count):
+        img = np.full((height, width, 3), 110, np.uint8)
+        img += rng.integers(0, 20, img.shape, dtype=np.uint8)
+        for fx, fy in faces:
+            jitter = rng.integers(-15, 16, 2) * scale
+            draw_face(img, int(fx * width + jitter[0]), int(fy * height + jitter[1]), scale)
+        img = cv2.GaussianBlur(img, (5, 5), 0)
+        frames.append(cv2.imencode('.jpg', img, [cv2.IMWRITE_JPEG_QUALITY, 80])[1].tobytes())
+    return frames
+
+
+def recorded_frames(frames_dir, limit):
+    paths = sorted(glob.glob(os.path.join(frames_dir, '*.jpg')) + glob.glob(os.path.join(frames_dir, '*.jpeg')))
+    frames = []
+    for path in paths[:limit]:
+        with open(path, 'rb') as f:
+            frames.append(f.read())
+    return frames
+
+
+def summarize(samples_ms, frames, cpu_seconds):
+    samples = sorted(samples_ms)
+
+    def percentile(p):
+        return round(samples[min(len(samples) - 1, int(len(samples) * p))], 2)
+
+    return {
+        "count": len(samples),
+        "mean_ms": round(sum(samples) / len(samples), 2),
+        "p50_ms": percentile(0.50),
+        "p95_ms": percentile(0.95),
+        "p99_ms": percentile(0.99),
+        "frames_per_cpu_second": round(frames / cpu_seconds, 1) if cpu_seconds > 0 else None
+    }
+
+
+def timed(fn, items):
+    """Run fn on each item; returns (per-item ms, CPU seconds used by the whole process)"""
+    samples = []
+    cpu_started = time.process_time()
+    for item in items:
+        started = time.perf_counter()
+        fn(item)
+        samples.append((time.perf_counter() - started) * 1000)
+    return samples, time.process_time() - cpu_started
+
+
+def bench_stages(proctoring, frames, repeat):
+    """Each detector on every frame, as when the cascade escalates; plus their sum"""
+    from frame_pipeline import Frame
+
+    stages = (('decode', lambda f: f.image), ('faces', proctoring.detect_faces),
+              ('gaze', proctoring.track_eye_gaze), ('objects', proctoring.detect_objects))
+    samples = {name: [] for name, _ in stages}
+    cpu = dict.fromkeys(samples, 0.0)
+    for _ in range(repeat):
+        for frame_bytes in frames:
+            # Stages share the frame's decoded views, as in the pipeline
+            frame = Frame(frame_bytes)
+            for name, fn in stages:
+                (ms,), cpu_seconds = timed(fn, [frame])
+                samples[name].append(ms)
+                cpu[name] += cpu_seconds
+
+    samples['analysis'] = [sum(per_stage) for per_stage in zip(*(samples[name] for name, _ in stages))]
+    cpu['analysis'] = sum(cpu.values())
+    count = len(frames) * repeat
+    return {name: summarize(samples[name], count, cpu[name]) for name in samples}
+
+
+def bench_cascade(proctoring, frames, repeat, student_exam_id):
+    """Frames analysed as one attempt's are: cascade, face tracking and audits, no database"""
+    def analyse(frame_bytes):
+        context = proctoring.cascade_context(student_exam_id)
+        analysis, violation_type, severity = proctoring.evaluate_frame(frame_bytes, context)
+        proctoring.record_frame_result(student_exam_id, context, analysis, violation_type, severity)
+
+    # The first frame always escalates; start from the steady state
+    analyse(frames[0])
+    samples, cpu_seconds = timed(analyse, frames * repeat)
+    return summarize(samples, len(samples), cpu_seconds)
+
+
+def setup_app(tmp, dedupe):
+    """Flask app on a scratch database, analysing frames inline; returns make_attempt(name)"""
+    os.chdir(tmp)  # filesystem sessions are written relative to the working directory
+    database.DB_PATH = os.path.join(tmp, 'bench.db')
+    database.init_database()
+
+    Config.AI_PROCTORING_ENABLED = True
+    Config.FRAME_ANALYSIS_WORKERS = 0
+    Config.SLOW_QUERY_MS = float('inf')
+    # Models load when the stages are timed, not in the background on the first request
+    Config.MODEL_WARMUP = False
+
+    from app import app
+    from evidence_store import evidence_store
+    from frame_dedupe import frame_deduper
+    from violation_ledger import violation_ledger
+
+    # Keep evidence and the violation journal out of the backend directory
+    evidence_store.directory = os.path.join(tmp, 'evidence')
+    evidence_store.retention_days = 0
+    violation_ledger.journal_dir = os.path.join(tmp, 'journal')
+    if not dedupe:
+        frame_deduper.threshold = 0
+
+    conn = database.get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute('''
+        INSERT INTO exams (title, exam_type, duration_minutes, total_marks, passing_marks, status)
+        VALUES ('Benchmark Exam', 'mcq', 60, 100, 40, 'published')
+    ''')
+    exam_id = cursor.lastrowid
+    conn.commit()
+
+    def make_attempt(name):
+        """A logged-in test client and a fresh attempt, so each scene has its own proctoring state"""
+        cursor.execute("INSERT INTO users (usn, name, email, password, role) VALUES (?, ?, ?, 'x', 'student')",
+                       (name, name, f"{name}@bench.local"))
+        student_id = cursor.lastrowid
+        cursor.execute('''
+            INSERT INTO student_exams (exam_id, student_id, status, start_time)
+            VALUES (?, ?, 'in_progress', CURRENT_TIMESTAMP)
+        ''', (exam_id, student_id))
+        student_exam_id = cursor.lastrowid
+        conn.commit()
+
+        client = app.test_client()
+        with client.session_transaction() as sess:
+            sess['user_id'] = student_id
+            sess['role'] = 'student'
+        return client, student_exam_id
+
+    return make_attempt
+
+
+def bench_endpoint(make_attempt, name, frames, repeat):
+    client, student_exam_id = make_attempt(name)
+
+    def post(frame_bytes):
+        response = client.post('/api/proctoring/frame', data={
+            'student_exam_id': str(student_exam_id),
+            'frame': (io.BytesIO(frame_bytes), 'frame.jpg')
+        }, content_type='multipart/form-data')
+        if response.status_code != 200:
+            raise RuntimeError(f"/frame returned {response.status_code}: {response.get_json()}")
+
+    samples, cpu_seconds = timed(post, frames * repeat)
+    return summarize(samples, len(samples), cpu_seconds)
+
+
+def peak_rss_mb():
+    # ru_maxrss is in kilobytes on Linux, bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+def compare(results, baseline, tolerance):
+    """Stages that got more than tolerance slower (p50) or less efficient (frames/CPU-s)"""
+    regressions = []
+    for scene, stages in results['scenes'].items():
+        for stage, current in stages['stages'].items():
+            previous = baseline.get('scenes', {}).get(scene, {}).get('stages', {}).get(stage)
+            if not previous:
+                continue
+            if previous['p50_ms'] > 0.05 and current['p50_ms'] > previous['p50_ms'] * (1 + tolerance):
+                regressions.append((scene, stage, 'p50_ms', previous['p50_ms'], current['p50_ms']))
+            before, after = previous.get('frames_per_cpu_second'), current.get('frames_per_cpu_second')
+            if before and after and after < before * (1 - tolerance):
+                regressions.append((scene, stage, 'frames_per_cpu_second', before, after))
+    return regressions
+
+
+def print_scene(scene, stages):
+    print(f"\n{scene}")
+    print(f"  {'stage':<10} {'mean ms':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'frames/CPU-s':>13}")
+    for stage in STAGES:
+        if stage in stages:
+            s = stages[stage]
+            fps = f"{s['frames_per_cpu_second']:13.1f}" if s['frames_per_cpu_second'] else f"{'-':>13}"
+            print(f"  {stage:<10} {s['mean_ms']:8.2f} {s['p50_ms']:8.2f} {s['p95_ms']:8.2f} {s['p99_ms']:8.2f} {fps}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--frames', type=int, default=30, help='frames per scene')
+    parser.add_argument('--repeat', type=int, default=2)
+    parser.add_argument('--scenes', nargs='+', default=list(SCENES), choices=list(SCENES))
+    parser.add_argument('--resolutions', nargs='+', default=['640x480', '1280x720', '1920x1080'])
+    parser.add_argument('--frames-dir', help='also replay the JPEGs in this directory')
+    parser.add_argument('--no-endpoint', action='store_true', help='skip the /frame endpoint runs')
+    parser.add_argument('--dedupe', action='store_true',
+                        help='keep near-duplicate frame skipping on for the endpoint runs')
+    parser.add_argument('--json', help='write the results to this file')
+    parser.add_argument('--baseline', help='compare against results written earlier with --json')
+    parser.add_argument('--tolerance', type=float, default=0.15)
+    args = parser.parse_args()
+    # The endpoint runs change into a scratch directory
+    for name in ('frames_dir', 'json', 'baseline'):
+        if getattr(args, name):
+            setattr(args, name, os.path.abspath(getattr(args, name)))
+
+    scenes = {}
+    for resolution in args.resolutions:
+        width, height = (int(v) for v in resolution.split('x'))
+        for name in args.scenes:
+            faces = SCENES[name]
+            scenes[f"{name}@{resolution}"] = synthetic_scene(faces, width, height, args.frames)
+    if args.frames_dir:
+        scenes['recorded'] = recorded_frames(args.frames_dir, args.frames)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        make_attempt = None if args.no_endpoint else setup_app(tmp, args.dedupe)
+        import proctoring
+
+        started = time.perf_counter()
+        proctoring.model_registry.warm_up()
+        load_ms = (time.perf_counter() - started) * 1000
+        models = {name: status['state'] for name, status in proctoring.model_registry.status().items()}
+        print(f"models loaded in {load_ms:.0f} ms: {models}; peak RSS {peak_rss_mb()} MB")
+
+        results = {
+            "meta": {
+                "created_at": time.strftime('%Y-%m-%dT%H:%M:%S'),
+                "python": platform.python_version(),
+                "opencv": cv2.__version__,
+                "opencv_threads": cv2.getNumThreads(),
+                "cpu_count": os.cpu_count(),
+                "object_detector": Config.OBJECT_DETECTOR_BACKEND,
+                "models": models,
+                "model_load_ms": round(load_ms),
+                "frames_per_scene": args.frames,
+                "repeat": args.repeat
+            },
+            "scenes": {}
+        }
+
+        for attempt, (scene, frames) in enumerate(scenes.items(), start=1):
+            if not frames:
+                print(f"\n{scene}: no frames")
+                continue
+            # One untimed frame so lazily built state doesn't count
+            proctoring.evaluate_frame(frames[0])
+
+            stages = bench_stages(proctoring, frames, args.repeat)
+            # Negative ids keep these attempts apart from the endpoint runs
+            stages['cascade'] = bench_cascade(proctoring, frames, args.repeat, -attempt)
+            if make_attempt is not None:
+                stages['endpoint'] = bench_endpoint(make_attempt, scene.replace('@', '_'), frames, args.repeat)
+            faces_found = [proctoring.detect_faces(frame)['face_count'] for frame in frames]
+            results['scenes'][scene] = {
+                "frames": len(frames),
+                "faces_detected_mean": round(sum(faces_found) / len(faces_found), 2),
+                "stages": stages
+            }
+            print_scene(f"{scene} ({len(frames)} frames, {results['scenes'][scene]['faces_detected_mean']} faces found)",
+                        stages)
+
+        if make_attempt is not None:
+            # Write queued violations while the scratch database still exists
+            from violation_ledger import violation_ledger
+            violation_ledger.flush()
+
+        results['peak_rss_mb'] = peak_rss_mb()
+        print(f"\npeak RSS {results['peak_rss_mb']} MB")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"results written to {args.json}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance)
+        if not regressions:
+            print(f"no regressions beyond {args.tolerance:.0%} against {args.baseline}")
+        for scene, stage, metric, before, after in regressions:
+            print(f"REGRESSION {scene} {stage} {metric}: {before} -> {after}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,149 @@
+"""
+Benchmark: concurrent exam submissions against /api/exams/<id>/submit.
+
+Seeds one published exam and a batch of in-progress attempts in a scratch
+database, then releases every submission at once (as at an exam deadline)
+and reports throughput, latency percentiles and failed submissions.
+
+Usage: python backend/bench_submit.py [--submissions 1000] [--questions 100] [--concurrency 1000]
+"""
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import threading
+import time
+
+import database
+from config import Config
+from flask_session import Session
+
+
+def seed(question_count, student_count):
+    """Create an MCQ exam, its students and their in-progress attempts"""
+    database.init_database()
+    conn = database.get_db_connection()
+    cursor = conn.cursor()
+
+    cursor.execute('''
+        INSERT INTO exams (title, exam_type, duration_minutes, total_marks, passing_marks, status)
+        VALUES ('Deadline Exam', 'mcq', 60, ?, ?, 'published')
+    ''', (question_count, question_count // 2))
+    exam_id = cursor.lastrowid
+
+    cursor.executemany('''
+        INSERT INTO questions (exam_id, question_type, question_text, option_a, option_b,
+                               option_c, option_d, correct_answer, marks)
+        VALUES (?, 'mcq', ?, 'a', 'b', 'c', 'd', ?, 1)
+    ''', [(exam_id, f'Question {i}', random.choice('ABCD')) for i in range(question_count)])
+    cursor.execute("SELECT id FROM questions WHERE exam_id=?", (exam_id,))
+    question_ids = [row['id'] for row in cursor.fetchall()]
+
+    cursor.executemany('''
+        INSERT INTO users (usn, name, email, password, role)
+        VALUES (?, ?, ?, 'x', 'student')
+    ''', [(f'BENCH{i:05d}', f'Student {i}', f'student{i}@bench.local') for i in range(student_count)])
+    cursor.execute("SELECT id FROM users WHERE role='student' ORDER BY id")
+    student_ids = [row['id'] for row in cursor.fetchall()]
+
+    attempts = []
+    for student_id in student_ids:
+        cursor.execute('''
+            INSERT INTO student_exams (exam_id, student_id, status, start_time)
+            VALUES (?, ?, 'in_progress', datetime('now', '-30 minutes'))
+        ''', (exam_id, student_id))
+        attempts.append((student_id, cursor.lastrowid))
+
+    conn.commit()
+    conn.close()
+    return exam_id, question_ids, attempts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--submissions', type=int, default=1000)
+    parser.add_argument('--questions', type=int, default=100)
+    parser.add_argument('--concurrency', type=int, default=1000,
+                        help='threads released together at the deadline')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # Filesystem sessions are written relative to the working directory
+        os.chdir(tmp)
+        database.DB_PATH = os.path.join(tmp, 'bench.db')
+        exam_id, question_ids, attempts = seed(args.questions, args.submissions)
+
+        # The first request would otherwise start loading proctoring models
+        Config.MODEL_WARMUP = False
+        from app import app
+
+        # Keep every student's session on disk and the slow-query log quiet
+        app.config['SESSION_FILE_THRESHOLD'] = args.submissions * 2
+        Session(app)
+        Config.SLOW_QUERY_MS = float('inf')
+
+        # One logged-in client per student
+        clients = []
+        for student_id, student_exam_id in attempts:
+            client = app.test_client()
+            with client.session_transaction() as sess:
+                sess['user_id'] = student_id
+                sess['role'] = 'student'
+            answers = [{
+                "question_id": qid,
+                "answer_type": "mcq_option",
+                "answer_value": random.choice('ABCD')
+            } for qid in question_ids]
+            clients.append((client, {"student_exam_id": student_exam_id, "answers": answers}))
+
+        pending = list(clients)
+        pending_lock = threading.Lock()
+        latencies = []
+        failures = []
+        results_lock = threading.Lock()
+        deadline = threading.Barrier(args.concurrency)
+
+        def worker():
+            deadline.wait()
+            while True:
+                with pending_lock:
+                    if not pending:
+                        return
+                    client, payload = pending.pop()
+                started = time.perf_counter()
+                response = client.post(f'/api/exams/{exam_id}/submit', json=payload)
+                elapsed = time.perf_counter() - started
+                with results_lock:
+                    if response.status_code == 200:
+                        latencies.append(elapsed)
+                    else:
+                        failures.append(response.get_json())
+
+        threads = [threading.Thread(target=worker) for _ in range(args.concurrency)]
+        started = time.perf_counter()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        elapsed = time.perf_counter() - started
+
+        conn = database.get_db_connection()
+        stored = conn.execute("SELECT COUNT(*) FROM student_answers").fetchone()[0]
+        conn.close()
+
+        latencies.sort()
+        print(f"submissions: {len(latencies)} ok, {len(failures)} failed, "
+              f"{args.questions} answers each, concurrency {args.concurrency}")
+        print(f"throughput:  {len(latencies) / elapsed:.1f} submissions/s ({elapsed:.2f} s total)")
+        if latencies:
+            print(f"latency:     p50 {statistics.median(latencies) * 1000:.1f} ms   "
+                  f"p99 {latencies[int(len(latencies) * 0.99) - 1] * 1000:.1f} ms   "
+                  f"max {latencies[-1] * 1000:.1f} ms")
+        print(f"answers stored: {stored} (expected {len(latencies) * args.questions})")
+        if failures:
+            print(f"first failure: {failures[0]}")
+
+
+if __name__ == '__main__':
+    main()
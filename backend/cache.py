@@ -0,0 +1,152 @@
+import threading
+import time
+from collections import OrderedDict
+
+class LRUCache:
+    """
+    Thread-safe LRU cache bounded by entry count and approximate byte size
+
+    Values are stored with their size (supplied by the loader) and an
+    optional TTL. Concurrent misses on the same key run the loader once,
+    and an invalidate() during a load keeps the stale result out. Per-key
+    load state only exists while a load of that key is in flight.
+    """
+
+    def __init__(self, max_entries, max_bytes, ttl_seconds=None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()  # key -> (value, size, expires_at)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        # key -> [lock, loaders, generation] while loads of the key are in flight
+        self._loading = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, key):
+        """Returns the cached value or None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            value, size, expires_at = entry
+            if expires_at is not None and expires_at < time.monotonic():
+                self._remove(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def get_or_load(self, key, loader):
+        """
+        Returns the cached value, calling loader() on a miss
+        loader returns (value, size); a None value is returned but not cached
+        """
+        value = self.get(key)
+        if value is not None:
+            return value
+
+        with self._lock:
+            loading = self._loading.setdefault(key, [threading.Lock(), 0, 0])
+            loading[1] += 1
+
+        try:
+            with loading[0]:
+                # Another thread may have loaded it while we waited
+                with self._lock:
+                    entry = self._entries.get(key)
+                    if entry is not None and (entry[2] is None or entry[2] >= time.monotonic()):
+                        self._entries.move_to_end(key)
+                        return entry[0]
+                    generation = loading[2]
+
+                value, size = loader()
+                if value is not None:
+                    self.put(key, value, size, generation)
+                return value
+        finally:
+            with self._lock:
+                loading[1] -= 1
+                if loading[1] == 0:
+                    del self._loading[key]
+
+    def put(self, key, value, size, generation=None):
+        """Store a value, evicting least recently used entries to fit"""
+        if size > self.max_bytes:
+            return
+        expires_at = time.monotonic() + self.ttl_seconds if self.ttl_seconds else None
+
+        with self._lock:
+            if generation is not None:
+                loading = self._loading.get(key)
+                if loading is None or loading[2] != generation:
+                    # Invalidated while loading
+                    return
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (value, size, expires_at)
+            self._bytes += size
+
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def invalidate(self, key):
+        """Drop a key and make in-flight loads of it discard their result"""
+        with self._lock:
+            self._bump(key)
+            if key in self._entries:
+                self._remove(key)
+            self.invalidations += 1
+
+    def invalidate_matching(self, predicate):
+        """Drop every key for which predicate(key) is true; returns how many"""
+        with self._lock:
+            for key in self._loading:
+                if predicate(key):
+                    self._bump(key)
+            keys = [key for key in self._entries if predicate(key)]
+            for key in keys:
+                self._remove(key)
+            self.invalidations += len(keys)
+            return len(keys)
+
+    def clear(self):
+        """Drop every entry"""
+        with self._lock:
+            for key in self._loading:
+                self._bump(key)
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        """Returns hit/miss counters and current usage"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations
+            }
+
+    def _bump(self, key):
+        """Make in-flight loads of key discard their result"""
+        loading = self._loading.get(key)
+        if loading is not None:
+            loading[2] += 1
+
+    def _remove(self, key):
+        _, size, _ = self._entries.pop(key)
+        self._bytes -= size
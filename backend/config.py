@@ -19,16 +19,120 @@ class Config:
     SESSION_COOKIE_SAMESITE = 'Lax'
     PERMANENT_SESSION_LIFETIME = 86400  # 24 hours in seconds
 
+    # Blueprints this process serves; only their modules are imported, so e.g. a
+    # worker without 'proctoring' never loads OpenCV or the detector models
+    ENABLED_BLUEPRINTS = [name.strip() for name in os.getenv(
+        'ENABLED_BLUEPRINTS', 'auth,students,jobs,exams,proctoring,admin').split(',') if name.strip()]
+    MODEL_WARMUP = os.getenv('MODEL_WARMUP', 'True').lower() == 'true'  # load detector models at startup
+
+    # Database configuration
+    DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', '16'))
+    DB_BUSY_TIMEOUT_MS = int(os.getenv('DB_BUSY_TIMEOUT_MS', '5000'))
+    DB_SYNCHRONOUS = os.getenv('DB_SYNCHRONOUS', 'NORMAL')
+    DB_CACHE_SIZE_KB = int(os.getenv('DB_CACHE_SIZE_KB', '16384'))
+    DB_MMAP_SIZE = int(os.getenv('DB_MMAP_SIZE', str(128 * 1024 * 1024)))
+
+    # SQL tracing and slow-query log; off unless asked for, it wraps every query
+    SQL_TRACE_ENABLED = os.getenv('SQL_TRACE_ENABLED', 'False').lower() == 'true'
+    SLOW_QUERY_MS = float(os.getenv('SLOW_QUERY_MS', '100'))
+    SLOW_QUERY_LOG = os.getenv('SLOW_QUERY_LOG', '')
+
+    # Exam paper cache
+    EXAM_CACHE_MAX_ENTRIES = int(os.getenv('EXAM_CACHE_MAX_ENTRIES', '256'))
+    EXAM_CACHE_MAX_BYTES = int(os.getenv('EXAM_CACHE_MAX_BYTES', str(64 * 1024 * 1024)))
+    EXAM_CACHE_TTL = int(os.getenv('EXAM_CACHE_TTL', '300'))  # seconds
+
+    # Answer autosave (write-behind buffer)
+    AUTOSAVE_FLUSH_INTERVAL = float(os.getenv('AUTOSAVE_FLUSH_INTERVAL', '2'))  # seconds
+    AUTOSAVE_FLUSH_THRESHOLD = int(os.getenv('AUTOSAVE_FLUSH_THRESHOLD', '500'))  # answers
+
     # AI Proctoring configuration
     AI_PROCTORING_ENABLED = os.getenv('AI_PROCTORING_ENABLED', 'True').lower() == 'true'
     FRAME_CAPTURE_INTERVAL = int(os.getenv('FRAME_CAPTURE_INTERVAL', '10'))
     AUTO_SUBMIT_THRESHOLD = int(os.getenv('AUTO_SUBMIT_THRESHOLD', '5'))
-    PROCTORING_IMAGE_RETENTION_DAYS = int(os.getenv('PROCTORING_IMAGE_RETENTION_DAYS', '30'))
+    VIOLATION_FLUSH_INTERVAL = float(os.getenv('VIOLATION_FLUSH_INTERVAL', '1'))  # seconds
+    VIOLATION_FLUSH_THRESHOLD = int(os.getenv('VIOLATION_FLUSH_THRESHOLD', '200'))  # queued violations
+    VIOLATION_JOURNAL_DIR = os.getenv('VIOLATION_JOURNAL_DIR', 'violation_journal')  # relative to backend/; '' disables the journal
+    VIOLATION_BATCH_MAX = int(os.getenv('VIOLATION_BATCH_MAX', '50'))  # events per client batch
+    PROCTORING_IMAGE_RETENTION_DAYS = int(os.getenv('PROCTORING_IMAGE_RETENTION_DAYS', '30'))  # 0 keeps evidence forever
+    EVIDENCE_MAX_WIDTH = int(os.getenv('EVIDENCE_MAX_WIDTH', '640'))  # stored frames are downscaled to this
+    EVIDENCE_JPEG_QUALITY = int(os.getenv('EVIDENCE_JPEG_QUALITY', '75'))
+    EVIDENCE_THUMB_WIDTH = int(os.getenv('EVIDENCE_THUMB_WIDTH', '160'))
+    EVIDENCE_THUMB_QUALITY = int(os.getenv('EVIDENCE_THUMB_QUALITY', '60'))
+    EVIDENCE_SWEEP_INTERVAL = int(os.getenv('EVIDENCE_SWEEP_INTERVAL', '3600'))  # seconds between retention sweeps
+    EVIDENCE_SWEEP_BATCH = int(os.getenv('EVIDENCE_SWEEP_BATCH', '500'))  # logs per sweep transaction
+    FRAME_ANALYSIS_MAX_WIDTH = int(os.getenv('FRAME_ANALYSIS_MAX_WIDTH', '640'))  # pixels; larger frames are downscaled
+    FRAME_ANALYSIS_WORKERS = int(os.getenv('FRAME_ANALYSIS_WORKERS', '2'))  # processes; 0 analyses inline
+    FRAME_QUEUE_SIZE = int(os.getenv('FRAME_QUEUE_SIZE', '64'))  # frames queued or in analysis
+    FRAME_RESULT_TTL = int(os.getenv('FRAME_RESULT_TTL', '120'))  # seconds a result stays pollable
+    FRAME_BATCH_SIZE = int(os.getenv('FRAME_BATCH_SIZE', '8'))  # frames per batched YOLO call
+    FRAME_BATCH_WAIT_MS = int(os.getenv('FRAME_BATCH_WAIT_MS', '20'))  # max wait for a batch to fill
+    PROCTORING_STATE_MAX_SESSIONS = int(os.getenv('PROCTORING_STATE_MAX_SESSIONS', '10000'))
+    PROCTORING_STATE_TTL = int(os.getenv('PROCTORING_STATE_TTL', '1800'))  # seconds without frames
+
+    # Live invigilator event stream (see proctoring_events.py)
+    PROCTORING_STREAM_BUFFER = int(os.getenv('PROCTORING_STREAM_BUFFER', '256'))  # events a subscriber may lag
+    PROCTORING_STREAM_HISTORY = int(os.getenv('PROCTORING_STREAM_HISTORY', '1000'))  # events kept for reconnects
+    PROCTORING_STREAM_MAX_SUBSCRIBERS = int(os.getenv('PROCTORING_STREAM_MAX_SUBSCRIBERS', '50'))
+    PROCTORING_STREAM_HEARTBEAT = int(os.getenv('PROCTORING_STREAM_HEARTBEAT', '15'))  # seconds between keep-alives
+
+    # Frame upload settings handed to the client (see /api/proctoring/capture-settings)
+    FRAME_UPLOAD_WIDTH = int(os.getenv('FRAME_UPLOAD_WIDTH', '640'))  # pixels; no point above FRAME_ANALYSIS_MAX_WIDTH
+    FRAME_UPLOAD_QUALITY = float(os.getenv('FRAME_UPLOAD_QUALITY', '0.7'))  # JPEG quality, 0-1
+    FRAME_UPLOAD_GRAYSCALE = os.getenv('FRAME_UPLOAD_GRAYSCALE', 'False').lower() == 'true'  # evidence is gray too
+    FRAME_UPLOAD_MAX_BYTES = int(os.getenv('FRAME_UPLOAD_MAX_BYTES', '2000000'))
+    FRAME_TOKEN_TTL = int(os.getenv('FRAME_TOKEN_TTL', '14400'))  # seconds a frame token is valid
+    FRAME_WEBSOCKET_ENABLED = os.getenv('FRAME_WEBSOCKET_ENABLED', 'True').lower() == 'true'  # needs flask-sock
+
+    # Adaptive capture interval from a per-attempt risk score (see proctoring_risk.py)
+    FRAME_CAPTURE_MIN_INTERVAL = float(os.getenv('FRAME_CAPTURE_MIN_INTERVAL', '3'))  # seconds, at risk 1
+    FRAME_CAPTURE_MAX_INTERVAL = float(os.getenv('FRAME_CAPTURE_MAX_INTERVAL', '30'))  # seconds, at risk 0
+    RISK_INITIAL = float(os.getenv('RISK_INITIAL', '0.5'))  # a new attempt; 0.5 is about 10s
+    RISK_HALF_LIFE = float(os.getenv('RISK_HALF_LIFE', '120'))  # seconds
+
+    # Detector cascade: MediaPipe and YOLO run only when the Haar stage escalates
+    CASCADE_ENABLED = os.getenv('CASCADE_ENABLED', 'True').lower() == 'true'
+    CASCADE_AUDIT_RATE = float(os.getenv('CASCADE_AUDIT_RATE', '0.05'))  # random full-analysis sample
+    CASCADE_LOW_CONFIDENCE = float(os.getenv('CASCADE_LOW_CONFIDENCE', '2.0'))  # Haar level weight
+
+    # Face tracking: search around the last face boxes instead of the whole frame
+    FACE_TRACKING_ENABLED = os.getenv('FACE_TRACKING_ENABLED', 'True').lower() == 'true'
+    FACE_TRACK_REDETECT_FRAMES = int(os.getenv('FACE_TRACK_REDETECT_FRAMES', '5'))  # tracked frames between full detections
+    FACE_TRACK_MAX_AGE = float(os.getenv('FACE_TRACK_MAX_AGE', '60'))  # seconds before a full detection
+    FACE_TRACK_PADDING = float(os.getenv('FACE_TRACK_PADDING', '0.5'))  # search margin, as a fraction of the face size
+
+    # Object detector (YOLO stage) backend: 'ultralytics' (PyTorch) or 'onnx' (ONNX Runtime)
+    OBJECT_DETECTOR_BACKEND = os.getenv('OBJECT_DETECTOR_BACKEND', 'ultralytics')
+    OBJECT_DETECTOR_WEIGHTS = os.getenv('OBJECT_DETECTOR_WEIGHTS', 'yolov8n.pt')
+    OBJECT_DETECTOR_ONNX_MODEL = os.getenv('OBJECT_DETECTOR_ONNX_MODEL', 'yolov8n.onnx')
+    OBJECT_DETECTOR_INT8 = os.getenv('OBJECT_DETECTOR_INT8', 'False').lower() == 'true'  # onnx only
+    OBJECT_DETECTOR_IMGSZ = int(os.getenv('OBJECT_DETECTOR_IMGSZ', '640'))  # network input, multiple of 32
+    OBJECT_DETECTOR_CONFIDENCE = float(os.getenv('OBJECT_DETECTOR_CONFIDENCE', '0.5'))
+
+    # Near-duplicate frames reuse the previous analysis instead of running the detectors
+    FRAME_DEDUPE_THRESHOLD = float(os.getenv('FRAME_DEDUPE_THRESHOLD', '4.0'))  # mean gray-level difference; 0 disables
+    FRAME_DEDUPE_MAX_SKIPS = int(os.getenv('FRAME_DEDUPE_MAX_SKIPS', '6'))  # consecutive reuses before a full analysis
 
     # Code execution configuration
     CODE_EXECUTION_TIMEOUT = 5  # seconds
     MAX_CODE_OUTPUT_LENGTH = 1000  # characters
 
+    # Automatic judge for coding answers; runs untrusted code, so off until isolated (see sandbox.py)
+    JUDGE_ENABLED = os.getenv('JUDGE_ENABLED', 'False').lower() == 'true'
+    JUDGE_RUN_AS_USER = os.getenv('JUDGE_RUN_AS_USER', '')
+    JUDGE_MAX_PROCESSES = int(os.getenv('JUDGE_MAX_PROCESSES', '64'))
+    JUDGE_JAIL_COMMAND = os.getenv('JUDGE_JAIL_COMMAND', '')
+    JUDGE_WORKERS = int(os.getenv('JUDGE_WORKERS', '2'))
+    JUDGE_QUEUE_SIZE = int(os.getenv('JUDGE_QUEUE_SIZE', '10000'))
+    JUDGE_MEMORY_LIMIT_MB = int(os.getenv('JUDGE_MEMORY_LIMIT_MB', '256'))
+    JUDGE_COMPILE_TIMEOUT = int(os.getenv('JUDGE_COMPILE_TIMEOUT', '10'))  # seconds
+
+    # Judge result cache (content-addressed; empty JUDGE_CACHE_DIR keeps it in memory only)
+    JUDGE_CACHE_MEMORY_ENTRIES = int(os.getenv('JUDGE_CACHE_MEMORY_ENTRIES', '4096'))
+    JUDGE_CACHE_MEMORY_BYTES = int(os.getenv('JUDGE_CACHE_MEMORY_BYTES', str(32 * 1024 * 1024)))
+    JUDGE_CACHE_DIR = os.getenv('JUDGE_CACHE_DIR', 'judge_cache')
+    JUDGE_CACHE_DISK_ENTRIES = int(os.getenv('JUDGE_CACHE_DISK_ENTRIES', '100000'))
+
     @staticmethod
     def init_app(app):
         """Initialize app with configuration"""
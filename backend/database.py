@@ -1,14 +1,139 @@
 import sqlite3
 import os
+import threading
+from contextlib import contextmanager
+from queue import LifoQueue, Empty, Full
+from flask import g, has_app_context
+from config import Config
+from migrations import apply_migrations, pending_versions
+from query_trace import TracingConnection
 
 DB_PATH = os.path.join(os.path.dirname(__file__), 'database.db')
 
-def get_db_connection():
-    """Returns SQLite connection with row factory for dict-like access"""
-    conn = sqlite3.connect(DB_PATH)
+def configure_connection(conn):
+    """Apply WAL journaling and tuned pragmas to a fresh connection"""
     conn.row_factory = sqlite3.Row  # Enables column access by name
+    # Plain cursor so connection setup never shows up in request SQL traces
+    cursor = conn.cursor(sqlite3.Cursor)
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute(f"PRAGMA synchronous={Config.DB_SYNCHRONOUS}")
+    # Negative cache_size is interpreted by SQLite as KiB rather than pages
+    cursor.execute(f"PRAGMA cache_size=-{Config.DB_CACHE_SIZE_KB}")
+    cursor.execute(f"PRAGMA mmap_size={Config.DB_MMAP_SIZE}")
+    cursor.execute(f"PRAGMA busy_timeout={Config.DB_BUSY_TIMEOUT_MS}")
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    cursor.close()
     return conn
 
+def get_db_connection():
+    """Returns a standalone SQLite connection (scripts and one-off jobs)"""
+    conn = sqlite3.connect(DB_PATH, timeout=Config.DB_BUSY_TIMEOUT_MS / 1000)
+    return configure_connection(conn)
+
+class ConnectionPool:
+    """Thread-safe pool of configured SQLite connections"""
+
+    def __init__(self, db_path, max_idle):
+        self.db_path = db_path
+        self.max_idle = max_idle
+        self._idle = LifoQueue(maxsize=max_idle)
+
+    def acquire(self):
+        """Reuse an idle connection or open a new one"""
+        try:
+            return self._idle.get_nowait()
+        except Empty:
+            # Connections are handed to one request at a time, so they
+            # may safely move between worker threads
+            conn = sqlite3.connect(
+                self.db_path,
+                timeout=Config.DB_BUSY_TIMEOUT_MS / 1000,
+                check_same_thread=False,
+                factory=TracingConnection if Config.SQL_TRACE_ENABLED else sqlite3.Connection
+            )
+            return configure_connection(conn)
+
+    def release(self, conn):
+        """Return a connection to the pool, discarding unfinished work"""
+        if conn.in_transaction:
+            conn.rollback()
+        try:
+            self._idle.put_nowait(conn)
+        except Full:
+            conn.close()
+
+    def close_all(self):
+        """Close every idle connection"""
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except Empty:
+                break
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_pool():
+    """Returns the process-wide pool, recreating it if DB_PATH changed"""
+    global _pool
+    with _pool_lock:
+        if _pool is None or _pool.db_path != DB_PATH:
+            if _pool is not None:
+                _pool.close_all()
+            _pool = ConnectionPool(DB_PATH, Config.DB_POOL_SIZE)
+        return _pool
+
+def get_db():
+    """Returns the pooled connection bound to the current app context"""
+    if not has_app_context():
+        # Nothing would release it; background work acquires and releases its own
+        raise RuntimeError("get_db() needs an app context; use get_pool().acquire() and release() outside requests")
+    if 'db' not in g:
+        g.db = get_pool().acquire()
+    return g.db
+
+def close_db(exception=None):
+    """Release the app context's connection back to the pool"""
+    conn = g.pop('db', None)
+    if conn is not None:
+        get_pool().release(conn)
+
+@contextmanager
+def immediate_transaction(conn):
+    """
+    Run a block inside BEGIN IMMEDIATE ... COMMIT
+    Takes the write lock up front so read-then-write sequences cannot race;
+    rolls back if the block raises
+    """
+    if conn.in_transaction:
+        conn.commit()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        yield conn
+    except Exception:
+        conn.rollback()
+        raise
+    conn.commit()
+
+def init_app(app):
+    """
+    Register automatic connection teardown with the Flask app
+    Refuses to start on a database with unapplied migrations: queries assume
+    their indexes and columns exist
+    """
+    conn = get_db_connection()
+    try:
+        pending = pending_versions(conn)
+    finally:
+        conn.close()
+    if pending:
+        raise RuntimeError(
+            f"Database migrations {', '.join(str(v) for v in pending)} are not applied; "
+            "run python backend/migrations.py (or backend/database.py for a new database)"
+        )
+
+    app.teardown_appcontext(close_db)
+
 def init_database():
     """Creates all tables if they don't exist"""
     conn = get_db_connection()
@@ -209,8 +334,14 @@ def init_database():
     ''')
 
     conn.commit()
+
+    # Bring indexes and later schema changes up to date
+    applied = apply_migrations(conn)
+
     conn.close()
     print("Database initialized successfully with all 11 tables.")
+    if applied:
+        print(f"Applied migrations: {', '.join(str(v) for v in applied)}")
 
 if __name__ == '__main__':
     init_database()
@@ -0,0 +1,223 @@
+"""
+Content-addressed store for proctoring evidence frames.
+
+A violating frame is re-encoded (downscaled to EVIDENCE_MAX_WIDTH, JPEG at
+EVIDENCE_JPEG_QUALITY) and stored under the SHA-256 of the stored bytes,
+sharded two levels deep:
+    proctoring_images/ab/cd/abcd...ef.jpg
+    proctoring_images/ab/cd/abcd...ef_thumb.jpg   (EVIDENCE_THUMB_WIDTH wide)
+Names can't collide, and an identical frame saved twice is stored once.
+proctoring_logs.image_path holds the path relative to the backend directory.
+
+A background sweeper, started on first save, clears image_path on logs
+older than PROCTORING_IMAGE_RETENTION_DAYS in batches of EVIDENCE_SWEEP_BATCH
+and deletes files no remaining log references. Saving a frame that already
+exists refreshes its mtime, and the sweeper never deletes a file touched
+within the retention window, so a log written during a sweep keeps its image.
+"""
+import hashlib
+import os
+import tempfile
+import threading
+import time
+import cv2
+import numpy as np
+from config import Config
+from database import get_pool, immediate_transaction
+
+BACKEND_DIR = os.path.dirname(__file__)
+THUMB_SUFFIX = '_thumb.jpg'
+
+EXPIRED_LOGS_SQL = '''
+    SELECT id, image_path FROM proctoring_logs
+    WHERE image_path IS NOT NULL AND timestamp < datetime('now', ?)
+    ORDER BY timestamp
+    LIMIT ?
+'''
+
+class EvidenceStore:
+    """Sharded, content-addressed evidence images with retention sweeping"""
+
+    def __init__(self, directory, max_width, quality, thumb_width, thumb_quality,
+                 retention_days, sweep_interval, sweep_batch):
+        self.directory = directory  # relative to the backend directory
+        self.max_width = max_width
+        self.quality = quality
+        self.thumb_width = thumb_width
+        self.thumb_quality = thumb_quality
+        self.retention_days = retention_days
+        self.sweep_interval = sweep_interval
+        self.sweep_batch = sweep_batch
+        self._lock = threading.Lock()
+        self._sweeper = None
+        self.saved = 0
+        self.deduplicated = 0
+        self.bytes_in = 0
+        self.bytes_stored = 0
+        self.sweeps = 0
+        self.purged_logs = 0
+        self.purged_files = 0
+
+    def save(self, frame_bytes):
+        """Store a frame (and its thumbnail); returns the image path to record"""
+        self.start_sweeper()
+
+        image = cv2.imdecode(np.frombuffer(frame_bytes, np.uint8), cv2.IMREAD_COLOR)
+        if image is None:
+            # Keep undecodable evidence as uploaded rather than lose it
+            encoded, thumbnail = frame_bytes, None
+        else:
+            encoded = self._encode(image, self.max_width, self.quality)
+            thumbnail = self._encode(image, self.thumb_width, self.thumb_quality)
+
+        digest = hashlib.sha256(encoded).hexdigest()
+        relative_dir = f"{self.directory}/{digest[:2]}/{digest[2:4]}"
+        relative_path = f"{relative_dir}/{digest}.jpg"
+        path = os.path.join(BACKEND_DIR, relative_path)
+
+        if os.path.exists(path):
+            # Same frame seen before; keep it (and its thumbnail) clear of the sweeper
+            for existing in (path, self._thumbnail_file(path)):
+                try:
+                    os.utime(existing)
+                except OSError:
+                    pass
+            with self._lock:
+                self.deduplicated += 1
+            return relative_path
+
+        os.makedirs(os.path.join(BACKEND_DIR, relative_dir), exist_ok=True)
+        if thumbnail is not None:
+            self._write(self._thumbnail_file(path), thumbnail)
+        self._write(path, encoded)
+
+        with self._lock:
+            self.saved += 1
+            self.bytes_in += len(frame_bytes)
+            self.bytes_stored += len(encoded) + (len(thumbnail) if thumbnail is not None else 0)
+        return relative_path
+
+    def thumbnail_path(self, image_path):
+        """Thumbnail path for a stored image path, or None (e.g. legacy per-attempt files)"""
+        if not image_path or not image_path.endswith('.jpg') or image_path.endswith(THUMB_SUFFIX):
+            return None
+        thumbnail = image_path[:-len('.jpg')] + THUMB_SUFFIX
+        return thumbnail if os.path.exists(os.path.join(BACKEND_DIR, thumbnail)) else None
+
+    def start_sweeper(self):
+        """Start the retention sweeper thread if retention is configured"""
+        if self._sweeper is not None or self.retention_days <= 0:
+            return
+        with self._lock:
+            if self._sweeper is None:
+                # Started on first use so processes that never store evidence stay thread-free
+                self._sweeper = threading.Thread(target=self._run, name='evidence-sweep', daemon=True)
+                self._sweeper.start()
+
+    def sweep(self, conn):
+        """Purge expired evidence in batches; returns (logs cleared, files deleted)"""
+        if self.retention_days <= 0:
+            return 0, 0
+
+        cleared = deleted = 0
+        while True:
+            with immediate_transaction(conn):
+                rows = conn.execute(EXPIRED_LOGS_SQL, (f'-{self.retention_days} days', self.sweep_batch)).fetchall()
+                conn.executemany("UPDATE proctoring_logs SET image_path=NULL WHERE id=?",
+                                 [(row['id'],) for row in rows])
+            cleared += len(rows)
+
+            for image_path in {row['image_path'] for row in rows}:
+                still_used = conn.execute(
+                    "SELECT 1 FROM proctoring_logs WHERE image_path=? LIMIT 1", (image_path,)
+                ).fetchone()
+                if not still_used:
+                    deleted += self._delete(image_path)
+
+            if len(rows) < self.sweep_batch:
+                break
+
+        with self._lock:
+            self.sweeps += 1
+            self.purged_logs += cleared
+            self.purged_files += deleted
+        return cleared, deleted
+
+    def stats(self):
+        with self._lock:
+            return {
+                "saved": self.saved,
+                "deduplicated": self.deduplicated,
+                "bytes_in": self.bytes_in,
+                "bytes_stored": self.bytes_stored,
+                "retention_days": self.retention_days,
+                "sweeps": self.sweeps,
+                "purged_logs": self.purged_logs,
+                "purged_files": self.purged_files
+            }
+
+    def _run(self):
+        while True:
+            pool = get_pool()
+            conn = pool.acquire()
+            try:
+                self.sweep(conn)
+            except Exception as e:
+                print(f"Warning: evidence retention sweep failed: {e}")
+            finally:
+                pool.release(conn)
+            time.sleep(self.sweep_interval)
+
+    def _delete(self, image_path):
+        """Delete an expired image and its thumbnail; returns the number of images deleted"""
+        root = os.path.realpath(os.path.join(BACKEND_DIR, self.directory))
+        path = os.path.realpath(os.path.join(BACKEND_DIR, image_path))
+        if not path.startswith(root + os.sep):
+            return 0
+
+        try:
+            # Re-saved since it expired: a newer log is about to reference it
+            if time.time() - os.path.getmtime(path) < self.retention_days * 86400:
+                return 0
+            os.remove(path)
+        except OSError:
+            return 0
+
+        for cleanup in (lambda: os.remove(self._thumbnail_file(path)),
+                        # Drop the shard (or legacy per-attempt) directory once it is empty
+                        lambda: os.rmdir(os.path.dirname(path))):
+            try:
+                cleanup()
+            except OSError:
+                pass
+        return 1
+
+    @staticmethod
+    def _thumbnail_file(path):
+        return path[:-len('.jpg')] + THUMB_SUFFIX
+
+    @staticmethod
+    def _encode(image, max_width, quality):
+        if max_width and image.shape[1] > max_width:
+            scale = max_width / image.shape[1]
+            image = cv2.resize(image, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+        return cv2.imencode('.jpg', image, [cv2.IMWRITE_JPEG_QUALITY, quality])[1].tobytes()
+
+    @staticmethod
+    def _write(path, data):
+        # Write then rename so a reader never sees a partial image
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+evidence_store = EvidenceStore(
+    directory='proctoring_images',
+    max_width=Config.EVIDENCE_MAX_WIDTH,
+    quality=Config.EVIDENCE_JPEG_QUALITY,
+    thumb_width=Config.EVIDENCE_THUMB_WIDTH,
+    thumb_quality=Config.EVIDENCE_THUMB_QUALITY,
+    retention_days=Config.PROCTORING_IMAGE_RETENTION_DAYS,
+    sweep_interval=Config.EVIDENCE_SWEEP_INTERVAL,
+    sweep_batch=Config.EVIDENCE_SWEEP_BATCH
+)
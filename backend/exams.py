@@ -1,51 +1,214 @@
-from flask import Blueprint, request, jsonify, session
-from database import get_db_connection
+from flask import Blueprint, request, jsonify, session, current_app
+from database import get_db, immediate_transaction
+from config import Config
+from cache import LRUCache
+from autosave import answer_buffer
+from grading import grade_answers, recompute_attempt_score, recompute_attempt_scores
+from judge import judge_service, parse_test_cases
+from judge_cache import judge_cache, test_set_hash
 from middleware import require_auth, require_student, require_admin
-from utils import dict_from_row
-from datetime import datetime, timedelta
+from utils import dict_from_row, parse_pagination
+from datetime import datetime, timedelta, timezone
 import json
 
 exams_bp = Blueprint('exams', __name__)
 
+ATTEMPT_STATUSES = ['not_started', 'in_progress', 'submitted', 'evaluated']
+
+# Largest number of answers accepted by one batch evaluation request
+MAX_BATCH_EVALUATIONS = 1000
+
+# Only handed-in attempts have answers to evaluate
+EVALUABLE_STATUSES = ('submitted', 'evaluated')
+
+QUESTION_FIELDS = ['question_text', 'option_a', 'option_b', 'option_c', 'option_d',
+                   'correct_answer', 'marks', 'difficulty', 'language', 'test_cases']
+
+# Answer-stripped papers and grading keys, shared by every student taking an exam.
+# The TTL bounds staleness in other worker processes, which never see our invalidations.
+exam_papers = LRUCache(
+    max_entries=Config.EXAM_CACHE_MAX_ENTRIES,
+    max_bytes=Config.EXAM_CACHE_MAX_BYTES,
+    ttl_seconds=Config.EXAM_CACHE_TTL
+)
+
+def load_exam_paper(cursor, exam_id):
+    """
+    Build the cacheable paper for an exam
+    Returns (paper, size) where paper holds the exam row, the pre-serialized
+    student view (no correct answers) and the grading key; (None, 0) if missing
+    """
+    cursor.execute("SELECT * FROM exams WHERE id=?", (exam_id,))
+    exam = cursor.fetchone()
+    if not exam:
+        return None, 0
+
+    cursor.execute("SELECT * FROM questions WHERE exam_id=? ORDER BY id", (exam_id,))
+    questions = cursor.fetchall()
+
+    paper_json = json.dumps({
+        "id": exam['id'],
+        "title": exam['title'],
+        "duration_minutes": exam['duration_minutes'],
+        "total_marks": exam['total_marks'],
+        "instructions": exam['instructions'],
+        "proctoring_enabled": exam['proctoring_enabled'],
+        "questions": [{
+            "id": q['id'],
+            "question_type": q['question_type'],
+            "question_text": q['question_text'],
+            "option_a": q['option_a'],
+            "option_b": q['option_b'],
+            "option_c": q['option_c'],
+            "option_d": q['option_d'],
+            "marks": q['marks'],
+            "language": q['language']
+        } for q in questions]
+    })
+
+    answer_key = {
+        q['id']: {
+            "question_type": q['question_type'],
+            "correct_answer": q['correct_answer'],
+            "marks": q['marks']
+        }
+        for q in questions
+    }
+
+    paper = {
+        "exam": dict_from_row(exam),
+        "paper_json": paper_json,
+        "answer_key": answer_key
+    }
+    # Rough footprint: serialized paper plus per-question key overhead
+    size = len(paper_json) + 256 * (len(answer_key) + 1)
+    return paper, size
+
+def get_exam_paper(cursor, exam_id):
+    """Returns the cached paper for an exam, loading it on a miss"""
+    return exam_papers.get_or_load(exam_id, lambda: load_exam_paper(cursor, exam_id))
+
+def saved_answers(cursor, student_exam_id):
+    """An attempt's answers so far, stored or still buffered, as [{question_id, answer_type, answer_value}]"""
+    cursor.execute('''
+        SELECT question_id, answer_type, answer_value FROM student_answers
+        WHERE student_exam_id=?
+    ''', (student_exam_id,))
+    saved = {row['question_id']: (row['answer_type'], row['answer_value']) for row in cursor.fetchall()}
+    saved.update(answer_buffer.peek(student_exam_id))
+    return [
+        {"question_id": question_id, "answer_type": answer_type, "answer_value": answer_value}
+        for question_id, (answer_type, answer_value) in saved.items()
+    ]
+
+def attempt_response(paper, message, student_exam_id, start_time, answers):
+    """An attempt's times and saved answers with its exam paper, spliced in pre-serialized"""
+    end_time = start_time + timedelta(minutes=paper['exam']['duration_minutes'])
+    envelope = json.dumps({
+        "success": True,
+        "message": message,
+        "student_exam_id": student_exam_id,
+        "start_time": start_time.isoformat(),
+        "end_time": end_time.isoformat(),
+        "answers": answers
+    })
+    body = envelope[:-1] + ', "exam": ' + paper['paper_json'] + '}'
+    return current_app.response_class(body, status=200, mimetype='application/json')
+
+def parse_is_correct(value):
+    """is_correct as 0/1 from a JSON boolean or 0/1; anything else (e.g. "false") is a ValueError"""
+    if isinstance(value, bool):
+        return int(value)
+    if isinstance(value, int) and value in (0, 1):
+        return value
+    raise ValueError("is_correct must be a boolean")
+
+def invalidate_exam_paper(exam_id):
+    """Drop an exam's cached paper after its questions or status change"""
+    exam_papers.invalidate(exam_id)
+
 @exams_bp.route('/', methods=['GET'])
 @require_auth
 def get_exams():
     """Get all exams (students see published exams, admins see all)"""
-    conn = get_db_connection()
+    conn = get_db()
     cursor = conn.cursor()
 
     if session['role'] == 'student':
-        # Get published exams
-        cursor.execute('''
-            SELECT e.* FROM exams e
-            WHERE e.status='published'
-            ORDER BY e.scheduled_date ASC
-        ''')
-        exams = cursor.fetchall()
+        try:
+            page, per_page = parse_pagination(request.args)
+        except ValueError:
+            return jsonify({"success": False, "error": "Invalid pagination parameters"}), 400
+
+        filters = ["e.status='published'"]
+        params = [session['user_id']]
+
+        if request.args.get('course_id'):
+            filters.append("e.course_id=?")
+            params.append(request.args['course_id'])
+
+        # Optional comma-separated attempt statuses, e.g. status=submitted,evaluated
+        status_filter = ''
+        statuses = [s for s in request.args.get('status', '').split(',') if s]
+        if statuses:
+            if any(s not in ATTEMPT_STATUSES for s in statuses):
+                return jsonify({"success": False, "error": "Invalid status filter"}), 400
+            status_filter = f"WHERE attempt_status IN ({', '.join('?' * len(statuses))})"
+            params.extend(statuses)
+
+        # Published exams joined with the student's latest attempt in one pass
+        listing = f'''
+            WITH latest_attempts AS (
+                SELECT exam_id, status,
+                       ROW_NUMBER() OVER (
+                           PARTITION BY exam_id ORDER BY created_at DESC, id DESC
+                       ) AS attempt_rank
+                FROM student_exams
+                WHERE student_id=?
+            ),
+            listing AS (
+                SELECT e.*, COALESCE(la.status, 'not_started') AS attempt_status
+                FROM exams e
+                LEFT JOIN latest_attempts la ON la.exam_id = e.id AND la.attempt_rank = 1
+                WHERE {' AND '.join(filters)}
+            )
+        '''
+        cursor.execute(f'''
+            {listing}
+            SELECT *, COUNT(*) OVER () AS total_count
+            FROM listing
+            {status_filter}
+            ORDER BY scheduled_date ASC, id ASC
+            LIMIT ? OFFSET ?
+        ''', params + [per_page, (page - 1) * per_page])
+        rows = cursor.fetchall()
 
         result = []
-        for exam in exams:
-            exam_dict = dict_from_row(exam)
-
-            # Check student's attempt status
-            cursor.execute('''
-                SELECT status FROM student_exams
-                WHERE exam_id=? AND student_id=?
-                ORDER BY created_at DESC LIMIT 1
-            ''', (exam['id'], session['user_id']))
-
-            attempt = cursor.fetchone()
-            exam_dict['attempt_status'] = attempt['status'] if attempt else 'not_started'
-
+        for row in rows:
+            exam_dict = dict_from_row(row)
+            exam_dict.pop('total_count')
             result.append(exam_dict)
 
-        conn.close()
-        return jsonify({"success": True, "exams": result}), 200
+        if rows:
+            total = rows[0]['total_count']
+        else:
+            # Past the last page the window count has no row to ride on
+            cursor.execute(f"{listing} SELECT COUNT(*) FROM listing {status_filter}", params)
+            total = cursor.fetchone()[0]
+
+        return jsonify({
+            "success": True,
+            "exams": result,
+            "pagination": {
+                "page": page,
+                "per_page": per_page,
+                "total": total
+            }
+        }), 200
 
     else:  # Admin
         cursor.execute("SELECT * FROM exams ORDER BY created_at DESC")
         exams = cursor.fetchall()
-        conn.close()
 
         return jsonify({"success": True, "exams": [dict_from_row(e) for e in exams]}), 200
 
@@ -60,7 +223,7 @@ def create_exam():
         if field not in data:
             return jsonify({"success": False, "error": f"Missing required field: {field}"}), 400
 
-    conn = get_db_connection()
+    conn = get_db()
     cursor = conn.cursor()
 
     try:
@@ -87,7 +250,6 @@ def create_exam():
         exam_id = cursor.lastrowid
         cursor.execute("SELECT * FROM exams WHERE id=?", (exam_id,))
         exam = cursor.fetchone()
-        conn.close()
 
         return jsonify({
             "success": True,
@@ -96,7 +258,6 @@ def create_exam():
         }), 201
 
     except Exception as e:
-        conn.close()
         return jsonify({"success": False, "error": str(e)}), 500
 
 @exams_bp.route('/<int:exam_id>/questions', methods=['POST'])
@@ -108,13 +269,12 @@ def add_question(exam_id):
     if 'question_type' not in data or 'question_text' not in data or 'marks' not in data:
         return jsonify({"success": False, "error": "Missing required fields"}), 400
 
-    conn = get_db_connection()
+    conn = get_db()
     cursor = conn.cursor()
 
     # Check if exam exists
     cursor.execute("SELECT id FROM exams WHERE id=?", (exam_id,))
     if not cursor.fetchone():
-        conn.close()
         return jsonify({"success": False, "error": "Exam not found"}), 404
 
     try:
@@ -154,10 +314,10 @@ def add_question(exam_id):
             ))
 
         conn.commit()
+        invalidate_exam_paper(exam_id)
         question_id = cursor.lastrowid
         cursor.execute("SELECT * FROM questions WHERE id=?", (question_id,))
         question = cursor.fetchone()
-        conn.close()
 
         return jsonify({
             "success": True,
@@ -166,20 +326,86 @@ def add_question(exam_id):
         }), 201
 
     except Exception as e:
-        conn.close()
+        return jsonify({"success": False, "error": str(e)}), 500
+
+@exams_bp.route('/questions/<int:question_id>', methods=['PUT'])
+@require_admin
+def update_question(question_id):
+    """Update a question (Admin only); changed test cases re-judge its coding answers"""
+    data = request.get_json() or {}
+
+    updates = {field: data[field] for field in QUESTION_FIELDS if field in data}
+    if not updates:
+        return jsonify({"success": False, "error": "No fields to update"}), 400
+    if 'test_cases' in updates:
+        updates['test_cases'] = json.dumps(updates['test_cases'])
+
+    conn = get_db()
+    cursor = conn.cursor()
+
+    cursor.execute("SELECT * FROM questions WHERE id=?", (question_id,))
+    question = cursor.fetchone()
+    if not question:
+        return jsonify({"success": False, "error": "Question not found"}), 404
+
+    old_tests = parse_test_cases(question['test_cases'])
+    tests_changed = parse_test_cases(updates.get('test_cases', question['test_cases'])) != old_tests
+    rejudge = question['question_type'] == 'coding' and (
+        tests_changed or updates.get('language', question['language']) != question['language']
+    )
+    attempt_ids = []
+
+    try:
+        with immediate_transaction(conn):
+            set_clause = ', '.join(f"{field}=?" for field in updates)
+            cursor.execute(f"UPDATE questions SET {set_clause} WHERE id=?",
+                           (*updates.values(), question_id))
+
+            if rejudge:
+                # Automatic verdicts were against the old tests; manual evaluations stand
+                cursor.execute('''
+                    SELECT DISTINCT student_exam_id FROM student_answers
+                    WHERE question_id=? AND judge_result IS NOT NULL AND evaluated_by IS NULL
+                ''', (question_id,))
+                attempt_ids = [row['student_exam_id'] for row in cursor.fetchall()]
+
+                cursor.execute('''
+                    UPDATE student_answers
+                    SET marks_awarded=0, is_correct=0, judge_result=NULL, evaluated_at=NULL
+                    WHERE question_id=? AND judge_result IS NOT NULL AND evaluated_by IS NULL
+                ''', (question_id,))
+                recompute_attempt_scores(cursor, attempt_ids)
+
+        invalidate_exam_paper(question['exam_id'])
+        if rejudge:
+            if tests_changed and old_tests:
+                judge_cache.invalidate_tests(test_set_hash(old_tests))
+            for attempt_id in attempt_ids:
+                judge_service.enqueue(attempt_id)
+
+        cursor.execute("SELECT * FROM questions WHERE id=?", (question_id,))
+
+        return jsonify({
+            "success": True,
+            "message": "Question updated successfully",
+            "question": dict_from_row(cursor.fetchone()),
+            "rejudged_attempts": len(attempt_ids)
+        }), 200
+
+    except Exception as e:
         return jsonify({"success": False, "error": str(e)}), 500
 
 @exams_bp.route('/<int:exam_id>/publish', methods=['PUT'])
 @require_admin
 def publish_exam(exam_id):
     """Publish exam to make it visible to students"""
-    conn = get_db_connection()
+    conn = get_db()
     cursor = conn.cursor()
 
     try:
         cursor.execute("UPDATE exams SET status='published' WHERE id=?", (exam_id,))
         conn.commit()
-        conn.close()
+        invalidate_exam_paper(exam_id)
 
         return jsonify({
             "success": True,
@@ -187,42 +413,40 @@ def publish_exam(exam_id):
         }), 200
 
     except Exception as e:
-        conn.close()
         return jsonify({"success": False, "error": str(e)}), 500
 
 @exams_bp.route('/<int:exam_id>/start', methods=['POST'])
 @require_student
 def start_exam(exam_id):
     """Start exam for student"""
-    conn = get_db_connection()
+    conn = get_db()
     cursor = conn.cursor()
 
-    # Get exam details
-    cursor.execute("SELECT * FROM exams WHERE id=?", (exam_id,))
-    exam = cursor.fetchone()
+    # Get exam paper (cached across students)
+    paper = get_exam_paper(cursor, exam_id)
 
-    if not exam:
-        conn.close()
+    if not paper:
         return jsonify({"success": False, "error": "Exam not found"}), 404
 
+    exam = paper['exam']
+
     if exam['status'] != 'published':
-        conn.close()
         return jsonify({"success": False, "error": "Exam not published yet"}), 400
 
-    # Check if already started
+    # Already started: resume it with the answers saved so far
     cursor.execute('''
-        SELECT id, status FROM student_exams
+        SELECT id, status, start_time FROM student_exams
         WHERE exam_id=? AND student_id=? AND status='in_progress'
     ''', (exam_id, session['user_id']))
 
     existing_attempt = cursor.fetchone()
     if existing_attempt:
-        conn.close()
-        return jsonify({"success": False, "error": "Exam already started"}), 400
+        return attempt_response(paper, "Exam resumed", existing_attempt['id'],
+                                datetime.fromisoformat(existing_attempt['start_time']),
+                                saved_answers(cursor, existing_attempt['id']))
 
     # Create student exam entry
     start_time = datetime.now()
-    end_time = start_time + timedelta(minutes=exam['duration_minutes'])
 
     try:
         cursor.execute('''
@@ -231,148 +455,127 @@ def start_exam(exam_id):
         ''', (exam_id, session['user_id'], start_time))
         conn.commit()
 
-        student_exam_id = cursor.lastrowid
-
-        # Get questions (without correct answers)
-        cursor.execute('''
-            SELECT id, question_type, question_text, option_a, option_b,
-                   option_c, option_d, marks, language
-            FROM questions
-            WHERE exam_id=?
-        ''', (exam_id,))
-        questions = cursor.fetchall()
-
-        conn.close()
-
-        return jsonify({
-            "success": True,
-            "message": "Exam started",
-            "student_exam_id": student_exam_id,
-            "exam": {
-                "id": exam['id'],
-                "title": exam['title'],
-                "duration_minutes": exam['duration_minutes'],
-                "total_marks": exam['total_marks'],
-                "instructions": exam['instructions'],
-                "proctoring_enabled": exam['proctoring_enabled'],
-                "questions": [dict_from_row(q) for q in questions]
-            },
-            "start_time": start_time.isoformat(),
-            "end_time": end_time.isoformat()
-        }), 200
+        return attempt_response(paper, "Exam started", cursor.lastrowid, start_time, [])
 
     except Exception as e:
-        conn.close()
         return jsonify({"success": False, "error": str(e)}), 500
 
 @exams_bp.route('/<int:exam_id>/submit', methods=['POST'])
 @require_student
 def submit_exam(exam_id):
-    """Submit exam answers"""
+    """Seal an attempt: grade autosaved and submitted answers together"""
     data = request.get_json()
 
-    if 'student_exam_id' not in data or 'answers' not in data:
+    if 'student_exam_id' not in data:
         return jsonify({"success": False, "error": "Missing required fields"}), 400
 
-    student_exam_id = data['student_exam_id']
-    answers = data['answers']
+    try:
+        student_exam_id = int(data['student_exam_id'])
+        # Answers not yet autosaved; everything else is already on the server
+        answers = {
+            answer['question_id']: (answer['answer_type'], answer['answer_value'])
+            for answer in data.get('answers', [])
+        }
+    except (KeyError, TypeError, ValueError):
+        return jsonify({"success": False, "error": "Invalid answers"}), 400
 
-    conn = get_db_connection()
+    conn = get_db()
     cursor = conn.cursor()
 
-    # Validate student_exam belongs to user
-    cursor.execute('''
-        SELECT * FROM student_exams
-        WHERE id=? AND student_id=?
-    ''', (student_exam_id, session['user_id']))
-
-    student_exam = cursor.fetchone()
-    if not student_exam:
-        conn.close()
-        return jsonify({"success": False, "error": "Student exam not found"}), 404
-
-    if student_exam['status'] == 'submitted':
-        conn.close()
-        return jsonify({"success": False, "error": "Exam already submitted"}), 400
-
-    # Get exam and questions
-    cursor.execute("SELECT * FROM exams WHERE id=?", (exam_id,))
-    exam = cursor.fetchone()
-
-    cursor.execute("SELECT * FROM questions WHERE exam_id=?", (exam_id,))
-    questions = {q['id']: dict_from_row(q) for q in cursor.fetchall()}
+    # Get exam and grading key (cached across students)
+    paper = get_exam_paper(cursor, exam_id)
+    if not paper:
+        return jsonify({"success": False, "error": "Exam not found"}), 404
 
-    # Process answers
-    mcq_score = 0
+    exam = paper['exam']
     coding_score = 0
-    has_coding = False
+    buffered = {}
 
     try:
-        for answer in answers:
-            question_id = answer['question_id']
-            question = questions.get(question_id)
-
-            if not question:
-                continue
-
-            is_correct = 0
-            marks_awarded = 0
+        with immediate_transaction(conn):
+            # Validate student_exam belongs to user; read under the write lock
+            # so two concurrent submits of one attempt cannot both succeed
+            cursor.execute('''
+                SELECT * FROM student_exams
+                WHERE id=? AND student_id=? AND exam_id=?
+            ''', (student_exam_id, session['user_id'], exam_id))
 
-            # Auto-grade MCQ
-            if question['question_type'] == 'mcq':
-                if answer['answer_value'] == question['correct_answer']:
-                    is_correct = 1
-                    marks_awarded = question['marks']
-                    mcq_score += marks_awarded
+            student_exam = cursor.fetchone()
+            if not student_exam:
+                return jsonify({"success": False, "error": "Student exam not found"}), 404
 
-            # Coding questions - set for manual evaluation
-            else:
-                has_coding = True
-                # Will be evaluated manually or auto-evaluated later
-                is_correct = 0
-                marks_awarded = 0
+            # An attempt auto-submitted for violations is sealed but not yet graded
+            # (no result); its submit grades the answers it had at that point
+            auto_submitted = student_exam['status'] == 'submitted' and student_exam['result'] is None
+            if student_exam['status'] in ['submitted', 'evaluated'] and not auto_submitted:
+                return jsonify({"success": False, "error": "Exam already submitted"}), 400
 
-            # Save answer
+            # Merge autosaved rows, still-buffered autosaves and the request (newest wins)
             cursor.execute('''
+                SELECT question_id, answer_type, answer_value FROM student_answers
+                WHERE student_exam_id=?
+            ''', (student_exam_id,))
+            saved = {row['question_id']: (row['answer_type'], row['answer_value']) for row in cursor.fetchall()}
+
+            buffered = answer_buffer.take(student_exam_id)
+            merged = dict(saved)
+            merged.update(buffered)
+            merged.update(answers)
+
+            answer_rows, mcq_score, has_coding = grade_answers(student_exam_id, [
+                {"question_id": question_id, "answer_type": answer_type, "answer_value": answer_value}
+                for question_id, (answer_type, answer_value) in merged.items()
+            ], paper['answer_key'])
+
+            # Write only new, changed or correct answers; the rest are marked wrong in bulk
+            cursor.executemany('''
                 INSERT INTO student_answers (
                     student_exam_id, question_id, answer_type, answer_value,
                     is_correct, marks_awarded
                 ) VALUES (?, ?, ?, ?, ?, ?)
-            ''', (
-                student_exam_id,
-                question_id,
-                answer['answer_type'],
-                answer['answer_value'],
-                is_correct,
-                marks_awarded
-            ))
-
-        # Update student_exam
-        end_time = datetime.now()
-        start_time = datetime.fromisoformat(student_exam['start_time'])
-        time_taken = int((end_time - start_time).total_seconds() / 60)
+                ON CONFLICT(student_exam_id, question_id) DO UPDATE SET
+                    answer_type=excluded.answer_type,
+                    answer_value=excluded.answer_value,
+                    is_correct=excluded.is_correct,
+                    marks_awarded=excluded.marks_awarded
+            ''', [row for row in answer_rows if row[4] or saved.get(row[1]) != (row[2], row[3])])
 
-        total_score = mcq_score + coding_score
-        percentage = (total_score / exam['total_marks']) * 100 if exam['total_marks'] > 0 else 0
+            cursor.execute('''
+                UPDATE student_answers SET is_correct=0, marks_awarded=0
+                WHERE student_exam_id=? AND is_correct IS NULL
+            ''', (student_exam_id,))
+
+            # Update student_exam; an auto-submitted attempt ended when it was sealed
+            # (CURRENT_TIMESTAMP, UTC; start_time is local)
+            end_time = datetime.now()
+            if auto_submitted and student_exam['end_time']:
+                sealed_at = datetime.fromisoformat(student_exam['end_time']).replace(tzinfo=timezone.utc)
+                end_time = sealed_at.astimezone().replace(tzinfo=None)
+            start_time = datetime.fromisoformat(student_exam['start_time'])
+            time_taken = int((end_time - start_time).total_seconds() / 60)
+
+            total_score = mcq_score + coding_score
+            percentage = (total_score / exam['total_marks']) * 100 if exam['total_marks'] > 0 else 0
+
+            # Determine result
+            if has_coding:
+                result = 'pending_evaluation'
+                status = 'submitted'
+            else:
+                result = 'pass' if total_score >= exam['passing_marks'] else 'fail'
+                status = 'evaluated'
 
-        # Determine result
+            cursor.execute('''
+                UPDATE student_exams
+                SET status=?, end_time=?, time_taken_minutes=?, mcq_score=?,
+                    coding_score=?, total_score=?, percentage=?, result=?
+                WHERE id=?
+            ''', (status, end_time, time_taken, mcq_score, coding_score,
+                  total_score, percentage, result, student_exam_id))
+
+        # Coding answers are judged in the background
         if has_coding:
-            result = 'pending_evaluation'
-            status = 'submitted'
-        else:
-            result = 'pass' if total_score >= exam['passing_marks'] else 'fail'
-            status = 'evaluated'
-
-        cursor.execute('''
-            UPDATE student_exams
-            SET status=?, end_time=?, time_taken_minutes=?, mcq_score=?,
-                coding_score=?, total_score=?, percentage=?, result=?
-            WHERE id=?
-        ''', (status, end_time, time_taken, mcq_score, coding_score,
-              total_score, percentage, result, student_exam_id))
-
-        conn.commit()
-        conn.close()
+            judge_service.enqueue(student_exam_id)
 
         return jsonify({
             "success": True,
@@ -388,14 +591,90 @@ def submit_exam(exam_id):
         }), 200
 
     except Exception as e:
-        conn.close()
+        # The attempt is still open; keep its buffered autosaves
+        answer_buffer.restore(student_exam_id, buffered)
         return jsonify({"success": False, "error": str(e)}), 500
 
+@exams_bp.route('/attempts/<int:student_exam_id>', methods=['GET'])
+@require_student
+def get_attempt(student_exam_id):
+    """An in-progress attempt's paper, times and saved answers, to load or reload the exam page"""
+    conn = get_db()
+    cursor = conn.cursor()
+
+    cursor.execute('''
+        SELECT exam_id, status, start_time FROM student_exams
+        WHERE id=? AND student_id=?
+    ''', (student_exam_id, session['user_id']))
+
+    attempt = cursor.fetchone()
+    if not attempt:
+        return jsonify({"success": False, "error": "Student exam not found"}), 404
+
+    if attempt['status'] != 'in_progress':
+        return jsonify({"success": False, "error": "Exam already submitted"}), 400
+
+    paper = get_exam_paper(cursor, attempt['exam_id'])
+    if not paper:
+        return jsonify({"success": False, "error": "Exam not found"}), 404
+
+    return attempt_response(paper, "Exam in progress", student_exam_id,
+                            datetime.fromisoformat(attempt['start_time']),
+                            saved_answers(cursor, student_exam_id))
+
+@exams_bp.route('/attempts/<int:student_exam_id>/answers', methods=['PUT'])
+@require_student
+def autosave_answers(student_exam_id):
+    """Autosave changed answers of an in-progress attempt (buffered, written in batches)"""
+    data = request.get_json()
+
+    if not data or not isinstance(data.get('answers'), list):
+        return jsonify({"success": False, "error": "Missing answers"}), 400
+
+    answers = data['answers']
+
+    conn = get_db()
+    cursor = conn.cursor()
+
+    cursor.execute('''
+        SELECT exam_id, status FROM student_exams
+        WHERE id=? AND student_id=?
+    ''', (student_exam_id, session['user_id']))
+
+    attempt = cursor.fetchone()
+    if not attempt:
+        return jsonify({"success": False, "error": "Student exam not found"}), 404
+
+    if attempt['status'] != 'in_progress':
+        return jsonify({"success": False, "error": "Exam already submitted"}), 400
+
+    # Validate against the cached paper instead of querying questions
+    paper = get_exam_paper(cursor, attempt['exam_id'])
+    answer_key = paper['answer_key'] if paper else {}
+
+    for answer in answers:
+        # Lists and dicts can't be looked up and True would match question 1
+        if (not isinstance(answer, dict)
+                or not isinstance(answer.get('question_id'), int) or isinstance(answer['question_id'], bool)
+                or answer['question_id'] not in answer_key
+                or answer.get('answer_type') not in ['mcq_option', 'code']
+                or not isinstance(answer.get('answer_value', ''), str)):
+            return jsonify({"success": False, "error": "Invalid answer"}), 400
+        answer.setdefault('answer_value', '')
+
+    answer_buffer.add(student_exam_id, answers)
+
+    return jsonify({
+        "success": True,
+        "message": "Answers saved",
+        "saved": len(answers)
+    }), 202
+
 @exams_bp.route('/<int:exam_id>/results', methods=['GET'])
 @require_student
 def get_results(exam_id):
     """Get student's exam result"""
-    conn = get_db_connection()
+    conn = get_db()
     cursor = conn.cursor()
 
     cursor.execute('''
@@ -407,7 +686,6 @@ def get_results(exam_id):
     ''', (exam_id, session['user_id']))
 
     result = cursor.fetchone()
-    conn.close()
 
     if not result:
         return jsonify({"success": False, "error": "Exam not attempted"}), 404
@@ -446,6 +724,112 @@ def get_results(exam_id):
         }
     }), 200
 
+@exams_bp.route('/<int:exam_id>/judge', methods=['POST'])
+@require_admin
+def judge_exam(exam_id):
+    """Queue every attempt with unevaluated coding answers for automatic judging (Admin only)"""
+    conn = get_db()
+    cursor = conn.cursor()
+
+    cursor.execute('''
+        SELECT DISTINCT se.id FROM student_exams se
+        JOIN student_answers sa ON sa.student_exam_id = se.id
+        WHERE se.exam_id=? AND se.status='submitted'
+          AND sa.answer_type='code' AND sa.evaluated_at IS NULL
+    ''', (exam_id,))
+    attempt_ids = [row['id'] for row in cursor.fetchall()]
+
+    queued = sum(1 for attempt_id in attempt_ids if judge_service.enqueue(attempt_id))
+
+    return jsonify({
+        "success": True,
+        "message": f"Queued {queued} of {len(attempt_ids)} attempts for judging",
+        "queued": queued
+    }), 202
+
+@exams_bp.route('/answers/evaluate', methods=['PUT'])
+@require_admin
+def evaluate_answers():
+    """
+    Evaluate many coding answers in one transaction (Admin only)
+    Body: {"evaluations": [{"answer_id", "marks_awarded", "is_correct"}, ...]}
+    (or [answer_id, marks_awarded, is_correct] triples). Each affected attempt
+    is rescored once, however many of its answers are in the batch.
+    """
+    data = request.get_json() or {}
+    evaluations = data.get('evaluations')
+
+    if not isinstance(evaluations, list) or not evaluations:
+        return jsonify({"success": False, "error": "Missing required fields"}), 400
+    if len(evaluations) > MAX_BATCH_EVALUATIONS:
+        return jsonify({
+            "success": False,
+            "error": f"At most {MAX_BATCH_EVALUATIONS} evaluations per request"
+        }), 400
+
+    try:
+        # Later entries for the same answer win
+        updates = {}
+        for item in evaluations:
+            if isinstance(item, dict):
+                answer_id, marks_awarded, is_correct = item['answer_id'], item['marks_awarded'], item['is_correct']
+            else:
+                answer_id, marks_awarded, is_correct = item
+            updates[int(answer_id)] = (int(marks_awarded), parse_is_correct(is_correct))
+    except (KeyError, TypeError, ValueError):
+        return jsonify({"success": False, "error": "Invalid evaluations"}), 400
+
+    conn = get_db()
+    cursor = conn.cursor()
+
+    try:
+        with immediate_transaction(conn):
+            cursor.execute('''
+                SELECT sa.id, sa.student_exam_id, se.status
+                FROM student_answers sa
+                JOIN student_exams se ON se.id = sa.student_exam_id
+                WHERE sa.id IN (SELECT value FROM json_each(?))
+            ''', (json.dumps(list(updates)),))
+            rows = cursor.fetchall()
+            attempts = {row['id']: row['student_exam_id'] for row in rows}
+
+            missing = [answer_id for answer_id in updates if answer_id not in attempts]
+            if missing:
+                return jsonify({
+                    "success": False,
+                    "error": "Answers not found",
+                    "answer_ids": missing
+                }), 404
+
+            unsubmitted = [row['id'] for row in rows if row['status'] not in EVALUABLE_STATUSES]
+            if unsubmitted:
+                return jsonify({
+                    "success": False,
+                    "error": "Answers belong to attempts that are not submitted",
+                    "answer_ids": unsubmitted
+                }), 400
+
+            cursor.executemany('''
+                UPDATE student_answers
+                SET marks_awarded=?, is_correct=?, evaluated_by=?, evaluated_at=CURRENT_TIMESTAMP
+                WHERE id=?
+            ''', [
+                (marks_awarded, is_correct, session['user_id'], answer_id)
+                for answer_id, (marks_awarded, is_correct) in updates.items()
+            ])
+
+            recompute_attempt_scores(cursor, attempts.values())
+
+        return jsonify({
+            "success": True,
+            "message": f"Evaluated {len(updates)} answers",
+            "evaluated": len(updates),
+            "attempts_updated": len(set(attempts.values()))
+        }), 200
+
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 500
+
 @exams_bp.route('/answers/<int:answer_id>/evaluate', methods=['PUT'])
 @require_admin
 def evaluate_answer(answer_id):
@@ -454,51 +838,39 @@ def evaluate_answer(answer_id):
 
     if 'marks_awarded' not in data or 'is_correct' not in data:
         return jsonify({"success": False, "error": "Missing required fields"}), 400
+    try:
+        is_correct = parse_is_correct(data['is_correct'])
+    except ValueError:
+        return jsonify({"success": False, "error": "Invalid is_correct"}), 400
 
-    conn = get_db_connection()
+    conn = get_db()
     cursor = conn.cursor()
 
     try:
+        # Get student_exam_id to recalculate scores
+        cursor.execute('''
+            SELECT sa.student_exam_id, se.status
+            FROM student_answers sa
+            JOIN student_exams se ON se.id = sa.student_exam_id
+            WHERE sa.id=?
+        ''', (answer_id,))
+        answer = cursor.fetchone()
+        if not answer:
+            return jsonify({"success": False, "error": "Answer not found"}), 404
+        if answer['status'] not in EVALUABLE_STATUSES:
+            return jsonify({"success": False, "error": "Attempt is not submitted"}), 400
+        student_exam_id = answer['student_exam_id']
+
         # Update answer
         cursor.execute('''
             UPDATE student_answers
             SET marks_awarded=?, is_correct=?, evaluated_by=?, evaluated_at=CURRENT_TIMESTAMP
             WHERE id=?
-        ''', (data['marks_awarded'], data['is_correct'], session['user_id'], answer_id))
+        ''', (data['marks_awarded'], is_correct, session['user_id'], answer_id))
 
-        # Get student_exam_id to recalculate scores
-        cursor.execute("SELECT student_exam_id FROM student_answers WHERE id=?", (answer_id,))
-        student_exam_id = cursor.fetchone()['student_exam_id']
-
-        # Recalculate coding score
-        cursor.execute('''
-            SELECT SUM(marks_awarded) as total FROM student_answers
-            WHERE student_exam_id=? AND answer_type='code'
-        ''', (student_exam_id,))
-        coding_score = cursor.fetchone()['total'] or 0
-
-        # Get MCQ score and exam details
-        cursor.execute('''
-            SELECT se.mcq_score, e.total_marks, e.passing_marks
-            FROM student_exams se
-            JOIN exams e ON se.exam_id = e.id
-            WHERE se.id=?
-        ''', (student_exam_id,))
-        exam_data = cursor.fetchone()
-
-        total_score = exam_data['mcq_score'] + coding_score
-        percentage = (total_score / exam_data['total_marks']) * 100
-        result = 'pass' if total_score >= exam_data['passing_marks'] else 'fail'
-
-        # Update student_exam
-        cursor.execute('''
-            UPDATE student_exams
-            SET coding_score=?, total_score=?, percentage=?, result=?, status='evaluated'
-            WHERE id=?
-        ''', (coding_score, total_score, percentage, result, student_exam_id))
+        recompute_attempt_score(cursor, student_exam_id)
 
         conn.commit()
-        conn.close()
 
         return jsonify({
             "success": True,
@@ -506,5 +878,4 @@ def evaluate_answer(answer_id):
         }), 200
 
     except Exception as e:
-        conn.close()
         return jsonify({"success": False, "error": str(e)}), 500
@@ -0,0 +1,119 @@
+"""
+Near-duplicate frame detection for proctoring.
+
+A seated candidate's consecutive frames are nearly identical, so before a
+frame is analysed its signature (a 32x24 grayscale thumbnail with the mean
+brightness removed, decoded at 1/8 scale straight from the JPEG) is compared
+with the last analysed frame of the same attempt. If the mean absolute pixel
+difference is under FRAME_DEDUPE_THRESHOLD the previous analysis is reused
+and no model runs.
+
+Only violation-free analyses are reused, so an ongoing violation is still
+checked frame by frame, and at most FRAME_DEDUPE_MAX_SKIPS frames in a row
+are skipped before a full analysis is forced.
+"""
+import threading
+import time
+from collections import deque
+import cv2
+import numpy as np
+from config import Config
+
+SIGNATURE_SIZE = (32, 24)
+
+# Recent distances kept to help tune the threshold
+DISTANCE_SAMPLES = 1000
+
+def frame_signature(frame_bytes):
+    """Brightness-normalised thumbnail of a JPEG, or None if it doesn't decode"""
+    img = cv2.imdecode(np.frombuffer(frame_bytes, np.uint8), cv2.IMREAD_REDUCED_GRAYSCALE_8)
+    if img is None:
+        return None
+    small = cv2.resize(img, SIGNATURE_SIZE, interpolation=cv2.INTER_AREA).astype(np.float32)
+    # Auto-exposure shifts every pixel; that alone isn't a change in the scene
+    return small - small.mean()
+
+def signature_distance(a, b):
+    """Mean absolute difference between two signatures, in gray levels"""
+    return float(np.abs(a - b).mean())
+
+class FrameDeduper:
+    """Decides per attempt whether a frame can reuse the previous analysis"""
+
+    def __init__(self, threshold, max_skips):
+        self.threshold = threshold
+        self.max_skips = max_skips
+        self._lock = threading.Lock()
+        self._distances = deque(maxlen=DISTANCE_SAMPLES)
+        self.checked = 0
+        self.skipped = 0
+
+    def check(self, state, frame_bytes):
+        """
+        Returns (reused_analysis, signature): the analysis to answer with if the
+        frame is a near-duplicate (else None), and the frame's signature to pass
+        to remember() once it has been analysed
+        """
+        if self.threshold <= 0:
+            return None, None
+
+        started = time.perf_counter()
+        signature = frame_signature(frame_bytes)
+        previous = state.get('signature')
+        if signature is None or previous is None or previous.shape != signature.shape:
+            return None, signature
+        if state.get('escalate') or state.get('skips', 0) >= self.max_skips:
+            return None, signature
+
+        distance = signature_distance(signature, previous)
+        with self._lock:
+            self.checked += 1
+            self._distances.append(distance)
+            if distance >= self.threshold:
+                return None, signature
+            self.skipped += 1
+
+        state['skips'] = state.get('skips', 0) + 1
+        analysis = dict(state['analysis'])
+        analysis.update({
+            "reused": True,
+            "difference": round(distance, 2),
+            "stages_run": [],
+            "escalation": None,
+            "timings_ms": {"dedupe": round((time.perf_counter() - started) * 1000, 2)}
+        })
+        return analysis, signature
+
+    def remember(self, state, signature, analysis, violation_type):
+        """Record an analysed frame; only violation-free ones may be reused"""
+        if signature is None:
+            return
+        if violation_type:
+            state.pop('signature', None)
+            state.pop('analysis', None)
+        else:
+            state['signature'] = signature
+            state['analysis'] = analysis
+        state['skips'] = 0
+
+    def stats(self):
+        """Returns skip counters and the distribution of recent distances"""
+        with self._lock:
+            distances = sorted(self._distances)
+            checked, skipped = self.checked, self.skipped
+
+        def percentile(p):
+            return round(distances[min(len(distances) - 1, int(len(distances) * p))], 2) if distances else None
+
+        return {
+            "threshold": self.threshold,
+            "max_skips": self.max_skips,
+            "checked": checked,
+            "skipped": skipped,
+            "skip_rate": skipped / checked if checked else 0.0,
+            "distance_p10": percentile(0.10),
+            "distance_p50": percentile(0.50),
+            "distance_p90": percentile(0.90)
+        }
+
+frame_deduper = FrameDeduper(Config.FRAME_DEDUPE_THRESHOLD, Config.FRAME_DEDUPE_MAX_SKIPS)
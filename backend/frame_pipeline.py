@@ -0,0 +1,177 @@
+"""
+Decode-once frame pipeline for proctoring analysis.
+
+A Frame decodes the uploaded JPEG a single time and builds the views the
+detectors need (grayscale, RGB) on first use, so every stage shares them.
+Frames wider than FRAME_ANALYSIS_MAX_WIDTH are downscaled once before any
+view is built; detectors report boxes in original image coordinates via
+Frame.scale.
+
+A FramePipeline runs named stages over one Frame, or over a batch of Frames
+where a stage can process them in one call (batched YOLO inference), and
+records how long each stage took, per frame and in rolling statistics.
+"""
+import threading
+import time
+from collections import deque, namedtuple
+import cv2
+import numpy as np
+from config import Config
+
+# Per-stage timing samples kept for percentiles
+TIMING_SAMPLES = 1000
+
+# fn(frame) -> dict; optional batch_fn(frames) -> [dict] for batch-capable
+# detectors; optional when(frame, results) -> bool to run the stage conditionally
+Stage = namedtuple('Stage', ['name', 'fn', 'batch_fn', 'when'], defaults=[None, None])
+
+class Frame:
+    """One webcam frame, decoded once, with lazily built shared views"""
+
+    def __init__(self, image_bytes, max_width=None, context=None):
+        self.image_bytes = image_bytes
+        self.context = context or {}  # per-attempt hints from the caller, e.g. for stage conditions
+        self.max_width = max_width if max_width is not None else Config.FRAME_ANALYSIS_MAX_WIDTH
+        self.scale = 1.0
+        self._views = {}
+
+    @property
+    def image(self):
+        """BGR image at analysis resolution, or None if the bytes don't decode"""
+        if 'image' not in self._views:
+            img = cv2.imdecode(np.frombuffer(self.image_bytes, np.uint8), cv2.IMREAD_COLOR)
+            if img is not None and self.max_width and img.shape[1] > self.max_width:
+                self.scale = self.max_width / img.shape[1]
+                img = cv2.resize(img, None, fx=self.scale, fy=self.scale, interpolation=cv2.INTER_AREA)
+            self._views['image'] = img
+        return self._views['image']
+
+    @property
+    def valid(self):
+        return self.image is not None
+
+    @property
+    def gray(self):
+        if 'gray' not in self._views:
+            self._views['gray'] = cv2.cvtColor(self.image, cv2.COLOR_BGR2GRAY)
+        return self._views['gray']
+
+    @property
+    def rgb(self):
+        if 'rgb' not in self._views:
+            self._views['rgb'] = cv2.cvtColor(self.image, cv2.COLOR_BGR2RGB)
+        return self._views['rgb']
+
+    def to_original(self, box):
+        """Map an (x, y, w, h) box from analysis to original image coordinates"""
+        return [int(round(v / self.scale)) for v in box]
+
+def as_frame(image):
+    """Accept a Frame or raw image bytes"""
+    return image if isinstance(image, Frame) else Frame(image)
+
+class PipelineStats:
+    """Rolling per-stage latency statistics"""
+
+    def __init__(self, samples=TIMING_SAMPLES):
+        self._samples = samples
+        self._stages = {}  # name -> {"count", "total_ms", "recent": deque}
+        self._lock = threading.Lock()
+        self.frames = 0
+
+    def record(self, timings):
+        with self._lock:
+            self.frames += 1
+            for name, ms in timings.items():
+                stage = self._stages.get(name)
+                if stage is None:
+                    stage = self._stages[name] = {
+                        "count": 0, "total_ms": 0.0, "recent": deque(maxlen=self._samples)
+                    }
+                stage["count"] += 1
+                stage["total_ms"] += ms
+                stage["recent"].append(ms)
+
+    def snapshot(self):
+        """Returns {stage: {count, mean_ms, p50_ms, p95_ms, p99_ms, max_ms}} over recent frames"""
+        with self._lock:
+            stages = {name: (s["count"], s["total_ms"], sorted(s["recent"])) for name, s in self._stages.items()}
+            frames = self.frames
+
+        def percentile(values, p):
+            return round(values[min(len(values) - 1, int(len(values) * p))], 2)
+
+        return {
+            "frames": frames,
+            "stages": {
+                name: {
+                    "count": count,
+                    "mean_ms": round(total / count, 2),
+                    "p50_ms": percentile(recent, 0.50),
+                    "p95_ms": percentile(recent, 0.95),
+                    "p99_ms": percentile(recent, 0.99),
+                    "max_ms": round(recent[-1], 2)
+                }
+                for name, (count, total, recent) in stages.items()
+            }
+        }
+
+    def reset(self):
+        with self._lock:
+            self._stages.clear()
+            self.frames = 0
+
+class FramePipeline:
+    """Ordered detector stages run over decoded Frames"""
+
+    def __init__(self, stages):
+        self.stages = [Stage(*stage) for stage in stages]
+        self.stats = PipelineStats()
+
+    def run(self, frame):
+        """
+        Decode the frame and run every stage on it
+        Returns (results {stage: result}, timings_ms {stage: ms}); stages are
+        skipped when the frame doesn't decode
+        """
+        return self.run_batch([frame])[0]
+
+    def run_batch(self, frames):
+        """
+        Run every stage over several frames; stages with a batch_fn are called
+        once for all decodable frames and their time is split evenly between them
+        A stage with a when condition only runs on frames it returns True for,
+        and only stages that ran appear in a frame's timings
+        Returns [(results, timings_ms)] in frame order
+        """
+        results = [{} for _ in frames]
+        timings = [{} for _ in frames]
+
+        for frame, frame_timings in zip(frames, timings):
+            started = time.perf_counter()
+            frame.valid
+            frame_timings['decode'] = (time.perf_counter() - started) * 1000
+        valid = [i for i, frame in enumerate(frames) if frame.valid]
+
+        for name, stage, batch_stage, when in self.stages:
+            selected = [i for i in valid if when is None or when(frames[i], results[i])]
+
+            if batch_stage is not None and len(selected) > 1:
+                started = time.perf_counter()
+                outputs = batch_stage([frames[i] for i in selected])
+                share = (time.perf_counter() - started) * 1000 / len(selected)
+                for i, output in zip(selected, outputs):
+                    results[i][name] = output
+                    timings[i][name] = share
+            else:
+                for i in selected:
+                    started = time.perf_counter()
+                    results[i][name] = stage(frames[i])
+                    timings[i][name] = (time.perf_counter() - started) * 1000
+
+        for frame_timings in timings:
+            self.stats.record(frame_timings)
+        return [
+            (frame_results, {name: round(ms, 2) for name, ms in frame_timings.items()})
+            for frame_results, frame_timings in zip(results, timings)
+        ]
@@ -0,0 +1,254 @@
+"""
+Asynchronous proctoring frame analysis.
+
+/frame hands the uploaded bytes to a FrameAnalysisQueue and answers 202 with
+a job id instead of running the detectors on the request thread. Analysis
+runs in FRAME_ANALYSIS_WORKERS worker processes, started with 'spawn' so
+each loads its own model instances. When a result comes back a collector
+thread runs the on_result callback, which records any violation, and the
+result is kept for FRAME_RESULT_TTL seconds for the client to poll.
+
+Frames are micro-batched: whenever a worker is free, the dispatcher hands it
+every waiting frame (from any attempt) up to FRAME_BATCH_SIZE, waiting at
+most FRAME_BATCH_WAIT_MS after the oldest one arrived for more to join, so
+the worker can run one batched YOLO inference instead of one per frame. Under
+load frames accumulate while workers are busy and batches fill on their own.
+
+At most FRAME_QUEUE_SIZE frames may be waiting or running at once; beyond
+that submit() refuses the frame so clients back off instead of waiting
+behind an ever-growing queue.
+
+Results live in this process's memory, so a client must poll the same
+server process that accepted its frame.
+"""
+import multiprocessing
+import queue
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+# Upper bound on finished results held for polling, whatever the TTL
+MAX_STORED_RESULTS = 10000
+
+def _init_worker(warm_up=None):
+    """Runs once in each worker process before it takes any frames"""
+    import cv2
+    # One batch per process at a time; don't let OpenCV oversubscribe the cores
+    cv2.setNumThreads(1)
+    if warm_up is not None:
+        warm_up()
+
+def _ping():
+    """No-op job; completes once a worker process has finished starting up"""
+    return True
+
+class FrameAnalysisQueue:
+    """Bounded, micro-batching hand-off of frames to a pool of analysis worker processes"""
+
+    def __init__(self, analyze_batch, on_result, workers, queue_size, result_ttl,
+                 batch_size=1, batch_wait_ms=0, warm_up=None):
+        self.analyze_batch = analyze_batch  # module-level fn([(frame_bytes, context)]) -> [result], run in a worker
+        self.on_result = on_result  # fn(job, result) -> analysis, run in this process
+        self.warm_up_fn = warm_up  # optional module-level fn run in each worker as it starts, e.g. to load models
+        self.workers = workers
+        self.queue_size = queue_size
+        self.result_ttl = result_ttl
+        self.batch_size = max(1, batch_size)
+        self.batch_wait = batch_wait_ms / 1000
+        self._executor = None
+        self._dispatcher = None
+        self._collector = None
+        self._finished = queue.Queue()  # (batch, future) of batches back from a worker
+        self._jobs = OrderedDict()  # job_id -> job dict, oldest first
+        self._waiting = deque()  # jobs not yet handed to a worker
+        self._in_flight = 0
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        self._free_workers = threading.Semaphore(workers)
+        self._warm_up_futures = None
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.batches = 0
+        self.batched_frames = 0
+
+    def submit(self, student_exam_id, student_id, frame_bytes, context=None):
+        """
+        Queue a frame for analysis; returns the job id, or None if the queue is full
+        context is passed to the worker alongside the frame
+        """
+        with self._lock:
+            self._prune()
+            if self._in_flight >= self.queue_size:
+                self.rejected += 1
+                return None
+
+            if self._dispatcher is None:
+                # Started on first frame so other processes stay light
+                self._dispatcher = threading.Thread(target=self._dispatch, name='frame-dispatch', daemon=True)
+                self._dispatcher.start()
+                self._collector = threading.Thread(target=self._collect, name='frame-collect', daemon=True)
+                self._collector.start()
+
+            job_id = uuid.uuid4().hex
+            job = {
+                "job_id": job_id,
+                "student_exam_id": student_exam_id,
+                "student_id": student_id,
+                "status": "pending",
+                "frame_bytes": frame_bytes,
+                "context": context,
+                "submitted_at": time.time(),
+                "queued_at": time.monotonic()
+            }
+            self._jobs[job_id] = job
+            self._waiting.append(job)
+            self._in_flight += 1
+            self._wakeup.notify()
+            return job_id
+
+    def get(self, job_id):
+        """Returns the job dict (without the frame) or None if unknown or expired"""
+        with self._lock:
+            self._prune()
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            return {key: value for key, value in job.items() if key not in ('frame_bytes', 'context', 'queued_at')}
+
+    def stats(self):
+        """Returns queue depth, batching and result counters"""
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "waiting": len(self._waiting),
+                "in_flight": self._in_flight,
+                "queue_size": self.queue_size,
+                "batch_size": self.batch_size,
+                "batch_wait_ms": self.batch_wait * 1000,
+                "batches": self.batches,
+                "mean_batch_size": round(self.batched_frames / self.batches, 2) if self.batches else 0.0,
+                "stored_results": len(self._jobs),
+                "completed": self.completed,
+                "failed": self.failed,
+                "rejected": self.rejected
+            }
+
+    def warm_up(self):
+        """Start the worker processes now rather than on the first frame"""
+        with self._lock:
+            if self._warm_up_futures is None:
+                executor = self._get_executor()
+                self._warm_up_futures = [executor.submit(_ping) for _ in range(self.workers)]
+
+    def ready(self):
+        """False until warm_up() has been called and every worker has started"""
+        with self._lock:
+            futures = self._warm_up_futures
+        return futures is not None and all(future.done() for future in futures)
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+    def _dispatch(self):
+        while True:
+            # Only form a batch once a worker can take it, so frames that
+            # arrive while every worker is busy join the next batch
+            self._free_workers.acquire()
+            with self._wakeup:
+                while not self._waiting:
+                    self._wakeup.wait()
+                deadline = self._waiting[0]['queued_at'] + self.batch_wait
+                while len(self._waiting) < self.batch_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._wakeup.wait(remaining)
+
+                batch = [self._waiting.popleft() for _ in range(min(self.batch_size, len(self._waiting)))]
+                self.batches += 1
+                self.batched_frames += len(batch)
+
+                frames = [(job['frame_bytes'], job['context']) for job in batch]
+                try:
+                    try:
+                        future = self._get_executor().submit(self.analyze_batch, frames)
+                    except BrokenProcessPool:
+                        # A worker died (e.g. killed for memory); start a fresh pool
+                        self._executor = None
+                        future = self._get_executor().submit(self.analyze_batch, frames)
+                except Exception as e:
+                    future, error = None, e
+
+            if future is None:
+                # Fail this batch but keep dispatching; the next batch retries the pool
+                print(f"Warning: could not dispatch {len(batch)} proctoring frames: {error}")
+                self._free_workers.release()
+                self._finish(batch, [error] * len(batch))
+            else:
+                future.add_done_callback(lambda f, batch=batch: self._complete(batch, f))
+
+    def _collect(self):
+        # on_result touches the database and disk, so it runs here rather than
+        # on the pool's management thread, which would stall every worker's results
+        while True:
+            batch, future = self._finished.get()
+            try:
+                results = future.result()
+            except Exception as e:
+                results = [e] * len(batch)
+            self._finish(batch, results)
+
+    def _get_executor(self):
+        # Caller holds self._lock
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_init_worker,
+                initargs=(self.warm_up_fn,)
+            )
+        return self._executor
+
+    def _complete(self, batch, future):
+        # Runs on the pool's management thread: free the worker and hand the batch over
+        self._free_workers.release()
+        self._finished.put((batch, future))
+
+    def _finish(self, batch, results):
+        for job, result in zip(batch, results):
+            try:
+                if isinstance(result, Exception):
+                    raise result
+                update = {"status": "done", "analysis": self.on_result(job, result)}
+            except Exception as e:
+                update = {"status": "failed", "error": str(e)}
+                print(f"Warning: frame analysis for attempt {job['student_exam_id']} failed: {e}")
+
+            with self._lock:
+                job.pop('frame_bytes', None)
+                job.update(update, finished_at=time.time())
+                self._in_flight -= 1
+                if update['status'] == 'done':
+                    self.completed += 1
+                else:
+                    self.failed += 1
+
+    def _prune(self):
+        # Caller holds self._lock; finished jobs are dropped oldest first
+        cutoff = time.time() - self.result_ttl
+        expired = []
+        for job_id, job in self._jobs.items():
+            if job['status'] == 'pending':
+                continue
+            if job['finished_at'] >= cutoff and len(self._jobs) - len(expired) <= MAX_STORED_RESULTS:
+                break
+            expired.append(job_id)
+        for job_id in expired:
+            del self._jobs[job_id]
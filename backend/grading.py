@@ -0,0 +1,67 @@
+import json
+
+def grade_answers(student_exam_id, answers, answer_key):
+    """
+    Grade a submission against an exam's answer key in one pass
+    Returns (student_answers rows, mcq_score, has_coding). Answers to unknown
+    questions are dropped and the last answer per question wins.
+    """
+    latest = {answer['question_id']: answer for answer in answers}
+    graded = [(answer, answer_key[qid]) for qid, answer in latest.items() if qid in answer_key]
+
+    # MCQs are auto-graded; coding answers await evaluation with zero marks
+    correct = [
+        question['question_type'] == 'mcq' and answer['answer_value'] == question['correct_answer']
+        for answer, question in graded
+    ]
+    rows = [
+        (student_exam_id, answer['question_id'], answer['answer_type'], answer['answer_value'],
+         int(is_correct), question['marks'] if is_correct else 0)
+        for (answer, question), is_correct in zip(graded, correct)
+    ]
+
+    mcq_score = sum(row[5] for row in rows)
+    has_coding = any(question['question_type'] != 'mcq' for _, question in graded)
+    return rows, mcq_score, has_coding
+
+# One set-based pass over every listed attempt: aggregate coding marks per
+# attempt, then derive total, percentage, result and status in a single UPDATE.
+# Attempts without coding answers still join (LEFT JOIN) and score 0 coding marks.
+# Attempts still in progress are left alone; they have nothing to score yet.
+RECOMPUTE_SCORES_SQL = '''
+    UPDATE student_exams AS se
+    SET coding_score = c.coding_score,
+        total_score = se.mcq_score + c.coding_score,
+        percentage = CASE WHEN e.total_marks > 0
+                          THEN CAST(se.mcq_score + c.coding_score AS REAL) / e.total_marks * 100
+                          ELSE 0 END,
+        result = CASE WHEN c.pending > 0 THEN 'pending_evaluation'
+                      WHEN se.mcq_score + c.coding_score >= e.passing_marks THEN 'pass'
+                      ELSE 'fail' END,
+        status = CASE WHEN c.pending > 0 THEN 'submitted' ELSE 'evaluated' END
+    FROM (
+        SELECT a.id AS student_exam_id,
+               COALESCE(SUM(sa.marks_awarded), 0) AS coding_score,
+               COUNT(sa.id) - COUNT(sa.evaluated_at) AS pending
+        FROM student_exams a
+        LEFT JOIN student_answers sa ON sa.student_exam_id = a.id AND sa.answer_type = 'code'
+        WHERE a.id IN (SELECT value FROM json_each(?))
+          AND a.status IN ('submitted', 'evaluated')
+        GROUP BY a.id
+    ) AS c
+    JOIN exams e
+    WHERE se.id = c.student_exam_id AND e.id = se.exam_id
+'''
+
+def recompute_attempt_scores(cursor, student_exam_ids):
+    """
+    Recompute coding/total score and result for many attempts in one statement
+    An attempt stays pending_evaluation while any coding answer is unevaluated
+    """
+    student_exam_ids = sorted(set(student_exam_ids))
+    if student_exam_ids:
+        cursor.execute(RECOMPUTE_SCORES_SQL, (json.dumps(student_exam_ids),))
+
+def recompute_attempt_score(cursor, student_exam_id):
+    """Recompute one attempt's coding/total score and result from its answers"""
+    recompute_attempt_scores(cursor, [student_exam_id])
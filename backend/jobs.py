@@ -1,5 +1,5 @@
 from flask import Blueprint, request, jsonify, session
-from database import get_db_connection
+from database import get_db
 from middleware import require_auth, require_student, require_admin
 from utils import check_job_eligibility, check_application_exists, check_job_deadline, dict_from_row
 from datetime import datetime
@@ -12,7 +12,7 @@ def get_jobs():
     """Get all active job postings (students see eligible jobs)"""
     status_filter = request.args.get('status', 'active')
 
-    conn = get_db_connection()
+    conn = get_db()
     cursor = conn.cursor()
 
     if session['role'] == 'student':
@@ -36,13 +36,11 @@ def get_jobs():
             job_dict['has_applied'] = job_dict['id'] in applications
             result.append(job_dict)
 
-        conn.close()
         return jsonify({"success": True, "jobs": result}), 200
 
     else:  # Admin
         cursor.execute("SELECT * FROM jobs ORDER BY posted_at DESC")
         jobs = cursor.fetchall()
-        conn.close()
 
         return jsonify({"success": True, "jobs": [dict_from_row(j) for j in jobs]}), 200
 
@@ -64,7 +62,7 @@ def create_job():
     except ValueError:
         return jsonify({"success": False, "error": "Invalid date format for last_date (use YYYY-MM-DD)"}), 400
 
-    conn = get_db_connection()
+    conn = get_db()
     cursor = conn.cursor()
 
     try:
@@ -91,7 +89,6 @@ def create_job():
         job_id = cursor.lastrowid
         cursor.execute("SELECT * FROM jobs WHERE id=?", (job_id,))
         job = cursor.fetchone()
-        conn.close()
 
         return jsonify({
             "success": True,
@@ -100,14 +97,13 @@ def create_job():
         }), 201
 
     except Exception as e:
-        conn.close()
         return jsonify({"success": False, "error": str(e)}), 500
 
 @jobs_bp.route('/<int:job_id>/apply', methods=['POST'])
 @require_student
 def apply_job(job_id):
     """Student applies for a job"""
-    conn = get_db_connection()
+    conn = get_db()
     cursor = conn.cursor()
 
     # Get job details
@@ -115,14 +111,12 @@ def apply_job(job_id):
     job = cursor.fetchone()
 
     if not job:
-        conn.close()
         return jsonify({"success": False, "error": "Job not found"}), 404
 
     job_dict = dict_from_row(job)
 
     # Check deadline
     if not check_job_deadline(job_dict['last_date']):
-        conn.close()
         return jsonify({"success": False, "error": "Application deadline has passed"}), 400
 
     # Get student details
@@ -132,12 +126,10 @@ def apply_job(job_id):
     # Check eligibility
     is_eligible, reason = check_job_eligibility(student, job_dict)
     if not is_eligible:
-        conn.close()
         return jsonify({"success": False, "error": f"You are not eligible for this job: {reason}"}), 400
 
     # Check if already applied
     if check_application_exists(conn, session['user_id'], job_id):
-        conn.close()
         return jsonify({"success": False, "error": "Already applied to this job"}), 400
 
     # Create application
@@ -151,7 +143,6 @@ def apply_job(job_id):
         application_id = cursor.lastrowid
         cursor.execute("SELECT * FROM job_applications WHERE id=?", (application_id,))
         application = cursor.fetchone()
-        conn.close()
 
         return jsonify({
             "success": True,
@@ -165,14 +156,13 @@ def apply_job(job_id):
         }), 201
 
     except Exception as e:
-        conn.close()
         return jsonify({"success": False, "error": str(e)}), 500
 
 @jobs_bp.route('/applications', methods=['GET'])
 @require_student
 def get_applications():
     """Get student's job applications"""
-    conn = get_db_connection()
+    conn = get_db()
     cursor = conn.cursor()
 
     cursor.execute('''
@@ -184,7 +174,6 @@ def get_applications():
     ''', (session['user_id'],))
 
     applications = cursor.fetchall()
-    conn.close()
 
     result = []
     for app in applications:
@@ -218,7 +207,7 @@ def update_application_status(application_id):
     if data['status'] not in allowed_statuses:
         return jsonify({"success": False, "error": f"Invalid status. Allowed: {', '.join(allowed_statuses)}"}), 400
 
-    conn = get_db_connection()
+    conn = get_db()
     cursor = conn.cursor()
 
     try:
@@ -228,7 +217,6 @@ def update_application_status(application_id):
             WHERE id=?
         ''', (data['status'], data.get('notes', ''), application_id))
         conn.commit()
-        conn.close()
 
         return jsonify({
             "success": True,
@@ -236,5 +224,4 @@ def update_application_status(application_id):
         }), 200
 
     except Exception as e:
-        conn.close()
         return jsonify({"success": False, "error": str(e)}), 500
@@ -0,0 +1,263 @@
+"""
+Automatic judge for coding answers.
+
+Submitting an exam only enqueues the attempt; JUDGE_WORKERS background
+workers take attempts off a bounded queue and run each unevaluated coding
+answer against its question's test cases in the sandbox, so at most
+JUDGE_WORKERS sandboxed programs run at once. Marks are awarded in
+proportion to the tests passed and the attempt's score and result are
+recomputed. Results are cached by program and test set (see judge_cache),
+so duplicate submissions and re-judges only run programs not seen before.
+
+Test cases are stored on questions.test_cases as a JSON list of
+{"input": "...", "expected_output": "..."} objects. Questions without test
+cases, or in a language with no toolchain installed, are left for manual
+evaluation.
+"""
+import json
+import os
+import queue
+import shutil
+import sys
+import tempfile
+import threading
+from config import Config
+from database import get_pool, immediate_transaction
+from grading import recompute_attempt_score
+from judge_cache import judge_cache, result_key
+from sandbox import run_sandboxed
+
+LANGUAGES = {
+    'python': {
+        'source': 'main.py',
+        'compile': None,
+        'run': [sys.executable, '-I', 'main.py']
+    },
+    'c': {
+        'source': 'main.c',
+        'compile': ['gcc', '-O2', '-o', 'main', 'main.c', '-lm'],
+        'run': ['./main']
+    },
+    'cpp': {
+        'source': 'main.cpp',
+        'compile': ['g++', '-O2', '-o', 'main', 'main.cpp'],
+        'run': ['./main']
+    },
+    'java': {
+        'source': 'Main.java',
+        'compile': ['javac', 'Main.java'],
+        # The JVM reserves far more address space than it uses; bound the heap instead
+        'run': ['java', f'-Xmx{Config.JUDGE_MEMORY_LIMIT_MB}m', '-cp', '.', 'Main'],
+        'address_space_limit': False
+    }
+}
+
+LANGUAGE_ALIASES = {'py': 'python', 'python3': 'python', 'c++': 'cpp'}
+
+def resolve_language(language):
+    """Returns the LANGUAGES key for a question language, or None if unsupported here"""
+    name = LANGUAGE_ALIASES.get((language or 'python').lower(), (language or 'python').lower())
+    spec = LANGUAGES.get(name)
+    if spec is None:
+        return None
+    toolchain = spec['compile'][0] if spec['compile'] else spec['run'][0]
+    if not os.path.isabs(toolchain) and shutil.which(toolchain) is None:
+        return None
+    return name
+
+def parse_test_cases(test_cases_json):
+    """Returns [(input, expected_output)] from a question's test_cases column"""
+    try:
+        cases = json.loads(test_cases_json or '[]')
+    except (TypeError, ValueError):
+        return []
+    parsed = []
+    for case in cases:
+        if isinstance(case, dict) and 'expected_output' in case:
+            parsed.append((str(case.get('input', '')), str(case['expected_output'])))
+    return parsed
+
+def outputs_match(actual, expected):
+    """Compare outputs ignoring trailing whitespace on lines and at the end"""
+    def normalize(text):
+        return [line.rstrip() for line in text.rstrip().splitlines()]
+    return normalize(actual) == normalize(expected)
+
+def judge_source(source, language, test_cases):
+    """
+    Compile (if needed) and run source against every test case
+    Returns {"verdict", "passed", "total", "tests", "compile_output"}
+    """
+    name = resolve_language(language)
+    if name is None:
+        return {"verdict": "unsupported", "passed": 0, "total": len(test_cases), "tests": []}
+
+    spec = LANGUAGES[name]
+    memory_limit = Config.JUDGE_MEMORY_LIMIT_MB if spec.get('address_space_limit', True) else None
+
+    with tempfile.TemporaryDirectory(prefix='judge-') as workdir:
+        with open(os.path.join(workdir, spec['source']), 'w') as f:
+            f.write(source)
+
+        if spec['compile']:
+            compiled = run_sandboxed(
+                spec['compile'], workdir,
+                time_limit=Config.JUDGE_COMPILE_TIMEOUT,
+                memory_limit_mb=None,
+                output_limit=Config.MAX_CODE_OUTPUT_LENGTH
+            )
+            if compiled['status'] != 'ok':
+                return {
+                    "verdict": "compile_error",
+                    "passed": 0,
+                    "total": len(test_cases),
+                    "tests": [],
+                    "compile_output": compiled['output']
+                }
+
+        tests = []
+        for stdin_data, expected in test_cases:
+            run = run_sandboxed(
+                spec['run'], workdir,
+                stdin_data=stdin_data,
+                time_limit=Config.CODE_EXECUTION_TIMEOUT,
+                memory_limit_mb=memory_limit,
+                output_limit=Config.MAX_CODE_OUTPUT_LENGTH
+            )
+            if run['status'] == 'ok':
+                status = 'passed' if outputs_match(run['output'], expected) else 'wrong_answer'
+            else:
+                status = run['status']
+            test = {"status": status, "time_ms": run['time_ms']}
+            if status != 'passed':
+                test["output"] = run['output']
+            tests.append(test)
+
+    passed = sum(1 for test in tests if test['status'] == 'passed')
+    if passed == len(tests):
+        verdict = 'accepted'
+    else:
+        # Report the first failure's kind as the overall verdict
+        verdict = next(test['status'] for test in tests if test['status'] != 'passed')
+
+    return {"verdict": verdict, "passed": passed, "total": len(tests), "tests": tests}
+
+class JudgeService:
+    """Bounded queue of attempts to judge, drained by a fixed set of workers"""
+
+    def __init__(self, workers, queue_size):
+        self.workers = workers
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._threads = []
+        self._lock = threading.Lock()
+        self.judged_answers = 0
+        self.judged_attempts = 0
+        self.executed_answers = 0
+        self.failures = 0
+        self.rejected = 0
+
+    def enqueue(self, student_exam_id):
+        """Queue an attempt for judging; returns False if judging is off or the queue is full"""
+        if not Config.JUDGE_ENABLED:
+            return False
+
+        with self._lock:
+            if not self._threads:
+                # Started on first use so processes that never judge stay thread-free
+                for i in range(self.workers):
+                    thread = threading.Thread(target=self._run, name=f'judge-{i}', daemon=True)
+                    thread.start()
+                    self._threads.append(thread)
+
+        try:
+            self._queue.put_nowait(student_exam_id)
+            return True
+        except queue.Full:
+            # Attempt stays pending_evaluation; an admin can re-queue it later
+            with self._lock:
+                self.rejected += 1
+            return False
+
+    def judge_attempt(self, student_exam_id):
+        """Judge an attempt's unevaluated coding answers; returns the number judged"""
+        pool = get_pool()
+        conn = pool.acquire()
+        try:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT sa.id, sa.answer_value, q.language, q.test_cases, q.marks
+                FROM student_answers sa
+                JOIN questions q ON sa.question_id = q.id
+                WHERE sa.student_exam_id=? AND sa.answer_type='code' AND sa.evaluated_at IS NULL
+            ''', (student_exam_id,))
+            answers = cursor.fetchall()
+
+            updates = []
+            for answer in answers:
+                test_cases = parse_test_cases(answer['test_cases'])
+                if not test_cases:
+                    continue
+
+                language = resolve_language(answer['language'])
+                if language is None:
+                    continue
+
+                # Identical programs against identical tests are only run once
+                source = answer['answer_value'] or ''
+                key = result_key(source, language, test_cases)
+                result, executed = judge_cache.get_or_judge(
+                    key, lambda: judge_source(source, language, test_cases)
+                )
+                if executed:
+                    with self._lock:
+                        self.executed_answers += 1
+
+                marks_awarded = answer['marks'] * result['passed'] // result['total']
+                is_correct = 1 if result['verdict'] == 'accepted' else 0
+                updates.append((marks_awarded, is_correct, json.dumps(result), answer['id']))
+
+            if updates:
+                with immediate_transaction(conn):
+                    # Manual evaluations that landed while we were judging win
+                    cursor.executemany('''
+                        UPDATE student_answers
+                        SET marks_awarded=?, is_correct=?, judge_result=?, evaluated_at=CURRENT_TIMESTAMP
+                        WHERE id=? AND evaluated_at IS NULL
+                    ''', updates)
+                    recompute_attempt_score(cursor, student_exam_id)
+
+            return len(updates)
+        finally:
+            pool.release(conn)
+
+    def stats(self):
+        """Returns queue depth and judging counters"""
+        return {
+            "enabled": Config.JUDGE_ENABLED,
+            "workers": self.workers,
+            "queued": self._queue.qsize(),
+            "judged_attempts": self.judged_attempts,
+            "judged_answers": self.judged_answers,
+            "executed_answers": self.executed_answers,
+            "failures": self.failures,
+            "rejected": self.rejected,
+            "result_cache": judge_cache.stats()
+        }
+
+    def _run(self):
+        while True:
+            student_exam_id = self._queue.get()
+            try:
+                judged = self.judge_attempt(student_exam_id)
+                # Several workers update the counters
+                with self._lock:
+                    self.judged_answers += judged
+                    self.judged_attempts += 1
+            except Exception as e:
+                with self._lock:
+                    self.failures += 1
+                print(f"Warning: judging attempt {student_exam_id} failed: {e}")
+            finally:
+                self._queue.task_done()
+
+judge_service = JudgeService(Config.JUDGE_WORKERS, Config.JUDGE_QUEUE_SIZE)
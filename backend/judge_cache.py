@@ -0,0 +1,236 @@
+"""
+Content-addressed cache of judge results.
+
+A verdict depends only on the program, its language, the test cases and the
+run limits, so results are stored under (test set hash, language, source
+hash). Identical or whitespace-equivalent submissions to a question are run
+once, and re-judging an exam only runs programs it has not seen before.
+Changing a question's test cases changes the key, so stale verdicts are
+never served; invalidate_tests() also drops them eagerly.
+
+Results live in an in-memory LRU and, when JUDGE_CACHE_DIR is set, as JSON
+files under <dir>/<test set hash>/<source hash[:2]>/ so they survive restarts
+and are shared between worker processes. The disk store is trimmed back
+below JUDGE_CACHE_DISK_ENTRIES by deleting the least recently used files.
+"""
+import hashlib
+import io
+import json
+import os
+import shutil
+import tempfile
+import threading
+import tokenize
+from cache import LRUCache
+from config import Config
+
+# Load-dependent verdicts are re-run rather than remembered
+UNCACHEABLE_VERDICTS = {'timeout', 'unsupported'}
+
+# Fraction of JUDGE_CACHE_DISK_ENTRIES kept after a trim, so trims are rare
+DISK_TRIM_RATIO = 0.9
+
+def normalize_source(source, language):
+    """
+    Canonical form of a program for hashing
+    Python is reduced to its token stream, so indentation width, blank lines
+    and spacing between tokens don't matter but string contents do. Other
+    languages only have line endings, trailing spaces and blank lines at the
+    start and end of the file normalized.
+    """
+    source = source.replace('\r\n', '\n').replace('\r', '\n')
+
+    if language == 'python':
+        try:
+            parts = []
+            for token in tokenize.generate_tokens(io.StringIO(source).readline):
+                if token.type == tokenize.NL:
+                    continue
+                if token.type in (tokenize.INDENT, tokenize.DEDENT, tokenize.NEWLINE):
+                    parts.append(tokenize.tok_name[token.type])
+                else:
+                    parts.append(token.string)
+            return '\x00'.join(parts)
+        except (tokenize.TokenError, SyntaxError):
+            # Doesn't tokenize, so it won't run either; fall through to the plain form
+            pass
+
+    return '\n'.join(line.rstrip() for line in source.split('\n')).strip('\n')
+
+def test_set_hash(test_cases):
+    """Hash of a question's parsed test cases and the limits they are run under"""
+    payload = json.dumps({
+        "tests": test_cases,
+        "time_limit": Config.CODE_EXECUTION_TIMEOUT,
+        "memory_limit_mb": Config.JUDGE_MEMORY_LIMIT_MB,
+        "output_limit": Config.MAX_CODE_OUTPUT_LENGTH
+    }, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+def result_key(source, language, test_cases):
+    """Cache key for judging source (in a resolved LANGUAGES name) against test_cases"""
+    source_hash = hashlib.sha256(normalize_source(source, language).encode()).hexdigest()
+    return (test_set_hash(test_cases), language, source_hash)
+
+class JudgeResultCache:
+    """Two-level (memory, then disk) store of judge results keyed by result_key()"""
+
+    def __init__(self, memory_entries, memory_bytes, directory, disk_entries):
+        self._memory = LRUCache(max_entries=memory_entries, max_bytes=memory_bytes)
+        self.directory = directory
+        self.disk_entries = disk_entries
+        self._disk_count = None  # counted lazily on first write
+        self._lock = threading.Lock()
+        self._inflight = {}  # key -> lock held while that key is being judged
+        self.disk_hits = 0
+        self.stores = 0
+        self.skipped = 0
+        self.disk_trims = 0
+        self.disk_errors = 0
+
+    def get(self, key):
+        """Returns the cached result or None"""
+        result = self._memory.get(key)
+        if result is not None or not self.directory:
+            return result
+
+        path = self._path(key)
+        try:
+            with open(path) as f:
+                result = json.load(f)
+            # mtime doubles as the last-used time for disk eviction
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError):
+            self.disk_errors += 1
+            return None
+
+        self.disk_hits += 1
+        self._memory.put(key, result, self._size(result))
+        return result
+
+    def get_or_judge(self, key, judge):
+        """
+        Returns (result, executed), calling judge() on a miss
+        Concurrent misses on one key (the same program submitted by many
+        students at once) wait for a single run instead of each executing it
+        """
+        result = self.get(key)
+        if result is not None:
+            return result, False
+
+        with self._lock:
+            key_lock = self._inflight.setdefault(key, threading.Lock())
+
+        try:
+            with key_lock:
+                result = self.get(key)
+                if result is not None:
+                    return result, False
+                result = judge()
+                self.put(key, result)
+                return result, True
+        finally:
+            with self._lock:
+                # A later caller may have installed a fresh lock; leave that one
+                if self._inflight.get(key) is key_lock:
+                    del self._inflight[key]
+
+    def put(self, key, result):
+        """Store a result unless its verdict may not repeat"""
+        if result['verdict'] in UNCACHEABLE_VERDICTS:
+            self.skipped += 1
+            return
+
+        self._memory.put(key, result, self._size(result))
+        self.stores += 1
+        if not self.directory:
+            return
+
+        path = self._path(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Write then rename so readers in other processes never see a partial file
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+            with os.fdopen(fd, 'w') as f:
+                json.dump(result, f)
+            existed = os.path.exists(path)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            self.disk_errors += 1
+            print(f"Warning: could not write judge cache entry: {e}")
+            return
+
+        if not existed:
+            with self._lock:
+                if self._disk_count is None:
+                    self._disk_count = len(self._disk_files())
+                else:
+                    self._disk_count += 1
+                if self._disk_count > self.disk_entries:
+                    self._trim_disk()
+
+    def invalidate_tests(self, tests_hash):
+        """Drop every result judged against a test set; returns entries dropped from memory"""
+        dropped = self._memory.invalidate_matching(lambda key: key[0] == tests_hash)
+        if self.directory:
+            with self._lock:
+                shutil.rmtree(os.path.join(self.directory, tests_hash), ignore_errors=True)
+                self._disk_count = None
+        return dropped
+
+    def stats(self):
+        """Returns memory and disk counters"""
+        return {
+            "memory": self._memory.stats(),
+            "directory": self.directory or None,
+            "disk_entries": self._disk_count,
+            "max_disk_entries": self.disk_entries,
+            "disk_hits": self.disk_hits,
+            "disk_trims": self.disk_trims,
+            "disk_errors": self.disk_errors,
+            "stores": self.stores,
+            "skipped": self.skipped
+        }
+
+    def _path(self, key):
+        tests_hash, language, source_hash = key
+        return os.path.join(self.directory, tests_hash, source_hash[:2], f'{source_hash}-{language}.json')
+
+    def _disk_files(self):
+        files = []
+        for root, _, names in os.walk(self.directory):
+            files.extend(os.path.join(root, name) for name in names if name.endswith('.json'))
+        return files
+
+    def _trim_disk(self):
+        # Caller holds self._lock
+        files = []
+        for path in self._disk_files():
+            try:
+                files.append((os.path.getmtime(path), path))
+            except OSError:
+                pass
+        files.sort()
+
+        excess = len(files) - int(self.disk_entries * DISK_TRIM_RATIO)
+        for _, path in files[:max(excess, 0)]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        self._disk_count = len(files) - max(excess, 0)
+        self.disk_trims += 1
+
+    @staticmethod
+    def _size(result):
+        return len(json.dumps(result))
+
+judge_cache = JudgeResultCache(
+    memory_entries=Config.JUDGE_CACHE_MEMORY_ENTRIES,
+    memory_bytes=Config.JUDGE_CACHE_MEMORY_BYTES,
+    # Relative directories live next to the backend, like proctoring_images
+    directory=os.path.join(os.path.dirname(__file__), Config.JUDGE_CACHE_DIR) if Config.JUDGE_CACHE_DIR else '',
+    disk_entries=Config.JUDGE_CACHE_DISK_ENTRIES
+)
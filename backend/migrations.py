@@ -0,0 +1,187 @@
+"""
+Numbered schema migrations tracked in the schema_migrations table.
+
+Each migration runs in its own BEGIN IMMEDIATE transaction and re-checks the
+recorded version once the write lock is held, so several processes starting
+at the same time apply every migration exactly once. Index builds only take
+SQLite's write lock, so readers keep working while a migration runs (WAL).
+A statement may also be a function of the connection, for steps that need
+to report what they did.
+"""
+from datetime import datetime
+
+def _drop_duplicate_answers(conn):
+    """Autosave upserts one row per (attempt, question); keep the newest duplicate"""
+    deleted = conn.execute('''
+        DELETE FROM student_answers
+        WHERE id NOT IN (
+            SELECT MAX(id) FROM student_answers GROUP BY student_exam_id, question_id
+        )
+    ''').rowcount
+    if deleted:
+        print(f"Migration 6: removed {deleted} duplicate student_answers rows")
+
+MIGRATIONS = [
+    (1, 'exam_attempt_indexes', [
+        # get_exams (student): published exams ordered by schedule
+        '''CREATE INDEX IF NOT EXISTS idx_exams_status_scheduled
+           ON exams (status, scheduled_date)''',
+        # get_exams (admin): newest exams first
+        '''CREATE INDEX IF NOT EXISTS idx_exams_created_at
+           ON exams (created_at)''',
+        # start_exam, submit_exam, get_results: latest attempt per (exam, student)
+        '''CREATE INDEX IF NOT EXISTS idx_student_exams_exam_student
+           ON student_exams (exam_id, student_id, created_at, status)''',
+        # start_exam, submit_exam: questions of an exam
+        '''CREATE INDEX IF NOT EXISTS idx_questions_exam
+           ON questions (exam_id)''',
+        # evaluate_answer: SUM(marks_awarded) of an attempt's coding answers
+        '''CREATE INDEX IF NOT EXISTS idx_student_answers_attempt
+           ON student_answers (student_exam_id, answer_type, marks_awarded)''',
+    ]),
+    (2, 'proctoring_indexes', [
+        # get_logs: an attempt's violations in time order
+        '''CREATE INDEX IF NOT EXISTS idx_proctoring_logs_attempt
+           ON proctoring_logs (student_exam_id, timestamp)''',
+    ]),
+    (3, 'job_indexes', [
+        # get_jobs (student): jobs by status, newest first
+        '''CREATE INDEX IF NOT EXISTS idx_jobs_status_posted
+           ON jobs (status, posted_at)''',
+        # get_jobs (admin): all jobs, newest first
+        '''CREATE INDEX IF NOT EXISTS idx_jobs_posted_at
+           ON jobs (posted_at)''',
+        # get_jobs, get_applications, get_student_details: a student's applications
+        '''CREATE INDEX IF NOT EXISTS idx_job_applications_student
+           ON job_applications (student_id, applied_at, job_id)''',
+        # admin get_job_applications: a job's applicants, newest first
+        '''CREATE INDEX IF NOT EXISTS idx_job_applications_job
+           ON job_applications (job_id, applied_at)''',
+    ]),
+    (4, 'admin_indexes', [
+        # get_students: students, newest first
+        '''CREATE INDEX IF NOT EXISTS idx_users_role_created
+           ON users (role, created_at)''',
+        # get_flagged_exams: only flagged attempts are indexed
+        '''CREATE INDEX IF NOT EXISTS idx_student_exams_flagged
+           ON student_exams (end_time) WHERE flagged_for_review=1''',
+        # get_exam_results: finished attempts of an exam ranked by score
+        '''CREATE INDEX IF NOT EXISTS idx_student_exams_exam_status_score
+           ON student_exams (exam_id, status, total_score)''',
+        # get_student_details: a student's evaluated exam history
+        '''CREATE INDEX IF NOT EXISTS idx_student_exams_student_status
+           ON student_exams (student_id, status, end_time)''',
+    ]),
+    (5, 'student_exam_listing_index', [
+        # get_exams (student): latest attempt per exam for one student
+        '''CREATE INDEX IF NOT EXISTS idx_student_exams_student_exam
+           ON student_exams (student_id, exam_id, created_at, status)''',
+    ]),
+    (6, 'unique_answer_per_question', [
+        _drop_duplicate_answers,
+        '''CREATE UNIQUE INDEX IF NOT EXISTS idx_student_answers_attempt_question
+           ON student_answers (student_exam_id, question_id)''',
+    ]),
+    (7, 'judge_result_column', [
+        # Per-test verdicts from the automatic judge (JSON)
+        '''ALTER TABLE student_answers ADD COLUMN judge_result TEXT''',
+    ]),
+    (8, 'evidence_retention_indexes', [
+        # Evidence sweeper: oldest logs that still reference an image
+        '''CREATE INDEX IF NOT EXISTS idx_proctoring_logs_image_time
+           ON proctoring_logs (timestamp) WHERE image_path IS NOT NULL''',
+        # Evidence sweeper: is a content-addressed image still referenced
+        '''CREATE INDEX IF NOT EXISTS idx_proctoring_logs_image_path
+           ON proctoring_logs (image_path) WHERE image_path IS NOT NULL''',
+    ]),
+    (9, 'proctoring_log_event_key', [
+        # Violations are written in batches; a unique key per event makes
+        # journal replays and client retries idempotent
+        '''ALTER TABLE proctoring_logs ADD COLUMN event_key TEXT''',
+        '''CREATE UNIQUE INDEX IF NOT EXISTS idx_proctoring_logs_event_key
+           ON proctoring_logs (student_exam_id, event_key) WHERE event_key IS NOT NULL''',
+    ]),
+]
+
+def ensure_version_table(conn):
+    """Create the schema_migrations table if missing"""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version INTEGER PRIMARY KEY,
+            name TEXT NOT NULL,
+            applied_at TIMESTAMP NOT NULL
+        )
+    ''')
+    conn.commit()
+
+def get_current_version(conn):
+    """Returns the highest applied migration version (0 if none)"""
+    row = conn.execute("SELECT MAX(version) FROM schema_migrations").fetchone()
+    return row[0] or 0
+
+def pending_versions(conn):
+    """Migration versions not yet recorded as applied (read-only)"""
+    tracked = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type='table' AND name='schema_migrations'"
+    ).fetchone()
+    applied = set()
+    if tracked:
+        applied = {row[0] for row in conn.execute("SELECT version FROM schema_migrations")}
+    return [version for version, _, _ in MIGRATIONS if version not in applied]
+
+def apply_migrations(conn, target=None):
+    """Apply pending migrations up to target (default: latest); returns applied versions"""
+    ensure_version_table(conn)
+    applied = []
+
+    # Manage transactions explicitly so each migration is atomic
+    previous_isolation = conn.isolation_level
+    conn.isolation_level = None
+
+    try:
+        for version, name, statements in MIGRATIONS:
+            if target is not None and version > target:
+                break
+
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                # Another process may have applied it while we waited for the lock
+                done = conn.execute(
+                    "SELECT 1 FROM schema_migrations WHERE version=?", (version,)
+                ).fetchone()
+                if done:
+                    conn.execute("COMMIT")
+                    continue
+
+                for statement in statements:
+                    if callable(statement):
+                        statement(conn)
+                    else:
+                        conn.execute(statement)
+                conn.execute(
+                    "INSERT INTO schema_migrations (version, name, applied_at) VALUES (?, ?, ?)",
+                    (version, name, datetime.now())
+                )
+                conn.execute("COMMIT")
+                applied.append(version)
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+
+        if applied:
+            # Refresh planner statistics for the new indexes
+            conn.execute("PRAGMA optimize")
+    finally:
+        conn.isolation_level = previous_isolation
+
+    return applied
+
+if __name__ == '__main__':
+    from database import get_db_connection
+
+    conn = get_db_connection()
+    applied = apply_migrations(conn)
+    for version in applied:
+        print(f"Applied migration {version}")
+    print(f"Schema at version {get_current_version(conn)}")
+    conn.close()
@@ -0,0 +1,93 @@
+"""
+Lazily loaded detector models.
+
+Importing a model library (mediapipe, ultralytics/torch) and building the
+model takes seconds and a lot of memory, so nothing is loaded at import
+time. Each model is registered with a loader and built on first use, once
+per process. warm_up() loads models ahead of traffic, and ready() tells
+whether everything asked to warm up has finished loading.
+
+A loader returns None when its library isn't installed. Like a loader that
+raises, that marks the model unavailable and the detector using it is
+disabled.
+"""
+import threading
+import time
+
+class ModelRegistry:
+    """Name -> loader map whose models are built on first get()"""
+
+    def __init__(self):
+        self._loaders = {}
+        self._models = {}  # name -> model, or None if unavailable
+        self._status = {}  # name -> {"state", "load_ms", "error"}
+        self._load_locks = {}
+        self._warming = set()
+        self._warm_up_started = False
+        self._lock = threading.Lock()
+
+    def register(self, name, loader):
+        """Register loader() -> model (or None if unavailable) under name"""
+        with self._lock:
+            self._loaders[name] = loader
+            self._load_locks[name] = threading.Lock()
+            self._status[name] = {"state": "not_loaded", "load_ms": None, "error": None}
+
+    def get(self, name):
+        """Returns the model, loading it on first use, or None if unavailable"""
+        if name in self._models:
+            return self._models[name]
+
+        # One load per model; concurrent callers wait for it
+        with self._load_locks[name]:
+            if name in self._models:
+                return self._models[name]
+
+            self._status[name]["state"] = "loading"
+            started = time.perf_counter()
+            try:
+                model = self._loaders[name]()
+                error = None
+            except Exception as e:
+                model = None
+                error = str(e)
+                print(f"Warning: Failed to load {name} model: {e}")
+
+            self._status[name].update({
+                "state": "ready" if model is not None else "unavailable",
+                "load_ms": round((time.perf_counter() - started) * 1000, 2),
+                "error": error
+            })
+            self._models[name] = model
+            return model
+
+    def warm_up(self, names=None, background=False):
+        """Load the given models (default all) now, or in a background thread"""
+        names = list(names if names is not None else self._loaders)
+        with self._lock:
+            self._warming.update(names)
+            self._warm_up_started = True
+
+        def load_all():
+            for name in names:
+                self.get(name)
+
+        if background:
+            threading.Thread(target=load_all, name='model-warmup', daemon=True).start()
+        else:
+            load_all()
+
+    def ready(self):
+        """False until warm_up() is called, then True once every model it asked for has loaded (or found unavailable)"""
+        with self._lock:
+            if not self._warm_up_started:
+                return False
+            warming = list(self._warming)
+        return all(self._status[name]["state"] in ("ready", "unavailable") for name in warming)
+
+    def status(self):
+        """Returns {name: {state, load_ms, error}}"""
+        with self._lock:
+            return {name: dict(status) for name, status in self._status.items()}
+
+model_registry = ModelRegistry()
@@ -0,0 +1,181 @@
+"""
+Pluggable object detector backends for the proctoring YOLO stage.
+
+- 'ultralytics': the PyTorch YOLO model through the ultralytics package
+- 'onnx': the same network exported to ONNX and run with ONNX Runtime, which
+  is considerably cheaper on CPU-only nodes. With OBJECT_DETECTOR_INT8 the
+  weights are dynamically quantized to int8 on first load and the quantized
+  model is cached next to the original.
+
+Export the ONNX model once with
+    yolo export model=yolov8n.pt format=onnx dynamic=True
+(dynamic=True lets a micro-batch run as one call and any input size be used).
+
+Both backends take BGR images and return, per image, a list of detections
+{"object": class name, "confidence": float, "box": [x1, y1, x2, y2]} in image
+coordinates. OBJECT_DETECTOR_IMGSZ is the network input resolution; smaller
+is faster and misses smaller objects.
+"""
+import ast
+import os
+import cv2
+import numpy as np
+from config import Config
+
+BACKENDS = ('ultralytics', 'onnx')
+
+# IoU above which overlapping boxes of one class are merged by NMS
+NMS_IOU = 0.45
+
+# Used when an ONNX model carries no class names in its metadata
+COCO_CLASSES = [
+    'person', 'bicycle', 'car', 'motorcycle', 'airplane', 'bus', 'train', 'truck', 'boat',
+    'traffic light', 'fire hydrant', 'stop sign', 'parking meter', 'bench', 'bird', 'cat', 'dog',
+    'horse', 'sheep', 'cow', 'elephant', 'bear', 'zebra', 'giraffe', 'backpack', 'umbrella',
+    'handbag', 'tie', 'suitcase', 'frisbee', 'skis', 'snowboard', 'sports ball', 'kite',
+    'baseball bat', 'baseball glove', 'skateboard', 'surfboard', 'tennis racket', 'bottle',
+    'wine glass', 'cup', 'fork', 'knife', 'spoon', 'bowl', 'banana', 'apple', 'sandwich', 'orange',
+    'broccoli', 'carrot', 'hot dog', 'pizza', 'donut', 'cake', 'chair', 'couch', 'potted plant',
+    'bed', 'dining table', 'toilet', 'tv', 'laptop', 'mouse', 'remote', 'keyboard', 'cell phone',
+    'microwave', 'oven', 'toaster', 'sink', 'refrigerator', 'book', 'clock', 'vase', 'scissors',
+    'teddy bear', 'hair drier', 'toothbrush'
+]
+
+def _resolve(path):
+    """Relative model paths are relative to the backend directory"""
+    return path if os.path.isabs(path) else os.path.join(os.path.dirname(__file__), path)
+
+class UltralyticsDetector:
+    """YOLO through the ultralytics (PyTorch) package"""
+
+    name = 'ultralytics'
+
+    def __init__(self, weights, imgsz, confidence):
+        from ultralytics import YOLO
+        self.model = YOLO(weights)
+        self.imgsz = imgsz
+        self.confidence = confidence
+
+    def detect(self, images):
+        results = self.model.predict(list(images), imgsz=self.imgsz, conf=self.confidence, verbose=False)
+        return [
+            [
+                {
+                    "object": result.names[int(box.cls[0])],
+                    "confidence": float(box.conf[0]),
+                    "box": [float(v) for v in box.xyxy[0]]
+                }
+                for box in result.boxes
+            ]
+            for result in results
+        ]
+
+class OnnxDetector:
+    """YOLOv8 ONNX export run with ONNX Runtime on the CPU"""
+
+    name = 'onnx'
+
+    def __init__(self, model_path, imgsz, confidence, int8=False):
+        import onnxruntime as ort
+
+        model_path = _resolve(model_path)
+        if int8:
+            model_path = self._quantized(model_path)
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(model_path, options, providers=['CPUExecutionProvider'])
+        self.int8 = int8
+        self.confidence = confidence
+
+        model_input = self.session.get_inputs()[0]
+        self.input_name = model_input.name
+        batch, _, height, width = model_input.shape
+        # Static exports fix the batch and resolution; dynamic ones take imgsz
+        self.batched = not isinstance(batch, int)
+        self.imgsz = (height, width) if isinstance(height, int) and isinstance(width, int) else (imgsz, imgsz)
+
+        names = self.session.get_modelmeta().custom_metadata_map.get('names')
+        if names:
+            names = ast.literal_eval(names)
+            self.names = [names[i] for i in sorted(names)]
+        else:
+            self.names = COCO_CLASSES
+
+    @staticmethod
+    def _quantized(model_path):
+        """Path of the int8 copy of a model, quantizing it on first use"""
+        quantized_path = os.path.splitext(model_path)[0] + '.int8.onnx'
+        if not os.path.exists(quantized_path):
+            from onnxruntime.quantization import QuantType, quantize_dynamic
+            tmp_path = quantized_path + '.tmp'
+            quantize_dynamic(model_path, tmp_path, weight_type=QuantType.QUInt8)
+            os.replace(tmp_path, quantized_path)
+            print(f"Quantized {os.path.basename(model_path)} to int8")
+        return quantized_path
+
+    def _letterbox(self, image):
+        """Resize keeping aspect ratio and pad to the input size; returns (blob, scale, (pad_x, pad_y))"""
+        height, width = self.imgsz
+        scale = min(height / image.shape[0], width / image.shape[1])
+        resized_w, resized_h = int(round(image.shape[1] * scale)), int(round(image.shape[0] * scale))
+        resized = cv2.resize(image, (resized_w, resized_h), interpolation=cv2.INTER_LINEAR)
+
+        pad_x, pad_y = (width - resized_w) // 2, (height - resized_h) // 2
+        canvas = np.full((height, width, 3), 114, np.uint8)
+        canvas[pad_y:pad_y + resized_h, pad_x:pad_x + resized_w] = resized
+
+        blob = cv2.cvtColor(canvas, cv2.COLOR_BGR2RGB).transpose(2, 0, 1).astype(np.float32) / 255.0
+        return blob, scale, (pad_x, pad_y)
+
+    def _decode(self, output, scale, pad):
+        """Detections from one image's (4 + classes, anchors) output"""
+        predictions = output.T
+        class_ids = predictions[:, 4:].argmax(axis=1)
+        scores = predictions[np.arange(len(predictions)), 4 + class_ids]
+        keep = scores >= self.confidence
+        predictions, class_ids, scores = predictions[keep], class_ids[keep], scores[keep]
+        if not len(predictions):
+            return []
+
+        # Centre/size boxes in letterbox space -> corner boxes in image space
+        cx, cy, w, h = predictions[:, 0], predictions[:, 1], predictions[:, 2], predictions[:, 3]
+        boxes = np.stack([cx - w / 2 - pad[0], cy - h / 2 - pad[1], w, h], axis=1) / scale
+
+        # Per-class NMS: shift each class's boxes apart so they never overlap
+        offset = class_ids[:, None] * 10000.0
+        shifted = boxes.copy()
+        shifted[:, :2] += offset
+        indices = cv2.dnn.NMSBoxes(shifted.tolist(), scores.tolist(), self.confidence, NMS_IOU)
+
+        detections = []
+        for i in np.array(indices).flatten():
+            x, y, w, h = boxes[i]
+            detections.append({
+                "object": self.names[class_ids[i]],
+                "confidence": float(scores[i]),
+                "box": [float(x), float(y), float(x + w), float(y + h)]
+            })
+        return detections
+
+    def detect(self, images):
+        prepared = [self._letterbox(image) for image in images]
+        if self.batched:
+            outputs = self.session.run(None, {self.input_name: np.stack([blob for blob, _, _ in prepared])})[0]
+        else:
+            outputs = np.concatenate([
+                self.session.run(None, {self.input_name: blob[None]})[0] for blob, _, _ in prepared
+            ])
+        return [self._decode(output, scale, pad) for output, (_, scale, pad) in zip(outputs, prepared)]
+
+def load_detector(backend=None, imgsz=None, int8=None):
+    """Build the configured object detector; arguments override the config for benchmarks"""
+    backend = backend or Config.OBJECT_DETECTOR_BACKEND
+    imgsz = imgsz or Config.OBJECT_DETECTOR_IMGSZ
+    int8 = Config.OBJECT_DETECTOR_INT8 if int8 is None else int8
+
+    if backend == 'ultralytics':
+        return UltralyticsDetector(Config.OBJECT_DETECTOR_WEIGHTS, imgsz, Config.OBJECT_DETECTOR_CONFIDENCE)
+    if backend == 'onnx':
+        return OnnxDetector(Config.OBJECT_DETECTOR_ONNX_MODEL, imgsz, Config.OBJECT_DETECTOR_CONFIDENCE, int8)
+    raise ValueError(f"Unknown object detector backend: {backend} (expected one of {', '.join(BACKENDS)})")
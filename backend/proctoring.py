@@ -1,104 +1,179 @@
-from flask import Blueprint, request, jsonify, session
-from database import get_db_connection
+from flask import Blueprint, Response, request, jsonify, session, stream_with_context
+from database import get_db, get_pool
 from middleware import require_student, require_admin
 from config import Config
-from datetime import datetime
+from frame_pipeline import Frame, FramePipeline, as_frame
+from frame_workers import FrameAnalysisQueue
+from frame_dedupe import frame_deduper
+from model_registry import model_registry
+from evidence_store import evidence_store
+from violation_ledger import violation_ledger
+from proctoring_events import proctoring_events, SubscriberDropped, SEVERITY_ORDER
+from proctoring_risk import capture_interval, record_frame_risk, record_violation_risk
+from object_detectors import load_detector
+from session_state import proctoring_sessions
+from itsdangerous import BadSignature, URLSafeTimedSerializer
+from collections import Counter
+from datetime import datetime, timezone
 import json
-import os
+import random
+import threading
+import time
 import cv2
-import numpy as np
-
-# Try to import AI libraries with graceful degradation
-try:
-    import mediapipe as mp
-    MEDIAPIPE_AVAILABLE = True
-except ImportError:
-    MEDIAPIPE_AVAILABLE = False
-    print("Warning: MediaPipe not available. Eye tracking disabled.")
-
-try:
-    from ultralytics import YOLO
-    YOLO_AVAILABLE = True
-except ImportError:
-    YOLO_AVAILABLE = False
-    print("Warning: YOLO not available. Object detection disabled.")
 
 proctoring_bp = Blueprint('proctoring', __name__)
 
-# Initialize face detection
-cascade_path = cv2.data.haarcascades + 'haarcascade_frontalface_default.xml'
-face_cascade = cv2.CascadeClassifier(cascade_path)
+# Frame uploads over a WebSocket are optional (pip install flask-sock)
+sock = None
+if Config.FRAME_WEBSOCKET_ENABLED:
+    try:
+        from flask_sock import Sock
+        sock = Sock()
+    except ImportError:
+        print("Warning: flask-sock not available. Frame WebSocket disabled.")
+
+# Seconds between checks for queued verdicts to push over a frame WebSocket
+FRAME_SOCKET_POLL = 0.25
+# Seconds a new frame WebSocket has to send its token
+FRAME_SOCKET_AUTH_TIMEOUT = 10
+
+_frame_tokens = URLSafeTimedSerializer(Config.SECRET_KEY, salt='proctoring-frame')
+
+# Models are built on first use (or by warm_up()), not at import, so
+# processes that never analyse a frame don't pay for them
+def _load_face_cascade():
+    return cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
 
-# Initialize MediaPipe Face Mesh if available
-if MEDIAPIPE_AVAILABLE:
-    mp_face_mesh = mp.solutions.face_mesh
-    face_mesh = mp_face_mesh.FaceMesh(
+def _load_face_mesh():
+    # AI libraries are optional; a missing one disables its detector
+    try:
+        import mediapipe as mp
+    except ImportError:
+        print("Warning: MediaPipe not available. Eye tracking disabled.")
+        return None
+
+    return mp.solutions.face_mesh.FaceMesh(
         max_num_faces=2,
         refine_landmarks=True,
         min_detection_confidence=0.5,
         min_tracking_confidence=0.5
     )
 
-# Initialize YOLO if available
-yolo_model = None
-if YOLO_AVAILABLE and Config.AI_PROCTORING_ENABLED:
-    try:
-        yolo_model = YOLO('yolov8n.pt')
-        print("YOLO model loaded successfully")
-    except Exception as e:
-        print(f"Warning: Failed to load YOLO model: {e}")
-        YOLO_AVAILABLE = False
-
-def detect_faces(image_bytes):
-    """Detect faces in image using OpenCV"""
+def _load_yolo():
+    if not Config.AI_PROCTORING_ENABLED:
+        return None
     try:
-        # Convert bytes to numpy array
-        nparr = np.frombuffer(image_bytes, np.uint8)
-        img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-
-        if img is None:
-            return {"face_count": 0, "face_detected": False, "error": "Invalid image"}
-
-        # Convert to grayscale
-        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-
-        # Detect faces
-        faces = face_cascade.detectMultiScale(
-            gray,
+        detector = load_detector()
+    except ImportError as e:
+        print(f"Warning: YOLO not available ({e}). Object detection disabled.")
+        return None
+
+    print(f"YOLO model loaded successfully ({detector.name} backend)")
+    return detector
+
+model_registry.register('face_cascade', _load_face_cascade)
+model_registry.register('face_mesh', _load_face_mesh)
+model_registry.register('yolo', _load_yolo)
+
+def _overlap(a, b):
+    """Intersection over the smaller of two (x, y, w, h) boxes"""
+    w = min(a[0] + a[2], b[0] + b[2]) - max(a[0], b[0])
+    h = min(a[1] + a[3], b[1] + b[3]) - max(a[1], b[1])
+    return max(0, w) * max(0, h) / min(a[2] * a[3], b[2] * b[3])
+
+def _track_faces(frame, boxes):
+    """
+    Look for each tracked face in a padded region around its last box, at
+    scales near its last size; returns (faces, weights) in analysis
+    coordinates, or None if any face is lost
+    """
+    cascade = model_registry.get('face_cascade')
+    gray = frame.gray
+    faces, weights = [], []
+    for box in boxes:
+        x, y, w, h = (v * frame.scale for v in box)
+        pad = Config.FACE_TRACK_PADDING * max(w, h)
+        x0, y0 = max(0, int(x - pad)), max(0, int(y - pad))
+        x1, y1 = min(gray.shape[1], int(x + w + pad)), min(gray.shape[0], int(y + h + pad))
+        size = max(w, h)
+        if x1 - x0 < size or y1 - y0 < size:
+            return None  # mostly out of frame
+
+        found, _, levels = cascade.detectMultiScale3(
+            gray[y0:y1, x0:x1],
             scaleFactor=1.1,
             minNeighbors=5,
-            minSize=(30, 30)
+            minSize=(max(30, int(size * 0.7)),) * 2,
+            maxSize=(int(size * 1.4),) * 2,
+            outputRejectLevels=True
         )
+        if len(found) == 0:
+            return None
+        best = int(levels.argmax())
+        fx, fy, fw, fh = (int(v) for v in found[best])
+        face = [fx + x0, fy + y0, fw, fh]
+        # Two tracks converging on one face means one was lost
+        if any(_overlap(face, other) > 0.5 for other in faces):
+            return None
+        faces.append(face)
+        weights.append(float(levels[best]))
+    return faces, weights
+
+def detect_faces(image):
+    """
+    Detect faces in a Frame (or image bytes) using OpenCV
+    When the frame's context carries the attempt's tracked face boxes, only
+    the regions around them are searched; the whole frame is searched if
+    any tracked face is lost
+    """
+    frame = as_frame(image)
+    try:
+        if not frame.valid:
+            return {"face_count": 0, "face_detected": False, "error": "Invalid image"}
+
+        tracking = None
+        tracked = _track_faces(frame, frame.context['track']) if frame.context.get('track') else None
+        if tracked is not None:
+            faces, weights = tracked
+            tracking = 'tracked'
+        else:
+            if frame.context.get('track'):
+                tracking = 'lost'
+            # Detect faces on the shared grayscale view; level weights score each detection
+            faces, _, weights = model_registry.get('face_cascade').detectMultiScale3(
+                frame.gray,
+                scaleFactor=1.1,
+                minNeighbors=5,
+                minSize=(30, 30),
+                outputRejectLevels=True
+            )
 
         face_count = len(faces)
 
         return {
             "face_count": face_count,
             "face_detected": face_count > 0,
-            "faces": faces.tolist() if len(faces) > 0 else []
+            "faces": [frame.to_original(face) for face in faces],
+            "confidence": float(min(weights)) if face_count > 0 else None,
+            "tracking": tracking
         }
 
     except Exception as e:
         return {"face_count": 0, "face_detected": False, "error": str(e)}
 
-def track_eye_gaze(image_bytes):
-    """Track eye gaze using MediaPipe Face Mesh"""
-    if not MEDIAPIPE_AVAILABLE:
+def track_eye_gaze(image):
+    """Track eye gaze in a Frame (or image bytes) using MediaPipe Face Mesh"""
+    face_mesh = model_registry.get('face_mesh')
+    if face_mesh is None:
         return {"looking_at_screen": True, "confidence": 0.0, "disabled": True}
 
+    frame = as_frame(image)
     try:
-        # Convert bytes to numpy array
-        nparr = np.frombuffer(image_bytes, np.uint8)
-        img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-
-        if img is None:
+        if not frame.valid:
             return {"looking_at_screen": True, "confidence": 0.0, "error": "Invalid image"}
 
-        # Convert to RGB
-        rgb_img = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
-
-        # Process image
-        results = face_mesh.process(rgb_img)
+        # Process the shared RGB view
+        results = face_mesh.process(frame.rgb)
 
         if not results.multi_face_landmarks:
             return {"looking_at_screen": False, "confidence": 0.0, "no_landmarks": True}
@@ -118,49 +193,217 @@ def track_eye_gaze(image_bytes):
     except Exception as e:
         return {"looking_at_screen": True, "confidence": 0.0, "error": str(e)}
 
-def detect_objects(image_bytes):
-    """Detect suspicious objects using YOLO"""
-    if not YOLO_AVAILABLE or yolo_model is None:
-        return {"objects_detected": [], "suspicious": False, "disabled": True}
+# Suspicious object classes
+SUSPICIOUS_CLASSES = ['cell phone', 'book', 'laptop', 'person']
 
-    try:
-        # Convert bytes to numpy array
-        nparr = np.frombuffer(image_bytes, np.uint8)
-        img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+# Violations only the escalated stages (MediaPipe, YOLO) can find
+CASCADE_ONLY_VIOLATIONS = {'looking_away', 'mobile_detected', 'book_detected'}
 
-        if img is None:
-            return {"objects_detected": [], "suspicious": False, "error": "Invalid image"}
-
-        # Run YOLO detection
-        results = yolo_model.predict(img, conf=0.5, verbose=False)
+def _objects_from_detections(detections):
+    """Suspicious objects among one image's detections"""
+    objects_detected = []
 
-        # Suspicious object classes
-        suspicious_classes = ['cell phone', 'book', 'laptop', 'person']
+    for detection in detections:
+        if detection["object"] in SUSPICIOUS_CLASSES:
+            objects_detected.append({
+                "object": detection["object"],
+                "confidence": detection["confidence"]
+            })
 
-        objects_detected = []
-        suspicious = False
+    return {
+        "objects_detected": objects_detected,
+        "suspicious": len(objects_detected) > 0
+    }
 
-        for result in results:
-            for box in result.boxes:
-                class_id = int(box.cls[0])
-                class_name = result.names[class_id]
-                confidence = float(box.conf[0])
+def detect_objects(image):
+    """Detect suspicious objects in a Frame (or image bytes) using YOLO"""
+    detector = model_registry.get('yolo')
+    if detector is None:
+        return {"objects_detected": [], "suspicious": False, "disabled": True}
 
-                if class_name in suspicious_classes:
-                    objects_detected.append({
-                        "object": class_name,
-                        "confidence": confidence
-                    })
-                    suspicious = True
+    frame = as_frame(image)
+    try:
+        if not frame.valid:
+            return {"objects_detected": [], "suspicious": False, "error": "Invalid image"}
 
-        return {
-            "objects_detected": objects_detected,
-            "suspicious": suspicious
-        }
+        # Run YOLO detection on the shared BGR image
+        return _objects_from_detections(detector.detect([frame.image])[0])
 
     except Exception as e:
         return {"objects_detected": [], "suspicious": False, "error": str(e)}
 
+def detect_objects_batch(frames):
+    """Detect suspicious objects in several decoded Frames with one YOLO call"""
+    detector = model_registry.get('yolo')
+    if detector is None:
+        return [{"objects_detected": [], "suspicious": False, "disabled": True} for _ in frames]
+
+    try:
+        results = detector.detect([frame.image for frame in frames])
+        return [_objects_from_detections(detections) for detections in results]
+
+    except Exception as e:
+        return [{"objects_detected": [], "suspicious": False, "error": str(e)} for _ in frames]
+
+def _escalation_reason(context, face_result):
+    """
+    Cascade policy: why a frame needs the expensive stages (MediaPipe, YOLO)
+    after the Haar face count, or None if the face count alone is trusted
+    """
+    if not Config.CASCADE_ENABLED:
+        return 'cascade_disabled'
+
+    previous_face_count = context.get('previous_face_count')
+    if previous_face_count is None:
+        return 'first_frame'
+    if face_result.get('face_count', 0) != previous_face_count:
+        return 'face_count_changed'
+
+    confidence = face_result.get('confidence')
+    if confidence is not None and confidence < Config.CASCADE_LOW_CONFIDENCE:
+        return 'low_confidence'
+
+    # Set by the web process: 'client_violation' or 'audit'
+    return context.get('force')
+
+def _escalated(frame, results):
+    """Stage condition for the expensive detectors; decided once per frame"""
+    if not hasattr(frame, 'escalation'):
+        frame.escalation = _escalation_reason(frame.context, results.get('faces', {}))
+    return frame.escalation is not None
+
+# Detectors run in order over decoded frames; Haar always runs, MediaPipe and
+# YOLO only when the cascade escalates, and YOLO takes a whole batch at once
+frame_pipeline = FramePipeline([
+    ('faces', detect_faces),
+    ('gaze', track_eye_gaze, None, _escalated),
+    ('objects', detect_objects, detect_objects_batch, _escalated)
+])
+
+# Frames analysed per escalation reason ('none' = stopped after Haar), plus
+# audit samples where an expensive stage caught what the cascade would have skipped
+cascade_counts = Counter()
+_cascade_lock = threading.Lock()
+
+# Face detections per mode: 'full' frame, 'tracked' around the last boxes,
+# or 'lost' (tracking failed and the whole frame was searched)
+face_track_counts = Counter()
+
+def cascade_context(student_exam_id):
+    """Per-attempt hints for the cascade; consumes a pending client-violation escalation"""
+    state = proctoring_sessions.get(student_exam_id)
+    context = {"previous_face_count": state.get('face_count')}
+    if state.pop('escalate', False):
+        context['force'] = 'client_violation'
+    elif random.random() < Config.CASCADE_AUDIT_RATE:
+        context['force'] = 'audit'
+
+    # Escalated frames and expired tracks get a full-frame face detection
+    track = state.get('face_track')
+    if track is not None and 'force' not in context:
+        if (track['frames'] < Config.FACE_TRACK_REDETECT_FRAMES
+                and time.monotonic() - track['started_at'] < Config.FACE_TRACK_MAX_AGE):
+            context['track'] = track['boxes']
+        else:
+            state.pop('face_track', None)
+    return context
+
+def _update_face_track(state, analysis):
+    """Start, extend or drop the attempt's face track from a frame's detection"""
+    faces = analysis.get('faces')
+    if not Config.FACE_TRACKING_ENABLED or not faces:
+        state.pop('face_track', None)
+        return
+
+    track = state.get('face_track')
+    if analysis.get('face_tracking') == 'tracked' and track is not None:
+        track['boxes'] = faces
+        track['frames'] += 1
+    elif (analysis.get('face_confidence') or 0) >= Config.CASCADE_LOW_CONFIDENCE:
+        # Only a confident full-frame detection starts a track
+        state['face_track'] = {"boxes": faces, "frames": 0, "started_at": time.monotonic()}
+    else:
+        state.pop('face_track', None)
+
+def record_frame_result(student_exam_id, context, analysis, violation_type, severity):
+    """Remember the face count, track and signature for the next frame, update the risk and count the escalation"""
+    state = proctoring_sessions.get(student_exam_id)
+    state['face_count'] = analysis['face_count']
+    _update_face_track(state, analysis)
+    frame_deduper.remember(state, context.get('signature'), analysis, violation_type)
+    record_frame_risk(state, analysis, violation_type, severity)
+
+    with _cascade_lock:
+        cascade_counts[analysis['escalation'] or 'none'] += 1
+        if analysis['escalation'] == 'audit' and violation_type in CASCADE_ONLY_VIOLATIONS:
+            cascade_counts['audit_misses'] += 1
+        face_track_counts[analysis.get('face_tracking') or 'full'] += 1
+
+def cascade_stats():
+    """Returns frames per escalation reason and the share that stopped after Haar"""
+    with _cascade_lock:
+        counts = dict(cascade_counts)
+        tracking = dict(face_track_counts)
+    frames = sum(count for reason, count in counts.items() if reason != 'audit_misses')
+    return {
+        "enabled": Config.CASCADE_ENABLED,
+        "audit_rate": Config.CASCADE_AUDIT_RATE,
+        "low_confidence": Config.CASCADE_LOW_CONFIDENCE,
+        "frames": frames,
+        "haar_only_rate": counts.get('none', 0) / frames if frames else 0.0,
+        "counts": counts,
+        "face_tracking": dict(tracking, enabled=Config.FACE_TRACKING_ENABLED)
+    }
+
+def _client_violation_response(student_exam_id, result, severities):
+    """Response for violations reported by the client: count, next capture and any warning"""
+    # Have the cascade run every detector on this attempt's next frame,
+    # and capture it sooner
+    state = proctoring_sessions.get(student_exam_id)
+    if severities:
+        state['escalate'] = True
+    for severity in severities:
+        record_violation_risk(state, severity)
+
+    new_count = result['violation_count']
+    # The ledger's current state: a flush may have sealed the attempt since this call
+    auto_submitted = result['auto_submitted'] or violation_ledger.auto_submitted(student_exam_id)
+    response = {
+        "success": True,
+        "message": "Violation logged",
+        "violation_count": new_count,
+        "auto_submitted": auto_submitted,
+        "capture_interval": capture_interval(state)
+    }
+
+    if auto_submitted:
+        response["message"] = "Exam auto-submitted due to excessive violations"
+    elif new_count >= Config.AUTO_SUBMIT_THRESHOLD - 1:
+        response["warning"] = f"Warning: One more violation will auto-submit your exam"
+    else:
+        response["warning"] = f"Warning: You have {new_count} violations. Exam may be auto-submitted at {Config.AUTO_SUBMIT_THRESHOLD} violations."
+    return response
+
+def _owned_attempt(conn, student_exam_id):
+    """The ledger's state for the user's attempt, or None if it isn't theirs"""
+    # Loaded once per attempt, then served from memory
+    try:
+        attempt = violation_ledger.load(conn, student_exam_id)
+    except (TypeError, ValueError):
+        return None
+    if attempt is None or attempt['student_id'] != session['user_id']:
+        return None
+    return attempt
+
+def _client_timestamp(value):
+    """A client event time (ms since the epoch) as a UTC timestamp; now if missing or in the future"""
+    now = time.time()
+    try:
+        seconds = min(float(value) / 1000, now)
+    except (TypeError, ValueError, OverflowError):
+        seconds = now
+    return datetime.fromtimestamp(max(seconds, 0), timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+
 @proctoring_bp.route('/violation', methods=['POST'])
 @require_student
 def log_violation():
@@ -175,190 +418,281 @@ def log_violation():
     severity = data.get('severity', 'medium')
     details = data.get('details', '{}')
 
-    conn = get_db_connection()
-    cursor = conn.cursor()
+    conn = get_db()
 
     # Verify student_exam belongs to user
-    cursor.execute('''
-        SELECT * FROM student_exams
-        WHERE id=? AND student_id=?
-    ''', (student_exam_id, session['user_id']))
-
-    student_exam = cursor.fetchone()
-    if not student_exam:
-        conn.close()
+    if _owned_attempt(conn, student_exam_id) is None:
         return jsonify({"success": False, "error": "Invalid student_exam_id"}), 400
 
     try:
-        # Log violation
-        cursor.execute('''
-            INSERT INTO proctoring_logs (student_exam_id, violation_type, severity, details)
-            VALUES (?, ?, ?, ?)
-        ''', (student_exam_id, violation_type, severity, details))
-
-        # Increment violation count
-        new_count = student_exam['violation_count'] + 1
-        cursor.execute('''
-            UPDATE student_exams
-            SET violation_count=?
-            WHERE id=?
-        ''', (new_count, student_exam_id))
-
-        # Check if should auto-submit
-        auto_submitted = False
-        if new_count >= Config.AUTO_SUBMIT_THRESHOLD:
-            # Auto-submit exam
-            cursor.execute('''
-                UPDATE student_exams
-                SET status='submitted', flagged_for_review=1, end_time=CURRENT_TIMESTAMP
-                WHERE id=?
-            ''', (student_exam_id,))
-            auto_submitted = True
-
-        conn.commit()
-        conn.close()
-
-        response = {
-            "success": True,
-            "message": "Violation logged",
-            "violation_count": new_count
-        }
-
-        if auto_submitted:
-            response["auto_submitted"] = True
-            response["message"] = "Exam auto-submitted due to excessive violations"
-        elif new_count >= Config.AUTO_SUBMIT_THRESHOLD - 1:
-            response["warning"] = f"Warning: One more violation will auto-submit your exam"
-        else:
-            response["warning"] = f"Warning: You have {new_count} violations. Exam may be auto-submitted at {Config.AUTO_SUBMIT_THRESHOLD} violations."
-
-        return jsonify(response), 201
+        # Count the violation and queue its log; the count and the
+        # auto-submit decision are made in memory, atomically
+        result = violation_ledger.record(conn, student_exam_id, violation_type, severity, details,
+                                         auto_submit=True)
+        return jsonify(_client_violation_response(student_exam_id, result, [severity])), 201
 
     except Exception as e:
-        conn.close()
         return jsonify({"success": False, "error": str(e)}), 500
 
-@proctoring_bp.route('/frame', methods=['POST'])
+@proctoring_bp.route('/violations', methods=['POST'])
 @require_student
-def analyze_frame():
-    """Upload webcam frame for AI analysis"""
-    if 'frame' not in request.files:
-        return jsonify({"success": False, "error": "No frame provided"}), 400
-
-    if 'student_exam_id' not in request.form:
-        return jsonify({"success": False, "error": "Missing student_exam_id"}), 400
+def log_violations():
+    """
+    Log a batch of client-side violations
+    Body: {student_exam_id, client_id, events: [{seq, violation_type, severity,
+    details, timestamp}]}. seq increases per client_id; events already
+    recorded (a retried batch) are skipped, so a client can re-send until it
+    gets an answer.
+    """
+    data = request.get_json(silent=True) or {}
+    student_exam_id = data.get('student_exam_id')
+    client_id = data.get('client_id')
+    events = data.get('events')
+
+    if student_exam_id is None or not isinstance(client_id, str) or not isinstance(events, list):
+        return jsonify({"success": False, "error": "Missing required fields"}), 400
+    if not 0 < len(client_id) <= 64:
+        return jsonify({"success": False, "error": "Invalid client_id"}), 400
+    if not 0 < len(events) <= Config.VIOLATION_BATCH_MAX:
+        return jsonify({"success": False, "error": f"Send between 1 and {Config.VIOLATION_BATCH_MAX} events"}), 400
+
+    parsed = []
+    for event in events:
+        if (not isinstance(event, dict) or not isinstance(event.get('violation_type'), str)
+                or not isinstance(event.get('seq'), int) or isinstance(event['seq'], bool)
+                or event['seq'] < 1):
+            return jsonify({"success": False, "error": "Each event needs a violation_type and a positive seq"}), 400
+        parsed.append({
+            "seq": event['seq'],
+            "violation_type": event['violation_type'],
+            "severity": event.get('severity', 'medium'),
+            "details": event.get('details', '{}'),
+            "timestamp": _client_timestamp(event.get('timestamp'))
+        })
+
+    if len({event['seq'] for event in parsed}) != len(parsed):
+        return jsonify({"success": False, "error": "Duplicate seq in batch"}), 400
+
+    conn = get_db()
+
+    # Verify student_exam belongs to user, once for the whole batch
+    if _owned_attempt(conn, student_exam_id) is None:
+        return jsonify({"success": False, "error": "Invalid student_exam_id"}), 400
 
-    student_exam_id = request.form['student_exam_id']
-    frame_file = request.files['frame']
+    try:
+        result = violation_ledger.record_many(conn, student_exam_id, parsed,
+                                              client_id=client_id, auto_submit=True)
+        # Re-sent events were already counted, and already raised the risk
+        new = sorted(parsed, key=lambda e: e['seq'])[len(parsed) - result['accepted']:]
+        response = _client_violation_response(student_exam_id, result, [e['severity'] for e in new])
+        response["accepted"] = result['accepted']
+        response["duplicates"] = result['duplicates']
+        return jsonify(response), 201
 
-    # Read frame bytes
-    frame_bytes = frame_file.read()
-
-    # Run AI analysis if enabled
-    if Config.AI_PROCTORING_ENABLED:
-        # Face detection
-        face_result = detect_faces(frame_bytes)
-
-        # Eye tracking
-        eye_result = track_eye_gaze(frame_bytes)
-
-        # Object detection
-        object_result = detect_objects(frame_bytes)
-
-        # Compile analysis
-        analysis = {
-            "face_count": face_result.get("face_count", 0),
-            "face_detected": face_result.get("face_detected", False),
-            "looking_at_screen": eye_result.get("looking_at_screen", True),
-            "objects_detected": object_result.get("objects_detected", []),
-            "suspicious": False
-        }
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 500
 
-        # Check for violations
-        violation_detected = False
-        violation_type = None
+def _frame_verdict(frame, results, timings):
+    """Turn detector results into (analysis, violation_type, severity), or None if undecodable"""
+    if not results:
+        return None
+
+    # Stages the cascade skipped count as "nothing found"
+    face_result = results['faces']
+    eye_result = results.get('gaze', {})
+    object_result = results.get('objects', {})
+
+    # Compile analysis
+    analysis = {
+        "face_count": face_result.get("face_count", 0),
+        "face_detected": face_result.get("face_detected", False),
+        "faces": face_result.get("faces", []),
+        "face_confidence": face_result.get("confidence"),
+        "face_tracking": face_result.get("tracking"),
+        "looking_at_screen": eye_result.get("looking_at_screen", True),
+        "objects_detected": object_result.get("objects_detected", []),
+        "suspicious": False,
+        "timings_ms": timings,
+        "stages_run": [name for name in timings if name != 'decode'],
+        "escalation": getattr(frame, 'escalation', None)
+    }
+
+    # Check for violations
+    violation_type = None
+    severity = "medium"
+
+    if face_result["face_count"] == 0:
+        violation_type = "no_face"
+        severity = "high"
+        analysis["suspicious"] = True
+
+    elif face_result["face_count"] > 1:
+        violation_type = "multiple_faces"
+        severity = "high"
+        analysis["suspicious"] = True
+
+    elif not eye_result.get("looking_at_screen", True):
+        violation_type = "looking_away"
         severity = "medium"
+        analysis["suspicious"] = True
+
+    elif object_result.get("suspicious", False):
+        # Determine specific violation type
+        for obj in object_result["objects_detected"]:
+            if obj["object"] == "cell phone":
+                violation_type = "mobile_detected"
+                severity = "high"
+                break
+            elif obj["object"] == "book":
+                violation_type = "book_detected"
+                severity = "medium"
+                break
+
+    return analysis, violation_type, severity
+
+def evaluate_frame(frame_bytes, context=None):
+    """
+    Run the detector pipeline on one frame and decide whether it is a violation
+    context carries the cascade hints from cascade_context()
+    Returns (analysis, violation_type, severity), or None if the frame doesn't
+    decode. Touches no database, so it can run in an analysis worker process.
+    """
+    return evaluate_frames([(frame_bytes, context)])[0]
+
+def evaluate_frames(items):
+    """Like evaluate_frame for a batch of (frame_bytes, context), with one YOLO call for all of them"""
+    # Decode each frame once, then run face, gaze and object detection on it
+    frames = [Frame(frame_bytes, context=context) for frame_bytes, context in items]
+    return [
+        _frame_verdict(frame, results, timings)
+        for frame, (results, timings) in zip(frames, frame_pipeline.run_batch(frames))
+    ]
+
+def _attempt_status(conn, student_exam_id):
+    """The attempt's stored status, or None if it doesn't exist"""
+    row = conn.execute("SELECT status FROM student_exams WHERE id=?", (student_exam_id,)).fetchone()
+    return row['status'] if row else None
+
+def record_frame_violation(conn, student_exam_id, frame_bytes, analysis, violation_type, severity):
+    """Save the frame as evidence, log the violation and add violation fields to analysis"""
+    # A queued frame can finish after the attempt was submitted; don't count it then
+    if _attempt_status(conn, student_exam_id) != 'in_progress':
+        return
+    if violation_ledger.load(conn, student_exam_id) is None:
+        return
+
+    # Save frame image (re-encoded, content-addressed, with a thumbnail)
+    relative_path = evidence_store.save(frame_bytes)
+
+    # Count the violation; its log row is written with the next batch
+    result = violation_ledger.record(conn, student_exam_id, violation_type, severity,
+                                     json.dumps(analysis), image_path=relative_path)
+
+    analysis["violation_logged"] = True
+    analysis["violation_type"] = violation_type
+    analysis["violation_count"] = result['violation_count']
+    analysis["auto_submitted"] = result['auto_submitted']
+
+def _finish_queued_frame(job, result):
+    """Record a worker's verdict for a queued frame; returns the analysis to report"""
+    if result is None:
+        raise ValueError("Invalid image")
+
+    analysis, violation_type, severity = result
+    # Timings were measured in the worker; keep the stage stats in this process
+    frame_pipeline.stats.record(analysis["timings_ms"])
+    record_frame_result(job['student_exam_id'], job['context'], analysis, violation_type, severity)
+
+    if violation_type:
+        pool = get_pool()
+        conn = pool.acquire()
+        try:
+            record_frame_violation(conn, job['student_exam_id'], job['frame_bytes'],
+                                   analysis, violation_type, severity)
+        finally:
+            pool.release(conn)
+    return analysis
+
+def warm_up_models():
+    """Load every detector model in this process; runs in each analysis worker as it starts"""
+    model_registry.warm_up()
+
+frame_queue = FrameAnalysisQueue(
+    analyze_batch=evaluate_frames,
+    on_result=_finish_queued_frame,
+    warm_up=warm_up_models,
+    workers=Config.FRAME_ANALYSIS_WORKERS,
+    queue_size=Config.FRAME_QUEUE_SIZE,
+    result_ttl=Config.FRAME_RESULT_TTL,
+    batch_size=Config.FRAME_BATCH_SIZE,
+    batch_wait_ms=Config.FRAME_BATCH_WAIT_MS
+)
+
+# Set by warm_up(), which may be called without MODEL_WARMUP (e.g. from a post-fork hook)
+_warm_up_started = False
+
+def warm_up():
+    """
+    Get frame analysis ready ahead of traffic without blocking: start the
+    analysis worker processes, which load their models, or load the models
+    here when frames are analysed inline; also start the evidence sweeper
+    """
+    global _warm_up_started
+    _warm_up_started = True
+    if Config.AI_PROCTORING_ENABLED and Config.FRAME_ANALYSIS_WORKERS > 0:
+        frame_queue.warm_up()
+    elif Config.AI_PROCTORING_ENABLED:
+        model_registry.warm_up(background=True)
+    evidence_store.start_sweeper()
+
+def readiness():
+    """Returns whether warm_up() has run and what it started has finished"""
+    if not Config.AI_PROCTORING_ENABLED or not (Config.MODEL_WARMUP or _warm_up_started):
+        # Nothing to wait for; models load on first use
+        return {"ready": True, "warm_up": False}
+    if Config.FRAME_ANALYSIS_WORKERS > 0:
+        # Models live in the worker processes; they are ready once every worker has started
+        return {"ready": frame_queue.ready(), "workers": Config.FRAME_ANALYSIS_WORKERS}
+    return {"ready": model_registry.ready(), "models": model_registry.status()}
+
+def issue_frame_token(student_exam_id, student_id):
+    """A signed token that lets its holder upload frames for one attempt without a session"""
+    return _frame_tokens.dumps([student_exam_id, student_id])
+
+def _verify_frame_token(token):
+    """Returns (student_exam_id, student_id) for a valid, unexpired frame token, else None"""
+    try:
+        student_exam_id, student_id = _frame_tokens.loads(token or '', max_age=Config.FRAME_TOKEN_TTL)
+    except (BadSignature, ValueError, TypeError):
+        return None
+    return student_exam_id, student_id
+
+def _ingest_frame(student_exam_id, student_id, frame_bytes):
+    """
+    Analyse an uploaded frame, or queue it when analysis workers are configured
+    Returns (response body, HTTP status); shared by the multipart, raw and
+    WebSocket uploads. Frame tokens outlive the attempt, so its stored status
+    is checked on every frame: once submitted, frames get a 409.
+    auto_submitted tells the client the attempt was sealed, possibly by a
+    background flush rather than by this frame
+    """
+    pool = get_pool()
+    conn = pool.acquire()
+    try:
+        attempt_status = _attempt_status(conn, student_exam_id)
+    finally:
+        pool.release(conn)
 
-        if face_result["face_count"] == 0:
-            violation_detected = True
-            violation_type = "no_face"
-            severity = "high"
-            analysis["suspicious"] = True
-
-        elif face_result["face_count"] > 1:
-            violation_detected = True
-            violation_type = "multiple_faces"
-            severity = "high"
-            analysis["suspicious"] = True
-
-        elif not eye_result.get("looking_at_screen", True):
-            violation_detected = True
-            violation_type = "looking_away"
-            severity = "medium"
-            analysis["suspicious"] = True
-
-        elif object_result.get("suspicious", False):
-            violation_detected = True
-            # Determine specific violation type
-            for obj in object_result["objects_detected"]:
-                if obj["object"] == "cell phone":
-                    violation_type = "mobile_detected"
-                    severity = "high"
-                    break
-                elif obj["object"] == "book":
-                    violation_type = "book_detected"
-                    severity = "medium"
-                    break
-
-        # Log violation if detected
-        if violation_detected and violation_type:
-            conn = get_db_connection()
-            cursor = conn.cursor()
-
-            # Save frame image
-            timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
-            image_dir = os.path.join(os.path.dirname(__file__), 'proctoring_images', str(student_exam_id))
-            os.makedirs(image_dir, exist_ok=True)
-
-            image_path = os.path.join(image_dir, f"{timestamp}.jpg")
-            with open(image_path, 'wb') as f:
-                f.write(frame_bytes)
-
-            relative_path = f"proctoring_images/{student_exam_id}/{timestamp}.jpg"
-
-            # Log violation
-            details = json.dumps(analysis)
-            cursor.execute('''
-                INSERT INTO proctoring_logs (student_exam_id, violation_type, severity, details, image_path)
-                VALUES (?, ?, ?, ?, ?)
-            ''', (student_exam_id, violation_type, severity, details, relative_path))
-
-            # Increment violation count
-            cursor.execute('''
-                UPDATE student_exams
-                SET violation_count = violation_count + 1
-                WHERE id=?
-            ''', (student_exam_id,))
-
-            # Get updated count
-            cursor.execute("SELECT violation_count FROM student_exams WHERE id=?", (student_exam_id,))
-            violation_count = cursor.fetchone()['violation_count']
-
-            conn.commit()
-            conn.close()
-
-            analysis["violation_logged"] = True
-            analysis["violation_type"] = violation_type
-            analysis["violation_count"] = violation_count
-
-        return jsonify({
-            "success": True,
-            "analysis": analysis
-        }), 200
-
+    if attempt_status != 'in_progress':
+        body, status = {"success": False, "error": "Exam is not in progress"}, 409
     else:
-        # AI proctoring disabled
-        return jsonify({
+        body, status = _analyse_frame(student_exam_id, student_id, frame_bytes)
+    body["auto_submitted"] = violation_ledger.auto_submitted(student_exam_id)
+    return body, status
+
+def _analyse_frame(student_exam_id, student_id, frame_bytes):
+    if not Config.AI_PROCTORING_ENABLED:
+        return {
             "success": True,
             "analysis": {
                 "face_count": 1,
@@ -367,16 +701,218 @@ def analyze_frame():
                 "objects_detected": [],
                 "suspicious": False,
                 "ai_disabled": True
-            }
-        }), 200
+            },
+            "capture_interval": Config.FRAME_CAPTURE_INTERVAL
+        }, 200
+
+    state = proctoring_sessions.get(student_exam_id)
+
+    # A frame nearly identical to the last clean one gets the same answer, no models run
+    reused, signature = frame_deduper.check(state, frame_bytes)
+    if reused is not None:
+        return {"success": True, "analysis": reused, "capture_interval": capture_interval(state)}, 200
+
+    context = cascade_context(student_exam_id)
+    context['signature'] = signature
+
+    if Config.FRAME_ANALYSIS_WORKERS > 0:
+        job_id = frame_queue.submit(student_exam_id, student_id, frame_bytes, context)
+        if job_id is None:
+            # Backpressure: drop this frame and have the client retry later
+            return {"success": False, "error": "Frame analysis queue is full",
+                    "retry_after": Config.FRAME_CAPTURE_INTERVAL}, 503
+
+        return {
+            "success": True,
+            "status": "pending",
+            "job_id": job_id,
+            "capture_interval": capture_interval(state)
+        }, 202
+
+    result = evaluate_frame(frame_bytes, context)
+    if result is None:
+        return {"success": False, "error": "Invalid image"}, 400
+
+    analysis, violation_type, severity = result
+    record_frame_result(student_exam_id, context, analysis, violation_type, severity)
+
+    # Log violation if detected
+    if violation_type:
+        pool = get_pool()
+        conn = pool.acquire()
+        try:
+            record_frame_violation(conn, student_exam_id, frame_bytes, analysis, violation_type, severity)
+        finally:
+            pool.release(conn)
+
+    return {"success": True, "analysis": analysis, "capture_interval": capture_interval(state)}, 200
+
+def _frame_response(body, status):
+    response = jsonify(body)
+    if status == 503:
+        response.headers['Retry-After'] = str(body['retry_after'])
+    return response, status
+
+def _frame_result(job):
+    """Response body and HTTP status for a queued frame's job"""
+    body, status = _queued_frame_result(job)
+    body["auto_submitted"] = violation_ledger.auto_submitted(job['student_exam_id'])
+    return body, status
+
+def _queued_frame_result(job):
+    if job['status'] == 'pending':
+        return {"success": True, "status": "pending", "job_id": job['job_id']}, 202
+
+    if job['status'] == 'failed':
+        return {"success": False, "status": "failed", "job_id": job['job_id'], "error": job['error']}, 422
+
+    return {
+        "success": True,
+        "status": "done",
+        "job_id": job['job_id'],
+        "analysis": job['analysis'],
+        # Reflects this frame's verdict, unlike the interval given at upload
+        "capture_interval": capture_interval(proctoring_sessions.get(job['student_exam_id']))
+    }, 200
+
+@proctoring_bp.route('/capture-settings', methods=['GET'])
+@require_student
+def get_capture_settings():
+    """
+    How the client should capture and upload frames for an attempt
+    Returns the capture width, JPEG quality and grayscale flag, and a frame
+    token for the raw and WebSocket uploads, which skip the session
+    """
+    conn = get_db()
+    student_exam_id = request.args.get('student_exam_id', type=int)
+    if student_exam_id is None or _owned_attempt(conn, student_exam_id) is None:
+        return jsonify({"success": False, "error": "Invalid student_exam_id"}), 400
+
+    return jsonify({
+        "success": True,
+        "settings": {
+            "width": Config.FRAME_UPLOAD_WIDTH,
+            "quality": Config.FRAME_UPLOAD_QUALITY,
+            "grayscale": Config.FRAME_UPLOAD_GRAYSCALE
+        },
+        "frame_token": issue_frame_token(student_exam_id, session['user_id']),
+        "token_ttl": Config.FRAME_TOKEN_TTL,
+        "websocket": sock is not None,
+        "capture_interval": capture_interval(proctoring_sessions.get(student_exam_id))
+    }), 200
+
+@proctoring_bp.route('/frame', methods=['POST'])
+@require_student
+def analyze_frame():
+    """
+    Upload webcam frame for AI analysis
+    With analysis workers configured the frame is queued and the response is
+    202 with a job_id to poll; otherwise it is analysed inline (200).
+    capture_interval tells the client how many seconds to wait before the
+    next frame, from the attempt's risk score.
+    """
+    if 'frame' not in request.files:
+        return jsonify({"success": False, "error": "No frame provided"}), 400
+
+    if 'student_exam_id' not in request.form:
+        return jsonify({"success": False, "error": "Missing student_exam_id"}), 400
+
+    try:
+        student_exam_id = int(request.form['student_exam_id'])
+    except ValueError:
+        return jsonify({"success": False, "error": "Invalid student_exam_id"}), 400
+
+    if _owned_attempt(get_db(), student_exam_id) is None:
+        return jsonify({"success": False, "error": "Invalid student_exam_id"}), 400
+
+    # Read frame bytes
+    frame_bytes = request.files['frame'].read()
+    return _frame_response(*_ingest_frame(student_exam_id, session['user_id'], frame_bytes))
+
+@proctoring_bp.route('/frame/raw', methods=['POST'])
+def analyze_raw_frame():
+    """
+    Upload a webcam frame as the raw JPEG body
+    X-Student-Exam-Id and X-Frame-Token (from /capture-settings) identify the
+    attempt, so no multipart parsing or session lookup is needed; send it
+    without cookies. Responds like POST /frame.
+    """
+    claims = _verify_frame_token(request.headers.get('X-Frame-Token'))
+    if claims is None or str(claims[0]) != request.headers.get('X-Student-Exam-Id'):
+        return jsonify({"success": False, "error": "Invalid or expired frame token"}), 401
+
+    if request.content_length is None or request.content_length > Config.FRAME_UPLOAD_MAX_BYTES:
+        return jsonify({"success": False, "error": "Frame missing or too large"}), 413
+
+    frame_bytes = request.get_data(cache=False)
+    if not frame_bytes:
+        return jsonify({"success": False, "error": "No frame provided"}), 400
+    return _frame_response(*_ingest_frame(claims[0], claims[1], frame_bytes))
+
+def frame_socket(ws):
+    """
+    One WebSocket per attempt (/api/proctoring/ws)
+    The first message is the frame token, as text, so it stays out of URLs
+    and access logs. Each later binary message is a JPEG frame; each gets a
+    JSON text reply shaped like the POST /frame response plus its HTTP
+    status as "status_code". Queued frames' verdicts are pushed when ready
+    instead of being polled. The socket closes once the attempt is no longer
+    in progress.
+    """
+    token = ws.receive(timeout=FRAME_SOCKET_AUTH_TIMEOUT)
+    claims = _verify_frame_token(token) if isinstance(token, str) else None
+    if claims is None:
+        ws.send(json.dumps({"success": False, "error": "Invalid or expired frame token", "status_code": 401}))
+        return
+    student_exam_id, student_id = claims
+
+    pending = []  # queued job ids whose verdicts are still to be pushed
+    while True:
+        message = ws.receive(timeout=FRAME_SOCKET_POLL if pending else None)
+        if isinstance(message, (bytes, bytearray)):
+            if len(message) > Config.FRAME_UPLOAD_MAX_BYTES:
+                body, status = {"success": False, "error": "Frame too large"}, 413
+            else:
+                body, status = _ingest_frame(student_exam_id, student_id, bytes(message))
+            if status == 202:
+                pending.append(body['job_id'])
+            ws.send(json.dumps(dict(body, status_code=status)))
+            if status == 409:
+                return  # attempt submitted; the token is no good any more
+
+        for job_id in list(pending):
+            job = frame_queue.get(job_id)
+            if job is None:
+                pending.remove(job_id)  # expired
+            elif job['status'] != 'pending':
+                pending.remove(job_id)
+                body, status = _frame_result(job)
+                ws.send(json.dumps(dict(body, status_code=status)))
+
+if sock is not None:
+    sock.route('/ws', bp=proctoring_bp)(frame_socket)
+
+@proctoring_bp.route('/frame/<job_id>', methods=['GET'])
+@require_student
+def get_frame_result(job_id):
+    """Poll the analysis of a queued frame"""
+    job = frame_queue.get(job_id)
+    if job is None or job['student_id'] != session['user_id']:
+        return jsonify({"success": False, "error": "Frame result not found"}), 404
+
+    body, status = _frame_result(job)
+    return jsonify(body), status
 
 @proctoring_bp.route('/logs/<int:student_exam_id>', methods=['GET'])
 @require_admin
 def get_logs(student_exam_id):
     """Get proctoring logs for an exam attempt (Admin only)"""
-    conn = get_db_connection()
+    conn = get_db()
     cursor = conn.cursor()
 
+    # Write any queued violations first so the logs and count are current
+    violation_ledger.flush(conn)
+
     cursor.execute('''
         SELECT * FROM proctoring_logs
         WHERE student_exam_id=?
@@ -391,11 +927,57 @@ def get_logs(student_exam_id):
     ''', (student_exam_id,))
 
     exam_data = cursor.fetchone()
-    conn.close()
 
     return jsonify({
         "success": True,
-        "logs": [dict(log) for log in logs],
+        "logs": [
+            dict(log, thumbnail_path=evidence_store.thumbnail_path(log['image_path']))
+            for log in logs
+        ],
         "total_violations": exam_data['violation_count'] if exam_data else 0,
         "flagged_for_review": bool(exam_data['flagged_for_review']) if exam_data else False
     }), 200
+
+@proctoring_bp.route('/stream', methods=['GET'])
+@require_admin
+def stream_events():
+    """
+    Stream live violations and auto-submits as Server-Sent Events (Admin only)
+    Query: exam_id, min_severity (low/medium/high). A reconnecting
+    EventSource sends Last-Event-ID and gets the events it missed, as far as
+    they are still kept.
+    """
+    exam_id = request.args.get('exam_id', type=int)
+    min_severity = request.args.get('min_severity')
+    if min_severity is not None and min_severity not in SEVERITY_ORDER:
+        return jsonify({"success": False, "error": "min_severity must be low, medium or high"}), 400
+
+    try:
+        last_event_id = int(request.headers.get('Last-Event-ID', ''))
+    except ValueError:
+        last_event_id = None
+
+    subscriber = proctoring_events.subscribe(exam_id, min_severity, last_event_id)
+    if subscriber is None:
+        return jsonify({"success": False, "error": "Too many live streams open"}), 503
+
+    def generate():
+        try:
+            # Sent at once so proxies and the browser see the stream is open
+            yield "retry: 3000\n: connected\n\n"
+            while True:
+                event = subscriber.get(timeout=Config.PROCTORING_STREAM_HEARTBEAT)
+                if event is None:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield f"id: {event['id']}\nevent: {event['type']}\ndata: {json.dumps(event)}\n\n"
+        except SubscriberDropped:
+            # Fell too far behind; the client reconnects and replays from Last-Event-ID
+            yield 'event: dropped\ndata: {}\n\n'
+        finally:
+            proctoring_events.unsubscribe(subscriber)
+
+    return Response(stream_with_context(generate()), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'  # don't let nginx buffer the stream
+    })
@@ -0,0 +1,128 @@
+"""
+In-process fan-out of live proctoring events to invigilator streams.
+
+The violation ledger publishes every violation it records, and every
+auto-submit, as it happens. Each subscriber (an open /api/proctoring/stream
+connection) has its own filter (exam, minimum severity) and a buffer of at
+most PROCTORING_STREAM_BUFFER events. A subscriber that falls that far
+behind is dropped rather than slowing publishers or growing without bound.
+Its stream ends, and the browser's EventSource reconnects with
+Last-Event-ID, which replays what it missed from the last
+PROCTORING_STREAM_HISTORY events.
+
+Events are only seen by streams served by the process that recorded them;
+run the proctoring blueprint in one process to watch every candidate.
+"""
+import threading
+import time
+from collections import deque
+from config import Config
+
+SEVERITY_ORDER = {'low': 0, 'medium': 1, 'high': 2}
+
+class SubscriberDropped(Exception):
+    """The subscriber fell too far behind and was disconnected"""
+
+class Subscriber:
+    """One stream's filter and bounded event buffer"""
+
+    def __init__(self, exam_id, min_severity, buffer_size):
+        self.exam_id = exam_id
+        self.min_severity = min_severity
+        self.buffer_size = buffer_size
+        self.events = deque()
+        self.dropped = False
+        self._ready = threading.Condition()
+
+    def matches(self, event):
+        if self.exam_id is not None and event['exam_id'] != self.exam_id:
+            return False
+        # Auto-submits always pass; they carry no severity
+        severity = SEVERITY_ORDER.get(event.get('severity'), SEVERITY_ORDER['high'])
+        return self.min_severity is None or severity >= SEVERITY_ORDER[self.min_severity]
+
+    def offer(self, event):
+        """Buffer an event; returns False if the buffer was full and the subscriber is dropped"""
+        with self._ready:
+            if len(self.events) >= self.buffer_size:
+                self.dropped = True
+                self.events.clear()
+            else:
+                self.events.append(event)
+            self._ready.notify()
+            return not self.dropped
+
+    def get(self, timeout):
+        """Next event, or None after timeout seconds; raises SubscriberDropped once dropped"""
+        with self._ready:
+            if not self.events and not self.dropped:
+                self._ready.wait(timeout)
+            if self.dropped:
+                raise SubscriberDropped()
+            return self.events.popleft() if self.events else None
+
+class EventBroker:
+    """Publishes proctoring events to matching subscribers, keeping recent ones for replay"""
+
+    def __init__(self, buffer_size, history_size, max_subscribers):
+        self.buffer_size = buffer_size
+        self.max_subscribers = max_subscribers
+        self._subscribers = set()
+        self._history = deque(maxlen=history_size)
+        self._next_id = 1
+        self._lock = threading.Lock()
+        self.published = 0
+        self.dropped = 0
+
+    def publish(self, event):
+        """Stamp an event with an id and time and deliver it to every matching subscriber"""
+        with self._lock:
+            event = dict(event, id=self._next_id, published_at=time.time())
+            self._next_id += 1
+            self._history.append(event)
+            self.published += 1
+            subscribers = [s for s in self._subscribers if s.matches(event)]
+
+        slow = [s for s in subscribers if not s.offer(event)]
+        if slow:
+            with self._lock:
+                self._subscribers.difference_update(slow)
+                self.dropped += len(slow)
+        return event
+
+    def subscribe(self, exam_id=None, min_severity=None, last_event_id=None):
+        """
+        Register a subscriber, or return None if the subscriber limit is reached
+        With last_event_id, later events still in the history are buffered first.
+        """
+        subscriber = Subscriber(exam_id, min_severity, self.buffer_size)
+        with self._lock:
+            if len(self._subscribers) >= self.max_subscribers:
+                return None
+            if last_event_id is not None:
+                missed = [e for e in self._history if e['id'] > last_event_id and subscriber.matches(e)]
+                # More than fits would drop it straight away; keep the newest
+                subscriber.events.extend(missed[-self.buffer_size:])
+            self._subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            self._subscribers.discard(subscriber)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "subscribers": len(self._subscribers),
+                "max_subscribers": self.max_subscribers,
+                "published": self.published,
+                "dropped_subscribers": self.dropped,
+                "buffer_size": self.buffer_size,
+                "history": len(self._history)
+            }
+
+proctoring_events = EventBroker(
+    buffer_size=Config.PROCTORING_STREAM_BUFFER,
+    history_size=Config.PROCTORING_STREAM_HISTORY,
+    max_subscribers=Config.PROCTORING_STREAM_MAX_SUBSCRIBERS
+)
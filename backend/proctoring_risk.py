@@ -0,0 +1,87 @@
+"""
+Per-attempt proctoring risk and the frame capture interval it implies.
+
+Each attempt carries a risk score in [0, 1] in its proctoring session state.
+It starts at RISK_INITIAL, halves every RISK_HALF_LIFE seconds without
+incident, and rises with every violation (by severity, scaled by detector
+confidence where there is one) and with weaker signals such as a low
+confidence face detection or a non-violating suspicious object.
+
+The client is told to capture its next frame after
+    FRAME_CAPTURE_MAX_INTERVAL * (FRAME_CAPTURE_MIN_INTERVAL / FRAME_CAPTURE_MAX_INTERVAL) ** risk
+seconds: a quiet candidate drifts towards the maximum interval, and a
+suspicious one is watched at up to the minimum interval.
+"""
+import threading
+import time
+from collections import deque
+from config import Config
+
+# Risk added per violation severity
+SEVERITY_RISK = {'low': 0.15, 'medium': 0.35, 'high': 0.6}
+
+# Risk added by signals that aren't violations on their own
+LOW_CONFIDENCE_RISK = 0.1
+SUSPICIOUS_OBJECT_RISK = 0.2  # scaled by detection confidence
+
+# Recently issued intervals kept for stats
+INTERVAL_SAMPLES = 1000
+
+_issued = deque(maxlen=INTERVAL_SAMPLES)
+_issued_lock = threading.Lock()
+
+def current_risk(state, now=None):
+    """The attempt's risk score decayed to now"""
+    now = time.monotonic() if now is None else now
+    if 'risk' not in state:
+        state['risk'], state['risk_at'] = Config.RISK_INITIAL, now
+    elapsed = now - state['risk_at']
+    return state['risk'] * 0.5 ** (elapsed / Config.RISK_HALF_LIFE)
+
+def add_risk(state, amount):
+    """Raise the attempt's risk; independent signals combine as 1 - (1 - risk)(1 - amount)"""
+    now = time.monotonic()
+    risk = current_risk(state, now)
+    state['risk'] = 1 - (1 - risk) * (1 - min(1.0, max(0.0, amount)))
+    state['risk_at'] = now
+
+def record_violation_risk(state, severity, confidence=None):
+    """Raise risk for a violation, weighted by detector confidence when known"""
+    amount = SEVERITY_RISK.get(severity, SEVERITY_RISK['medium'])
+    add_risk(state, amount * (confidence if confidence is not None else 1.0))
+
+def record_frame_risk(state, analysis, violation_type, severity):
+    """Raise risk from an analysed frame's verdict and detector signals"""
+    # The candidate is always a 'person'; only other objects count as signals
+    objects = [obj for obj in analysis.get('objects_detected', []) if obj['object'] != 'person']
+    if violation_type:
+        # Object violations carry the detector's confidence; face and gaze ones don't
+        confidences = [obj['confidence'] for obj in objects]
+        confidence = max(confidences) if violation_type in ('mobile_detected', 'book_detected') and confidences else None
+        record_violation_risk(state, severity, confidence)
+    elif objects:
+        add_risk(state, SUSPICIOUS_OBJECT_RISK * max(obj['confidence'] for obj in objects))
+
+    if analysis.get('escalation') == 'low_confidence':
+        add_risk(state, LOW_CONFIDENCE_RISK)
+
+def capture_interval(state):
+    """Seconds until the attempt's next frame should be captured"""
+    low, high = Config.FRAME_CAPTURE_MIN_INTERVAL, Config.FRAME_CAPTURE_MAX_INTERVAL
+    interval = round(high * (low / high) ** current_risk(state), 1)
+    with _issued_lock:
+        _issued.append(interval)
+    return interval
+
+def risk_stats():
+    """Returns the interval bounds and the mean of recently issued intervals"""
+    with _issued_lock:
+        issued = list(_issued)
+    return {
+        "min_interval": Config.FRAME_CAPTURE_MIN_INTERVAL,
+        "max_interval": Config.FRAME_CAPTURE_MAX_INTERVAL,
+        "half_life": Config.RISK_HALF_LIFE,
+        "initial_risk": Config.RISK_INITIAL,
+        "issued": len(issued),
+        "mean_interval": round(sum(issued) / len(issued), 2) if issued else None
+    }
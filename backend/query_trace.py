@@ -0,0 +1,197 @@
+"""
+SQL tracing for pooled request connections.
+
+TracingConnection/TracingCursor time every statement executed during a
+request (including the fetches that step its rows). After the request the
+totals are added to response headers, folded into process-wide per-statement
+stats, and statements slower than Config.SLOW_QUERY_MS are written to the
+slow-query log together with their EXPLAIN QUERY PLAN.
+"""
+import json
+import logging
+import re
+import sqlite3
+import threading
+import time
+from functools import lru_cache
+from flask import g, request, has_request_context
+from config import Config
+
+MAX_TRACKED_STATEMENTS = 500
+
+slow_query_logger = logging.getLogger('skillspark.slow_queries')
+
+_stats = {}
+_stats_lock = threading.Lock()
+
+@lru_cache(maxsize=1024)
+def normalize_sql(sql):
+    """Collapse whitespace and replace literals so equivalent statements group together"""
+    sql = re.sub(r"'(?:[^']|'')*'", '?', sql)
+    sql = re.sub(r'\b\d+(?:\.\d+)?\b', '?', sql)
+    sql = re.sub(r'\s+', ' ', sql).strip()
+    sql = re.sub(r'\(\s*\?(?:\s*,\s*\?)+\s*\)', '(?, ...)', sql)
+    return sql
+
+def _start_entry(sql, parameters):
+    """Create a trace entry for the current request, if any"""
+    if not has_request_context():
+        return None
+    entry = {"sql": sql, "params": parameters, "duration": 0.0, "rows": 0}
+    g.setdefault('sql_trace', []).append(entry)
+    return entry
+
+class TracingCursor(sqlite3.Cursor):
+    """Cursor that records statement duration and row counts"""
+
+    _entry = None
+
+    def execute(self, sql, parameters=()):
+        self._entry = _start_entry(sql, parameters)
+        started = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            self._record(started, max(self.rowcount, 0))
+
+    def executemany(self, sql, seq_of_parameters):
+        # Parameter iterators cannot be replayed for EXPLAIN
+        self._entry = _start_entry(sql, None)
+        started = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            self._record(started, max(self.rowcount, 0))
+
+    def fetchone(self):
+        started = time.perf_counter()
+        row = super().fetchone()
+        self._record(started, 1 if row is not None else 0)
+        return row
+
+    def fetchmany(self, size=None):
+        started = time.perf_counter()
+        rows = super().fetchmany(self.arraysize if size is None else size)
+        self._record(started, len(rows))
+        return rows
+
+    def fetchall(self):
+        started = time.perf_counter()
+        rows = super().fetchall()
+        self._record(started, len(rows))
+        return rows
+
+    def __next__(self):
+        started = time.perf_counter()
+        row = super().__next__()
+        self._record(started, 1)
+        return row
+
+    def _record(self, started, rows):
+        if self._entry is not None:
+            self._entry["duration"] += time.perf_counter() - started
+            self._entry["rows"] += rows
+
+class TracingConnection(sqlite3.Connection):
+    """Connection whose cursors are TracingCursors"""
+
+    def cursor(self, factory=TracingCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+def explain(conn, sql, parameters):
+    """Returns the EXPLAIN QUERY PLAN detail lines for a statement"""
+    try:
+        # A plain cursor keeps the EXPLAIN itself out of the trace
+        cursor = conn.cursor(sqlite3.Cursor)
+        cursor.execute(f"EXPLAIN QUERY PLAN {sql}", parameters or ())
+        return [row[3] for row in cursor.fetchall()]
+    except sqlite3.Error as e:
+        return [f"unavailable: {e}"]
+
+def _aggregate(entries):
+    """Fold a request's statements into the process-wide stats"""
+    with _stats_lock:
+        for entry in entries:
+            key = normalize_sql(entry["sql"])
+            stat = _stats.get(key)
+            if stat is None:
+                if len(_stats) >= MAX_TRACKED_STATEMENTS:
+                    continue
+                stat = _stats[key] = {
+                    "statement": key,
+                    "calls": 0,
+                    "total_ms": 0.0,
+                    "max_ms": 0.0,
+                    "rows": 0
+                }
+            duration_ms = entry["duration"] * 1000
+            stat["calls"] += 1
+            stat["total_ms"] += duration_ms
+            stat["max_ms"] = max(stat["max_ms"], duration_ms)
+            stat["rows"] += entry["rows"]
+
+def _log_slow_queries(entries):
+    """Write statements over the threshold, with their query plan, to the slow-query log"""
+    conn = g.get('db')
+    for entry in entries:
+        duration_ms = entry["duration"] * 1000
+        if duration_ms < Config.SLOW_QUERY_MS:
+            continue
+        record = {
+            "endpoint": request.endpoint,
+            "duration_ms": round(duration_ms, 3),
+            "rows": entry["rows"],
+            "statement": normalize_sql(entry["sql"])
+        }
+        if conn is not None and entry["params"] is not None:
+            record["plan"] = explain(conn, entry["sql"], entry["params"])
+        slow_query_logger.warning(json.dumps(record))
+
+def top_statements(limit=20, order_by='total_ms'):
+    """Returns the tracked statements sorted by the given metric"""
+    with _stats_lock:
+        stats = [dict(stat) for stat in _stats.values()]
+    for stat in stats:
+        stat["avg_ms"] = stat["total_ms"] / stat["calls"] if stat["calls"] else 0.0
+    stats.sort(key=lambda s: s.get(order_by, 0), reverse=True)
+    return stats[:limit]
+
+def reset_stats():
+    """Clear the process-wide statement stats"""
+    with _stats_lock:
+        _stats.clear()
+
+def after_request(response):
+    """Attach per-request SQL totals and record the request's statements"""
+    entries = g.pop('sql_trace', None)
+    if not entries:
+        response.headers['X-SQL-Queries'] = '0'
+        response.headers['X-SQL-Time-Ms'] = '0.000'
+        return response
+
+    total_ms = sum(entry["duration"] for entry in entries) * 1000
+    response.headers['X-SQL-Queries'] = str(len(entries))
+    response.headers['X-SQL-Time-Ms'] = f"{total_ms:.3f}"
+
+    _aggregate(entries)
+    _log_slow_queries(entries)
+    return response
+
+def init_app(app):
+    """Register SQL tracing hooks and configure the slow-query log"""
+    if not Config.SQL_TRACE_ENABLED:
+        return
+
+    if Config.SLOW_QUERY_LOG and not slow_query_logger.handlers:
+        handler = logging.FileHandler(Config.SLOW_QUERY_LOG)
+        handler.setFormatter(logging.Formatter('%(asctime)s %(message)s'))
+        slow_query_logger.addHandler(handler)
+        slow_query_logger.propagate = False
+
+    app.after_request(after_request)
@@ -0,0 +1,167 @@
+"""
+Run untrusted programs under CPU, memory, file-size, process and wall-clock limits.
+
+Limits are applied by exec'ing the program through util-linux prlimit, so
+nothing runs in the forked child of this multi-threaded server. Without
+prlimit they are set on the child with resource.prlimit right after it
+starts. Output goes to a file in the run directory so RLIMIT_FSIZE bounds
+it, and only the first output_limit characters are read back.
+
+Rlimits alone do not isolate a program: it can still read whatever the
+server user can and open network connections. Set JUDGE_RUN_AS_USER to a
+dedicated unprivileged account (the server must run as root to switch to
+it) and JUDGE_JAIL_COMMAND to a jail such as bwrap or nsjail that removes
+network access and mounts everything outside the run directory read-only.
+"""
+import os
+import pwd
+import shlex
+import shutil
+import signal
+import subprocess
+import sys
+import time
+from config import Config
+
+try:
+    import resource
+    RLIMITS_AVAILABLE = True
+except ImportError:
+    RLIMITS_AVAILABLE = False
+    print("Warning: resource module not available. Judge runs without CPU/memory limits.")
+
+# Hard cap on bytes a run may write, well above any sensible expected output
+MAX_OUTPUT_FILE_BYTES = 1024 * 1024
+
+# {cwd} in the jail command is replaced by the run directory
+JAIL_COMMAND = shlex.split(Config.JUDGE_JAIL_COMMAND)
+
+PRLIMIT = shutil.which('prlimit')
+if RLIMITS_AVAILABLE and PRLIMIT is None and not hasattr(resource, 'prlimit'):
+    RLIMITS_AVAILABLE = False
+    print("Warning: prlimit not available. Judge runs without CPU/memory limits.")
+
+# Own process group so the whole tree can be killed; set up without running
+# Python in the forked child, unlike preexec_fn
+if sys.version_info >= (3, 11):
+    PROCESS_GROUP = {"process_group": 0}
+else:
+    PROCESS_GROUP = {"start_new_session": True}
+
+def _run_as_user():
+    """Passwd entry of JUDGE_RUN_AS_USER, or None to run as the server user"""
+    if not Config.JUDGE_RUN_AS_USER:
+        return None
+    try:
+        return pwd.getpwnam(Config.JUDGE_RUN_AS_USER)
+    except KeyError:
+        raise RuntimeError(f"JUDGE_RUN_AS_USER '{Config.JUDGE_RUN_AS_USER}' does not exist")
+
+def _rlimits(cpu_seconds, memory_bytes, max_processes):
+    """Returns [(resource, (soft, hard))] for a run"""
+    limits = [
+        (resource.RLIMIT_CPU, (cpu_seconds, cpu_seconds + 1)),
+        (resource.RLIMIT_FSIZE, (MAX_OUTPUT_FILE_BYTES, MAX_OUTPUT_FILE_BYTES)),
+        (resource.RLIMIT_CORE, (0, 0))
+    ]
+    if memory_bytes:
+        limits.append((resource.RLIMIT_AS, (memory_bytes, memory_bytes)))
+    if max_processes:
+        # Counts every process of the uid, so only meaningful for a dedicated user
+        limits.append((resource.RLIMIT_NPROC, (max_processes, max_processes)))
+    return limits
+
+_PRLIMIT_OPTIONS = {}
+if RLIMITS_AVAILABLE:
+    _PRLIMIT_OPTIONS = {
+        resource.RLIMIT_CPU: '--cpu',
+        resource.RLIMIT_FSIZE: '--fsize',
+        resource.RLIMIT_CORE: '--core',
+        resource.RLIMIT_AS: '--as',
+        resource.RLIMIT_NPROC: '--nproc'
+    }
+
+def _prlimit_prefix(limits):
+    """prlimit command line that applies limits, then execs the program"""
+    return [PRLIMIT] + [f"{_PRLIMIT_OPTIONS[res]}={soft}:{hard}" for res, (soft, hard) in limits] + ['--']
+
+def _limit_running(pid, limits):
+    """Fallback without prlimit: set limits on the already started child"""
+    try:
+        for res, values in limits:
+            resource.prlimit(pid, res, values)
+    except ProcessLookupError:
+        pass  # already exited
+
+def run_sandboxed(cmd, cwd, stdin_data='', time_limit=5, memory_limit_mb=256, output_limit=1000):
+    """
+    Run cmd in cwd with resource limits
+    Returns dict with status ('ok', 'runtime_error', 'timeout', 'memory_limit',
+    'output_limit'), exit_code, output (truncated), time_ms
+    """
+    stdin_path = os.path.join(cwd, '.stdin')
+    stdout_path = os.path.join(cwd, '.stdout')
+    with open(stdin_path, 'w') as f:
+        f.write(stdin_data or '')
+
+    memory_bytes = memory_limit_mb * 1024 * 1024 if memory_limit_mb else None
+    user = _run_as_user()
+    if user is not None:
+        # The run directory is created by the server; hand it to the judge user
+        for name in ('', *os.listdir(cwd)):
+            os.chown(os.path.join(cwd, name), user.pw_uid, user.pw_gid)
+    max_processes = Config.JUDGE_MAX_PROCESSES if user is not None else None
+    limits = _rlimits(int(time_limit) + 1, memory_bytes, max_processes) if RLIMITS_AVAILABLE else []
+    # Inside the jail, so the jail itself isn't bound by the program's limits
+    prefix = _prlimit_prefix(limits) if limits and PRLIMIT else []
+    started = time.perf_counter()
+
+    with open(stdin_path, 'rb') as stdin, open(stdout_path, 'wb') as stdout:
+        process = subprocess.Popen(
+            [arg.replace('{cwd}', cwd) for arg in JAIL_COMMAND] + prefix + list(cmd),
+            cwd=cwd,
+            stdin=stdin,
+            stdout=stdout,
+            stderr=subprocess.STDOUT,
+            env={"PATH": "/usr/local/bin:/usr/bin:/bin", "HOME": cwd, "LANG": "C.UTF-8"},
+            user=user.pw_uid if user is not None else None,
+            group=user.pw_gid if user is not None else None,
+            extra_groups=[] if user is not None else None,
+            **PROCESS_GROUP
+        )
+        if limits and not prefix:
+            _limit_running(process.pid, limits)
+        try:
+            exit_code = process.wait(timeout=time_limit)
+            timed_out = False
+        except subprocess.TimeoutExpired:
+            try:
+                os.killpg(process.pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass  # the group exited between the timeout and the kill
+            exit_code = process.wait()
+            timed_out = True
+
+    elapsed_ms = (time.perf_counter() - started) * 1000
+
+    with open(stdout_path, 'r', errors='replace') as f:
+        output = f.read(output_limit)
+
+    if timed_out or exit_code == -signal.SIGXCPU or exit_code == -signal.SIGKILL:
+        status = 'timeout'
+    elif exit_code == -signal.SIGXFSZ or os.path.getsize(stdout_path) >= MAX_OUTPUT_FILE_BYTES:
+        # Some runtimes (CPython) ignore SIGXFSZ and fail the write instead
+        status = 'output_limit'
+    elif exit_code != 0 and 'MemoryError' in output:
+        status = 'memory_limit'
+    elif exit_code != 0:
+        status = 'runtime_error'
+    else:
+        status = 'ok'
+
+    return {
+        "status": status,
+        "exit_code": exit_code,
+        "output": output,
+        "time_ms": round(elapsed_ms, 1)
+    }
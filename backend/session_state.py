@@ -0,0 +1,68 @@
+"""
+Bounded per-attempt proctoring state.
+
+Proctoring keeps a little state per student_exam_id between frames (last
+face count, pending escalations, ...). SessionStateStore holds one dict per
+attempt, evicting the least recently used beyond PROCTORING_STATE_MAX_SESSIONS
+and any untouched for PROCTORING_STATE_TTL seconds, so finished or abandoned
+attempts don't accumulate. State is per process and best-effort: losing it
+only means the next frame gets a full analysis.
+"""
+import threading
+import time
+from collections import OrderedDict
+from config import Config
+
+class SessionStateStore:
+    """LRU + TTL bounded map of student_exam_id -> state dict"""
+
+    def __init__(self, max_sessions, ttl_seconds):
+        self.max_sessions = max_sessions
+        self.ttl_seconds = ttl_seconds
+        self._sessions = OrderedDict()  # student_exam_id -> (state, last_used)
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def get(self, student_exam_id):
+        """Returns the attempt's state dict, creating an empty one if needed"""
+        key = int(student_exam_id)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._sessions.pop(key, None)
+            state = entry[0] if entry is not None and now - entry[1] <= self.ttl_seconds else {}
+            self._sessions[key] = (state, now)
+            self._evict(now)
+            return state
+
+    def peek(self, student_exam_id):
+        """Returns the attempt's state dict without creating or touching it, or None"""
+        with self._lock:
+            entry = self._sessions.get(int(student_exam_id))
+            if entry is None or time.monotonic() - entry[1] > self.ttl_seconds:
+                return None
+            return entry[0]
+
+    def discard(self, student_exam_id):
+        """Forget an attempt, e.g. once it is submitted"""
+        with self._lock:
+            self._sessions.pop(int(student_exam_id), None)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "sessions": len(self._sessions),
+                "max_sessions": self.max_sessions,
+                "ttl_seconds": self.ttl_seconds,
+                "evictions": self.evictions
+            }
+
+    def _evict(self, now):
+        # Caller holds self._lock; oldest entries are at the front
+        while self._sessions:
+            key, (_, last_used) = next(iter(self._sessions.items()))
+            if len(self._sessions) <= self.max_sessions and now - last_used <= self.ttl_seconds:
+                break
+            del self._sessions[key]
+            self.evictions += 1
+
+proctoring_sessions = SessionStateStore(Config.PROCTORING_STATE_MAX_SESSIONS, Config.PROCTORING_STATE_TTL)
@@ -1,5 +1,5 @@
 from flask import Blueprint, request, jsonify, session
-from database import get_db_connection
+from database import get_db
 from middleware import require_student
 from utils import validate_cgpa, dict_from_row
 
@@ -9,12 +9,11 @@ students_bp = Blueprint('students', __name__)
 @require_student
 def get_profile():
     """Get logged-in student's profile"""
-    conn = get_db_connection()
+    conn = get_db()
     cursor = conn.cursor()
 
     cursor.execute("SELECT * FROM users WHERE id=?", (session['user_id'],))
     student = cursor.fetchone()
-    conn.close()
 
     if not student:
         return jsonify({"success": False, "error": "Student not found"}), 404
@@ -54,7 +53,7 @@ def update_profile():
         except (TypeError, ValueError):
             return jsonify({"success": False, "error": "Invalid backlogs value"}), 400
 
-    conn = get_db_connection()
+    conn = get_db()
     cursor = conn.cursor()
 
     # Build update query dynamically
@@ -68,7 +67,6 @@ def update_profile():
             update_values.append(data[field])
 
     if not update_fields:
-        conn.close()
         return jsonify({"success": False, "error": "No fields to update"}), 400
 
     update_values.append(session['user_id'])
@@ -81,7 +79,6 @@ def update_profile():
         # Get updated student
         cursor.execute("SELECT * FROM users WHERE id=?", (session['user_id'],))
         student = cursor.fetchone()
-        conn.close()
 
         return jsonify({
             "success": True,
@@ -101,14 +98,13 @@ def update_profile():
         }), 200
 
     except Exception as e:
-        conn.close()
         return jsonify({"success": False, "error": str(e)}), 500
 
 @students_bp.route('/courses', methods=['GET'])
 @require_student
 def get_courses():
     """Get all courses with student's enrollment status"""
-    conn = get_db_connection()
+    conn = get_db()
     cursor = conn.cursor()
 
     # Get all courses
@@ -141,8 +137,6 @@ def get_courses():
 
         result.append(course_dict)
 
-    conn.close()
-
     return jsonify({
         "success": True,
         "courses": result
@@ -152,13 +146,12 @@ def get_courses():
 @require_student
 def enroll_course(course_id):
     """Enroll student in a course"""
-    conn = get_db_connection()
+    conn = get_db()
     cursor = conn.cursor()
 
     # Check if course exists
     cursor.execute("SELECT id FROM courses WHERE id=?", (course_id,))
     if not cursor.fetchone():
-        conn.close()
         return jsonify({"success": False, "error": "Course not found"}), 404
 
     # Check if already enrolled
@@ -168,7 +161,6 @@ def enroll_course(course_id):
     ''', (session['user_id'], course_id))
 
     if cursor.fetchone():
-        conn.close()
         return jsonify({"success": False, "error": "Already enrolled in this course"}), 400
 
     # Enroll student
@@ -186,8 +178,6 @@ def enroll_course(course_id):
         ''', (session['user_id'], course_id))
         enrollment = cursor.fetchone()
 
-        conn.close()
-
         return jsonify({
             "success": True,
             "message": "Enrolled successfully",
@@ -200,7 +190,6 @@ def enroll_course(course_id):
         }), 201
 
     except Exception as e:
-        conn.close()
         return jsonify({"success": False, "error": str(e)}), 500
 
 @students_bp.route('/courses/<int:course_id>/progress', methods=['PUT'])
@@ -219,7 +208,7 @@ def update_progress(course_id):
     except (TypeError, ValueError):
         return jsonify({"success": False, "error": "Invalid progress value"}), 400
 
-    conn = get_db_connection()
+    conn = get_db()
     cursor = conn.cursor()
 
     # Check if enrolled
@@ -229,7 +218,6 @@ def update_progress(course_id):
     ''', (session['user_id'], course_id))
 
     if not cursor.fetchone():
-        conn.close()
         return jsonify({"success": False, "error": "Not enrolled in this course"}), 400
 
     # Update progress
@@ -249,7 +237,6 @@ def update_progress(course_id):
             ''', (progress, session['user_id'], course_id))
 
         conn.commit()
-        conn.close()
 
         return jsonify({
             "success": True,
@@ -257,5 +244,4 @@ def update_progress(course_id):
         }), 200
 
     except Exception as e:
-        conn.close()
         return jsonify({"success": False, "error": str(e)}), 500
@@ -57,6 +57,17 @@ def check_job_deadline(last_date_str):
     except:
         return False
 
+def parse_pagination(args, default_per_page=50, max_per_page=100):
+    """
+    Parse page/per_page query parameters
+    Returns (page, per_page); raises ValueError on invalid values
+    """
+    page = int(args.get('page', 1))
+    per_page = int(args.get('per_page', default_per_page))
+    if page < 1 or per_page < 1:
+        raise ValueError("page and per_page must be positive")
+    return page, min(per_page, max_per_page)
+
 def dict_from_row(row):
     """Convert sqlite3.Row to dictionary"""
     if row is None:
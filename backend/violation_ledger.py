@@ -0,0 +1,489 @@
+"""
+Per-attempt violation counters with write-behind logging.
+
+Violations are recorded here instead of writing proctoring_logs and
+student_exams.violation_count on every event. The first violation of an
+attempt loads it once (owner, status, stored count); later ones only take a
+lock, increment the in-memory counter and queue the event. Counts and the
+auto-submit decision are therefore exact across this process's concurrent
+requests, and exactly one request sees AUTO_SUBMIT_THRESHOLD crossed.
+
+Queued events are flushed every VIOLATION_FLUSH_INTERVAL seconds or once
+VIOLATION_FLUSH_THRESHOLD are pending. One transaction inserts the logs and
+adds each attempt's delta to violation_count, which is an atomic increment,
+so several processes can share an attempt. Each counter is then re-based on
+the stored count, picking up other processes' violations. An auto-submit
+flushes at once, together with the status change. A flush also submits an
+attempt whose stored count has reached AUTO_SUBMIT_THRESHOLD, when it was
+recorded with auto_submit, so violations split across processes that each
+stayed under the threshold still submit it.
+
+Every recorded violation, and every auto-submit, is also published to the
+live invigilator streams (proctoring_events) as it is recorded.
+
+Durability: each event is appended to this process's journal in
+VIOLATION_JOURNAL_DIR before it is acknowledged. A journal segment is
+deleted only after its events are committed. A starting ledger replays the
+journals of processes that died, whose lock files are no longer held. Every
+event carries a unique event_key, so a replay never inserts a log twice.
+"""
+import atexit
+import json
+import os
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from config import Config
+from database import get_pool, immediate_transaction
+from proctoring_events import proctoring_events
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+INSERT_LOG_SQL = '''
+    INSERT OR IGNORE INTO proctoring_logs
+        (student_exam_id, violation_type, severity, details, image_path, timestamp, event_key)
+    VALUES (?, ?, ?, ?, ?, ?, ?)
+'''
+
+ADD_COUNT_SQL = '''
+    UPDATE student_exams SET violation_count = violation_count + ?
+    WHERE id=?
+    RETURNING violation_count, status
+'''
+
+AUTO_SUBMIT_SQL = '''
+    UPDATE student_exams
+    SET status='submitted', flagged_for_review=1, end_time=CURRENT_TIMESTAMP
+    WHERE id=? AND status='in_progress'
+'''
+
+def _write_events(conn, batch):
+    """Insert {student_exam_id: [event]} and add what was inserted to each count; returns {id: row}"""
+    stored = {}
+    for student_exam_id, events in batch.items():
+        cursor = conn.executemany(INSERT_LOG_SQL, [
+            (student_exam_id, e['violation_type'], e['severity'], e['details'],
+             e['image_path'], e['timestamp'], e['event_key'])
+            for e in events
+        ])
+        # Replayed or re-sent events are ignored and not counted twice
+        stored[student_exam_id] = conn.execute(ADD_COUNT_SQL, (cursor.rowcount, student_exam_id)).fetchone()
+    return stored
+
+class ViolationLedger:
+    """Atomic in-memory violation counters flushed to the database in batches"""
+
+    def __init__(self, flush_interval, flush_threshold, journal_dir, threshold, idle_ttl):
+        self.flush_interval = flush_interval
+        self.flush_threshold = flush_threshold
+        self.journal_dir = journal_dir
+        self.threshold = threshold
+        self.idle_ttl = idle_ttl
+        self._attempts = {}  # student_exam_id -> attempt state dict
+        self._pending = 0
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._pid = None
+        self._journal = None
+        self._lock_file = None
+        self._token = None
+        self._segment = 0
+        self._sealed = []
+        self.recorded = 0
+        self.flushes = 0
+        self.flushed = 0
+        self.auto_submits = 0
+        self.recovered = 0
+
+    def load(self, conn, student_exam_id):
+        """Returns the attempt's state {student_id, status, count, ...}, or None if it doesn't exist"""
+        student_exam_id = int(student_exam_id)
+        with self._lock:
+            attempt = self._attempts.get(student_exam_id)
+            if attempt is not None:
+                attempt['last_used'] = time.monotonic()
+                return attempt
+
+        row = conn.execute(
+            "SELECT student_id, exam_id, status, violation_count FROM student_exams WHERE id=?",
+            (student_exam_id,)
+        ).fetchone()
+        if row is None:
+            return None
+
+        with self._lock:
+            # A concurrent request may have loaded it first; keep that one
+            return self._attempts.setdefault(student_exam_id, {
+                "student_id": row['student_id'],
+                "exam_id": row['exam_id'],
+                "status": row['status'],
+                "base": row['violation_count'] or 0,  # stored count as of the last flush
+                "in_flight": 0,  # events being flushed
+                "pending": [],
+                "auto_submitted": False,
+                "auto_submit": False,  # recorded with auto_submit; flushes submit it at the threshold
+                "client_seq": {},  # client_id -> highest sequence number recorded
+                "last_used": time.monotonic()
+            })
+
+    def record(self, conn, student_exam_id, violation_type, severity, details,
+               image_path=None, timestamp=None, auto_submit=False):
+        """Count one violation and queue its log row; see record_many"""
+        return self.record_many(conn, student_exam_id, [{
+            "violation_type": violation_type,
+            "severity": severity,
+            "details": details,
+            "image_path": image_path,
+            "timestamp": timestamp
+        }], auto_submit=auto_submit)
+
+    def record_many(self, conn, student_exam_id, events, client_id=None, auto_submit=False):
+        """
+        Count violations and queue their log rows
+        events are dicts {violation_type, severity, details[, image_path,
+        timestamp, seq]}. With client_id, each event carries the client's
+        sequence number and events at or below the highest one already
+        recorded for that client are dropped as re-sends. With auto_submit,
+        the request whose violations reach the threshold submits the attempt
+        (flushed at once). Returns {violation_count, auto_submitted, accepted,
+        duplicates}, or None if the attempt doesn't exist.
+        """
+        attempt = self.load(conn, student_exam_id)
+        if attempt is None:
+            return None
+        student_exam_id = int(student_exam_id)
+        # Same format as CURRENT_TIMESTAMP (UTC); the rows are written later
+        now = datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+
+        self._ensure_started(conn)
+
+        with self._lock:
+            accepted = []
+            if client_id is None:
+                for event in events:
+                    accepted.append(dict(event, event_key=uuid.uuid4().hex))
+            else:
+                last_seq = attempt['client_seq'].get(client_id, 0)
+                for event in sorted(events, key=lambda e: e['seq']):
+                    if event['seq'] <= last_seq:
+                        continue
+                    last_seq = event['seq']
+                    # Also unique in the database, for re-sends that reach another process
+                    accepted.append(dict(event, event_key=f"client:{client_id}:{last_seq}"))
+                attempt['client_seq'][client_id] = last_seq
+
+            accepted = [{
+                "violation_type": event['violation_type'],
+                "severity": event['severity'],
+                "details": event['details'],
+                "image_path": event.get('image_path'),
+                "timestamp": event.get('timestamp') or now,
+                "event_key": event['event_key']
+            } for event in accepted]
+
+            self._append_journal(student_exam_id, accepted)
+            attempt['pending'].extend(accepted)
+            self._pending += len(accepted)
+            self.recorded += len(accepted)
+            count = attempt['base'] + attempt['in_flight'] + len(attempt['pending'])
+            first_count = count - len(accepted) + 1
+
+            if auto_submit and accepted:
+                attempt['auto_submit'] = True
+            submit = (auto_submit and accepted and not attempt['auto_submitted']
+                      and attempt['status'] == 'in_progress' and count >= self.threshold)
+            if submit:
+                attempt['auto_submitted'] = True
+            if self._pending >= self.flush_threshold:
+                self._wakeup.set()
+
+        for i, event in enumerate(accepted):
+            proctoring_events.publish({
+                "type": "violation",
+                "student_exam_id": student_exam_id,
+                "exam_id": attempt['exam_id'],
+                "student_id": attempt['student_id'],
+                "violation_type": event['violation_type'],
+                "severity": event['severity'],
+                "timestamp": event['timestamp'],
+                "image_path": event['image_path'],
+                "violation_count": first_count + i
+            })
+
+        if submit:
+            try:
+                self.flush(conn, submit=[student_exam_id])
+            except Exception:
+                with self._lock:
+                    attempt['auto_submitted'] = False
+                raise
+            if attempt['auto_submitted']:
+                proctoring_events.publish({
+                    "type": "auto_submit",
+                    "student_exam_id": student_exam_id,
+                    "exam_id": attempt['exam_id'],
+                    "student_id": attempt['student_id'],
+                    "violation_count": count
+                })
+
+        # Stays true for later violations, in case the client missed the first answer;
+        # false if the attempt had been submitted normally
+        return {
+            "violation_count": count,
+            "auto_submitted": attempt['auto_submitted'],
+            "accepted": len(accepted),
+            "duplicates": len(events) - len(accepted)
+        }
+
+    def auto_submitted(self, student_exam_id):
+        """Whether the ledger has auto-submitted the attempt, here or in a flush"""
+        with self._lock:
+            attempt = self._attempts.get(int(student_exam_id))
+            return attempt is not None and attempt['auto_submitted']
+
+    def count(self, student_exam_id):
+        """This process's view of an attempt's violation count, or None if not loaded"""
+        with self._lock:
+            attempt = self._attempts.get(int(student_exam_id))
+            if attempt is None:
+                return None
+            return attempt['base'] + attempt['in_flight'] + len(attempt['pending'])
+
+    def flush(self, conn=None, submit=()):
+        """Write every queued event in one transaction, auto-submitting the given attempts"""
+        if conn is None:
+            pool = get_pool()
+            conn = pool.acquire()
+            try:
+                return self.flush(conn, submit)
+            finally:
+                pool.release(conn)
+
+        with self._flush_lock:
+            with self._lock:
+                batch = {}
+                for student_exam_id, attempt in self._attempts.items():
+                    if attempt['pending']:
+                        batch[student_exam_id] = attempt['pending']
+                        attempt['in_flight'] += len(attempt['pending'])
+                        attempt['pending'] = []
+                eligible = {
+                    student_exam_id for student_exam_id in batch
+                    if self._attempts[student_exam_id]['auto_submit']
+                    and not self._attempts[student_exam_id]['auto_submitted']
+                }
+                self._pending = 0
+                # Every journalled event not yet written is in this batch
+                sealed = self._seal_segment() if batch else []
+
+            if not batch and not submit:
+                return 0
+
+            try:
+                with immediate_transaction(conn):
+                    stored = _write_events(conn, batch)
+                    # The stored count includes other processes' violations
+                    reached = [
+                        student_exam_id for student_exam_id in eligible
+                        if student_exam_id not in submit and stored[student_exam_id] is not None
+                        and stored[student_exam_id]['violation_count'] >= self.threshold
+                    ]
+                    submitted = [
+                        student_exam_id for student_exam_id in list(submit) + reached
+                        if conn.execute(AUTO_SUBMIT_SQL, (student_exam_id,)).rowcount
+                    ]
+            except Exception:
+                # Put the events back in front of anything queued since; the journal still has them
+                with self._lock:
+                    for student_exam_id, events in batch.items():
+                        attempt = self._attempts[student_exam_id]
+                        attempt['in_flight'] -= len(events)
+                        attempt['pending'][:0] = events
+                        self._pending += len(events)
+                    self._sealed[:0] = sealed
+                raise
+
+            flushed = sum(len(events) for events in batch.values())
+            with self._lock:
+                for student_exam_id, events in batch.items():
+                    attempt = self._attempts[student_exam_id]
+                    attempt['in_flight'] -= len(events)
+                    row = stored[student_exam_id]
+                    if row is not None:
+                        # A recovery may have re-based it on a later count already
+                        attempt['base'] = max(attempt['base'], row['violation_count'])
+                        attempt['status'] = row['status']
+                for student_exam_id in list(submit) + reached:
+                    attempt = self._attempts[student_exam_id]
+                    attempt['auto_submitted'] = student_exam_id in submitted
+                    if attempt['auto_submitted']:
+                        attempt['status'] = 'submitted'
+                        self.auto_submits += 1
+                self.flushes += 1
+                self.flushed += flushed
+                self._prune()
+
+            for student_exam_id in reached:
+                if student_exam_id in submitted:
+                    attempt = self._attempts.get(student_exam_id) or {}
+                    proctoring_events.publish({
+                        "type": "auto_submit",
+                        "student_exam_id": student_exam_id,
+                        "exam_id": attempt.get('exam_id'),
+                        "student_id": attempt.get('student_id'),
+                        "violation_count": stored[student_exam_id]['violation_count']
+                    })
+
+            for path in sealed:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+            return flushed
+
+    def stats(self):
+        """Returns queue and flush counters"""
+        with self._lock:
+            return {
+                "attempts": len(self._attempts),
+                "pending": self._pending,
+                "recorded": self.recorded,
+                "flushes": self.flushes,
+                "flushed": self.flushed,
+                "auto_submits": self.auto_submits,
+                "recovered": self.recovered,
+                "flush_interval": self.flush_interval,
+                "flush_threshold": self.flush_threshold,
+                "journal": bool(self.journal_dir)
+            }
+
+    def _ensure_started(self, conn):
+        # Started on first violation (and again after a fork) so processes
+        # that never record one stay thread-free
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='violation-flush', daemon=True)
+            self._thread.start()
+
+            if not self.journal_dir:
+                return
+            os.makedirs(self.journal_dir, exist_ok=True)
+            self._token = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+            self._segment = 0
+            self._sealed = []
+            # Held for the life of the process; a free lock marks an orphaned journal
+            self._lock_file = open(os.path.join(self.journal_dir, f"{self._token}.lock"), 'w')
+            if fcntl is not None:
+                fcntl.flock(self._lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            self._open_segment()
+
+        # Outside the lock: its write transaction can wait on other processes
+        try:
+            self._recover(conn)
+        except Exception as e:
+            print(f"Warning: violation journal recovery failed: {e}")
+
+    def _open_segment(self):
+        # Caller holds self._lock
+        path = os.path.join(self.journal_dir, f"{self._token}.{self._segment}.jsonl")
+        self._journal = open(path, 'a')
+
+    def _seal_segment(self):
+        """Start a new journal segment; returns the segments whose events are now being flushed"""
+        # Caller holds self._lock
+        if self._journal is None:
+            return []
+        self._journal.close()
+        self._sealed.append(self._journal.name)
+        self._segment += 1
+        self._open_segment()
+        sealed, self._sealed = self._sealed, []
+        return sealed
+
+    def _append_journal(self, student_exam_id, events):
+        # Caller holds self._lock
+        if self._journal is None or not events:
+            return
+        for event in events:
+            self._journal.write(json.dumps(dict(event, student_exam_id=student_exam_id)) + '\n')
+        # Reaches the OS before the request is acknowledged, so a crash doesn't lose it
+        self._journal.flush()
+
+    def _recover(self, conn):
+        """Replay journals left behind by processes that are no longer running"""
+        for name in os.listdir(self.journal_dir):
+            if not name.endswith('.lock') or name == f"{self._token}.lock" or fcntl is None:
+                continue
+            token = name[:-len('.lock')]
+            with open(os.path.join(self.journal_dir, name), 'a') as lock_file:
+                try:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except OSError:
+                    continue  # its process is alive
+
+                segments = [
+                    os.path.join(self.journal_dir, segment) for segment in os.listdir(self.journal_dir)
+                    if segment.startswith(token + '.') and segment.endswith('.jsonl')
+                ]
+                batch = {}
+                for segment in segments:
+                    with open(segment) as f:
+                        for line in f:
+                            try:
+                                event = json.loads(line)
+                            except ValueError:
+                                continue  # torn last line from the crash
+                            batch.setdefault(event.pop('student_exam_id'), []).append(event)
+
+                with immediate_transaction(conn):
+                    stored = _write_events(conn, batch)
+
+                with self._lock:
+                    self.recovered += sum(len(events) for events in batch.values())
+                    # Attempts already loaded here were read before these counts were added
+                    for student_exam_id, row in stored.items():
+                        attempt = self._attempts.get(student_exam_id)
+                        if attempt is not None and row is not None:
+                            attempt['base'] = max(attempt['base'], row['violation_count'])
+                for path in segments + [os.path.join(self.journal_dir, name)]:
+                    os.remove(path)
+
+    def _prune(self):
+        # Caller holds self._lock; forget idle attempts with nothing left to write
+        cutoff = time.monotonic() - self.idle_ttl
+        idle = [
+            student_exam_id for student_exam_id, attempt in self._attempts.items()
+            if attempt['last_used'] < cutoff and not attempt['pending'] and not attempt['in_flight']
+        ]
+        for student_exam_id in idle:
+            del self._attempts[student_exam_id]
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"Warning: violation flush failed: {e}")
+
+violation_ledger = ViolationLedger(
+    flush_interval=Config.VIOLATION_FLUSH_INTERVAL,
+    flush_threshold=Config.VIOLATION_FLUSH_THRESHOLD,
+    # Relative directories live next to the backend, like proctoring_images, whatever the
+    # working directory; absolute now so a later chdir can't move the journal
+    journal_dir=os.path.abspath(os.path.join(os.path.dirname(__file__), Config.VIOLATION_JOURNAL_DIR)) if Config.VIOLATION_JOURNAL_DIR else '',
+    threshold=Config.AUTO_SUBMIT_THRESHOLD,
+    idle_ttl=Config.PROCTORING_STATE_TTL
+)
+
+# Don't leave violations only in the journal on a clean shutdown
+atexit.register(lambda: violation_ledger.flush() if violation_ledger.stats()['pending'] else None)
@@ -39,9 +39,11 @@ async function apiCall(endpoint, options = {}) {
         // Parse JSON response
         const data = await response.json();
 
-        // Handle non-OK responses
+        // Handle non-OK responses; callers can tell client errors from server ones by status
         if (!response.ok) {
-            throw new Error(data.error || data.message || 'Request failed');
+            const error = new Error(data.error || data.message || 'Request failed');
+            error.status = response.status;
+            throw error;
         }
 
         return data;
@@ -84,6 +86,21 @@ async function uploadFile(endpoint, formData) {
     }
 }
 
+/**
+ * Fetch every page of a paginated list endpoint; returns the items under key
+ */
+async function apiCallAllPages(endpoint, key, perPage = 100) {
+    const separator = endpoint.includes('?') ? '&' : '?';
+    const items = [];
+    for (let page = 1; ; page++) {
+        const data = await apiCall(`${endpoint}${separator}page=${page}&per_page=${perPage}`);
+        items.push(...data[key]);
+        if (data[key].length < perPage || items.length >= data.pagination.total) {
+            return items;
+        }
+    }
+}
+
 /**
  * Check if user is authenticated
  */
@@ -9,6 +9,11 @@ let codeEditors = {};
 let timerInterval = null;
 let endTime = null;
 let proctorInstance = null;
+let dirtyAnswers = new Set();
+let autosaveInterval = null;
+
+// Changed answers are sent to the server in small batches during the exam
+const AUTOSAVE_INTERVAL_MS = 15000;
 
 // Parse URL parameters
 const urlParams = new URLSearchParams(window.location.search);
@@ -36,31 +41,27 @@ document.addEventListener('DOMContentLoaded', async () => {
 
 async function loadExam() {
     try {
-        // In a real scenario, exam data is already loaded when starting
-        // For now, we'll create a mock structure
-        examData = {
-            title: "Sample Exam",
-            duration_minutes: 60,
-            proctoring_enabled: 1,
-            questions: [] // Would be populated from API
-        };
+        // The paper, times and any answers saved before a reload
+        const data = await apiCall(`/exams/attempts/${studentExamId}`);
+        examData = data.exam;
 
         document.getElementById('exam-title').textContent = examData.title;
 
         // Start timer
-        endTime = new Date(Date.now() + examData.duration_minutes * 60000);
+        endTime = new Date(data.end_time);
         startTimer();
 
         // Initialize proctoring if enabled
         if (examData.proctoring_enabled) {
             proctorInstance = new ExamProctor(studentExamId);
+            proctorInstance.onAutoSubmit = submitAutoSubmittedExam;
             document.getElementById('proctoring-status').style.display = 'block';
             document.getElementById('violation-display').style.display = 'flex';
         }
 
-        // Load questions (mock for now)
         questions = examData.questions;
-        initializeQuestions();
+        initializeQuestions(data.answers);
+        startAutosave();
 
     } catch (error) {
         alert('Failed to load exam: ' + error.message);
@@ -68,7 +69,7 @@ async function loadExam() {
     }
 }
 
-function initializeQuestions() {
+function initializeQuestions(savedAnswers = []) {
     if (questions.length === 0) {
         document.getElementById('question-area').innerHTML = `
             <div class="question-card">
@@ -87,6 +88,13 @@ function initializeQuestions() {
         };
     });
 
+    // Restore what was autosaved before the page was reloaded
+    savedAnswers.forEach(saved => {
+        if (answers[saved.question_id]) {
+            answers[saved.question_id].answer_value = saved.answer_value;
+        }
+    });
+
     // Create question navigator buttons
     const navigator = document.getElementById('question-navigator');
     navigator.innerHTML = questions.map((q, idx) => `
@@ -179,6 +187,7 @@ function displayQuestion(index) {
 
         editor.on('change', (cm) => {
             answers[question.id].answer_value = cm.getValue();
+            dirtyAnswers.add(question.id);
         });
 
         codeEditors[question.id] = editor;
@@ -187,6 +196,7 @@ function displayQuestion(index) {
 
 function selectOption(questionId, option) {
     answers[questionId].answer_value = option;
+    dirtyAnswers.add(questionId);
 
     // Update UI
     document.querySelectorAll(`input[name="q${questionId}"]`).forEach(input => {
@@ -213,6 +223,31 @@ function navigateToQuestion(index) {
     displayQuestion(index);
 }
 
+function startAutosave() {
+    autosaveInterval = setInterval(autosaveAnswers, AUTOSAVE_INTERVAL_MS);
+}
+
+async function autosaveAnswers() {
+    if (dirtyAnswers.size === 0) return;
+
+    // Send only the answers changed since the last autosave
+    const questionIds = Array.from(dirtyAnswers);
+    dirtyAnswers.clear();
+
+    try {
+        await apiCall(`/exams/attempts/${studentExamId}/answers`, {
+            method: 'PUT',
+            body: JSON.stringify({
+                answers: questionIds.map(id => answers[id])
+            })
+        });
+    } catch (error) {
+        // Retry with the next batch
+        questionIds.forEach(id => dirtyAnswers.add(id));
+        console.error('Autosave failed:', error);
+    }
+}
+
 function startTimer() {
     updateTimerDisplay();
 
@@ -255,9 +290,8 @@ function closeSubmitModal() {
     document.getElementById('submit-modal').classList.remove('active');
 }
 
-async function confirmSubmit() {
-    closeSubmitModal();
-
+// Answers to send with a submit (the server merges these with already autosaved answers)
+function collectSubmission() {
     // Save all code editors
     questions.forEach(q => {
         if (q.question_type === 'coding' && codeEditors[q.id]) {
@@ -265,15 +299,32 @@ async function confirmSubmit() {
         }
     });
 
-    // Prepare submission
-    const submission = {
+    return {
         student_exam_id: studentExamId,
         answers: Object.values(answers)
     };
+}
+
+// The server sealed the attempt for violations; submitting still grades its answers
+async function submitAutoSubmittedExam() {
+    if (timerInterval) clearInterval(timerInterval);
+    if (autosaveInterval) clearInterval(autosaveInterval);
+    examData = null;  // leaving the page is expected now
+
+    await apiCall(`/exams/${examId}/submit`, {
+        method: 'POST',
+        body: JSON.stringify(collectSubmission())
+    });
+}
+
+async function confirmSubmit() {
+    closeSubmitModal();
+    const submission = collectSubmission();
 
     try {
-        // Stop timer and proctoring
+        // Stop timer, autosave and proctoring
         if (timerInterval) clearInterval(timerInterval);
+        if (autosaveInterval) clearInterval(autosaveInterval);
         if (proctorInstance) proctorInstance.stopProctoring();
 
         const result = await apiCall(`/exams/${examId}/submit`, {
@@ -286,8 +337,9 @@ async function confirmSubmit() {
 
     } catch (error) {
         alert('Submission failed: ' + error.message);
-        // Restart timer
+        // Restart timer and autosave
         startTimer();
+        startAutosave();
     }
 }
 
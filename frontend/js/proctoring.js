@@ -1,13 +1,48 @@
 // Client-side proctoring functionality
 
+// Queued frame analyses are polled this often, for at most this many tries
+const FRAME_RESULT_POLL_MS = 1000;
+const FRAME_RESULT_MAX_POLLS = 8;
+
+// Frames are captured this often until the server suggests an interval
+const DEFAULT_CAPTURE_INTERVAL_MS = 10000;
+
+// A closed frame WebSocket is reopened after this long; frames go over HTTP meanwhile
+const FRAME_SOCKET_RETRY_MS = 5000;
+
+// Violations are collected for this long and sent as one batch
+const VIOLATION_BATCH_DELAY_MS = 1500;
+const VIOLATION_BATCH_MAX = 50;
+const VIOLATION_RETRY_MS = 5000;
+
 class ExamProctor {
     constructor(studentExamId) {
         this.studentExamId = studentExamId;
         this.violationCount = 0;
         this.stream = null;
-        this.frameInterval = null;
+        this.frameTimer = null;
+        this.captureIntervalMs = DEFAULT_CAPTURE_INTERVAL_MS;
+        this.lastCaptureAt = Date.now();
         this.isFullscreen = false;
 
+        // Capture settings and frame token from the server; null means multipart uploads
+        this.captureSettings = null;
+        this.frameToken = null;
+        this.frameSocket = null;
+        this.video = null;
+        this.canvas = null;
+
+        // Unsent violations; seq numbers let the server drop re-sent ones
+        this.clientId = Math.random().toString(36).slice(2) + Date.now().toString(36);
+        this.violationSeq = 0;
+        this.pendingViolations = [];
+        this.violationTimer = null;
+        this.violationsInFlight = false;
+
+        // Set by the exam page to send its answers when the server seals the attempt
+        this.onAutoSubmit = null;
+        this.autoSubmitted = false;
+
         this.initialize();
     }
 
@@ -155,10 +190,18 @@ class ExamProctor {
         try {
             this.stream = await navigator.mediaDevices.getUserMedia({ video: true });
 
-            // Start frame capture every 10 seconds
-            this.frameInterval = setInterval(() => {
-                this.captureAndAnalyzeFrame();
-            }, 10000);
+            // One video element and canvas for the whole session
+            this.video = document.createElement('video');
+            this.video.muted = true;
+            this.video.playsInline = true;
+            this.video.srcObject = this.stream;
+            await this.video.play();
+            this.canvas = document.createElement('canvas');
+
+            await this.loadCaptureSettings();
+
+            // Start frame capture; the server adjusts the interval as it goes
+            this.scheduleNextCapture(this.captureIntervalMs);
 
             this.updateFaceStatus(true);
 
@@ -170,51 +213,228 @@ class ExamProctor {
         }
     }
 
+    scheduleNextCapture(delayMs) {
+        clearTimeout(this.frameTimer);
+        this.frameTimer = setTimeout(() => {
+            this.captureAndAnalyzeFrame();
+        }, Math.max(0, delayMs));
+    }
+
+    // The server's capture_interval (seconds) counts from the last capture
+    applyCaptureInterval(seconds) {
+        if (!seconds || !this.stream) return;
+
+        this.captureIntervalMs = seconds * 1000;
+        this.scheduleNextCapture(this.lastCaptureAt + this.captureIntervalMs - Date.now());
+    }
+
+    // Capture size/quality and a frame token for cookie-less uploads
+    async loadCaptureSettings() {
+        try {
+            const result = await apiCall(`/proctoring/capture-settings?student_exam_id=${this.studentExamId}`);
+            this.captureSettings = result.settings;
+            this.frameToken = result.frame_token;
+            this.applyCaptureInterval(result.capture_interval);
+
+            if (result.websocket && window.WebSocket) {
+                this.openFrameSocket();
+            }
+        } catch (error) {
+            // Older servers: full-size multipart uploads
+            console.warn('Capture settings unavailable:', error);
+            this.captureSettings = null;
+        }
+    }
+
+    openFrameSocket() {
+        if (!this.stream || !this.frameToken || this.frameSocket) return;
+
+        const socket = new WebSocket(`${API_BASE_URL.replace(/^http/, 'ws')}/proctoring/ws`);
+        socket.binaryType = 'arraybuffer';
+        // Frames go over HTTP until it is open
+        this.frameSocket = socket;
+
+        // The token is the first message rather than in the URL, which servers and proxies log
+        const token = this.frameToken;
+        socket.onopen = () => socket.send(token);
+
+        socket.onmessage = (event) => {
+            const result = JSON.parse(event.data);
+            if (result.status_code === 401) {
+                // Token expired: get a new one, then reconnect
+                socket.close();
+                this.loadCaptureSettings();
+                return;
+            }
+            if (result.status_code === 409) {
+                this.handleAttemptClosed(result);
+                return;
+            }
+            this.handleFrameResult(result, true);
+        };
+        socket.onclose = () => {
+            if (this.frameSocket === socket) this.frameSocket = null;
+            if (this.stream) {
+                setTimeout(() => {
+                    if (!this.frameSocket) this.openFrameSocket();
+                }, FRAME_SOCKET_RETRY_MS);
+            }
+        };
+    }
+
     async captureAndAnalyzeFrame() {
         if (!this.stream) return;
 
+        // Keep capturing at the current interval even if this upload gets no answer
+        this.lastCaptureAt = Date.now();
+        this.scheduleNextCapture(this.captureIntervalMs);
+
         try {
-            // Create video element
-            const video = document.createElement('video');
-            video.srcObject = this.stream;
-            video.play();
-
-            // Wait for video to be ready
-            await new Promise(resolve => {
-                video.onloadedmetadata = resolve;
-            });
+            const blob = await this.captureFrame();
+            if (!blob) return;
 
-            // Capture frame
-            const canvas = document.createElement('canvas');
-            canvas.width = video.videoWidth;
-            canvas.height = video.videoHeight;
-            const ctx = canvas.getContext('2d');
-            ctx.drawImage(video, 0, 0);
+            if (this.frameSocket && this.frameSocket.readyState === WebSocket.OPEN) {
+                // Answered (and queued verdicts pushed) on the socket
+                this.frameSocket.send(blob);
+                return;
+            }
 
-            // Convert to blob
-            canvas.toBlob(async (blob) => {
+            let result;
+            if (this.captureSettings) {
+                result = await this.uploadRawFrame(blob);
+            } else {
                 const formData = new FormData();
                 formData.append('student_exam_id', this.studentExamId);
                 formData.append('frame', blob, 'frame.jpg');
+                result = await uploadFile('/proctoring/frame', formData);
+            }
+            this.handleFrameResult(result, false);
+
+        } catch (error) {
+            // Includes "queue full": this frame is dropped, the next one is tried as usual
+            console.error('Frame analysis failed:', error);
+        }
+    }
 
-                try {
-                    const result = await uploadFile('/proctoring/frame', formData);
+    // Draw the current video frame at the server's capture size and encode it
+    captureFrame() {
+        const video = this.video;
+        if (!video || !video.videoWidth) return Promise.resolve(null);
 
-                    if (result.analysis) {
-                        this.updateFaceStatus(result.analysis.face_detected);
+        const settings = this.captureSettings;
+        const width = settings ? Math.min(settings.width, video.videoWidth) : video.videoWidth;
+        const height = Math.round(video.videoHeight * width / video.videoWidth);
+        this.canvas.width = width;
+        this.canvas.height = height;
 
-                        if (result.analysis.violation_logged) {
-                            this.violationCount = result.analysis.violation_count;
-                            this.updateViolationDisplay();
-                        }
-                    }
-                } catch (error) {
-                    console.error('Frame analysis failed:', error);
-                }
-            }, 'image/jpeg', 0.8);
+        const ctx = this.canvas.getContext('2d');
+        ctx.filter = settings && settings.grayscale ? 'grayscale(1)' : 'none';
+        ctx.drawImage(video, 0, 0, width, height);
 
+        return new Promise(resolve => {
+            this.canvas.toBlob(resolve, 'image/jpeg', settings ? settings.quality : 0.8);
+        });
+    }
+
+    // JPEG as the request body; the frame token stands in for the session cookie
+    async uploadRawFrame(blob) {
+        const response = await fetch(`${API_BASE_URL}/proctoring/frame/raw`, {
+            method: 'POST',
+            credentials: 'omit',
+            headers: {
+                'Content-Type': 'image/jpeg',
+                'X-Student-Exam-Id': String(this.studentExamId),
+                'X-Frame-Token': this.frameToken
+            },
+            body: blob
+        });
+        const result = await response.json();
+
+        if (response.status === 401) {
+            // Token expired: fetch a new one for the next frame
+            this.loadCaptureSettings();
+        }
+        if (response.status === 409) {
+            this.handleAttemptClosed(result);
+        }
+        if (!response.ok) {
+            throw new Error(result.error || 'Upload failed');
+        }
+        return result;
+    }
+
+    // The attempt is no longer in progress, so the server refuses frames
+    handleAttemptClosed(result) {
+        if (result.auto_submitted) {
+            this.handleAutoSubmit();
+        } else {
+            this.stopProctoring();
+        }
+    }
+
+    // The server sealed the attempt (possibly from a background flush): hand in the answers once
+    async handleAutoSubmit() {
+        if (this.autoSubmitted) return;
+        this.autoSubmitted = true;
+        this.stopProctoring();
+
+        alert('Exam auto-submitted due to excessive violations.');
+        if (this.onAutoSubmit) {
+            try {
+                await this.onAutoSubmit();
+            } catch (error) {
+                console.error('Failed to submit answers after auto-submit:', error);
+            }
+        }
+        window.location.href = 'results.html';
+    }
+
+    handleFrameResult(result, viaSocket) {
+        if (result.auto_submitted) {
+            this.handleAutoSubmit();
+            return;
+        }
+        if (!result.success) {
+            console.error('Frame analysis failed:', result.error);
+            return;
+        }
+        this.applyCaptureInterval(result.capture_interval);
+
+        if (result.analysis) {
+            this.applyFrameAnalysis(result.analysis);
+        } else if (result.job_id && !viaSocket) {
+            // Analysis was queued; fetch the verdict when it is ready
+            this.pollFrameResult(result.job_id);
+        }
+    }
+
+    applyFrameAnalysis(analysis) {
+        this.updateFaceStatus(analysis.face_detected);
+
+        if (analysis.violation_logged) {
+            this.violationCount = analysis.violation_count;
+            this.updateViolationDisplay();
+        }
+    }
+
+    async pollFrameResult(jobId, attempt = 0) {
+        if (attempt >= FRAME_RESULT_MAX_POLLS) return;
+
+        await new Promise(resolve => setTimeout(resolve, FRAME_RESULT_POLL_MS));
+
+        try {
+            const result = await apiCall(`/proctoring/frame/${jobId}`);
+
+            if (result.auto_submitted) {
+                this.handleAutoSubmit();
+            } else if (result.status === 'done') {
+                this.applyFrameAnalysis(result.analysis);
+                this.applyCaptureInterval(result.capture_interval);
+            } else {
+                this.pollFrameResult(jobId, attempt + 1);
+            }
         } catch (error) {
-            console.error('Frame capture failed:', error);
+            console.error('Frame result unavailable:', error);
         }
     }
 
@@ -231,31 +451,69 @@ class ExamProctor {
         }
     }
 
-    // Log violation
-    async logViolation(type, severity, details) {
+    // Log violation; events are queued and sent in batches
+    logViolation(type, severity, details) {
+        this.pendingViolations.push({
+            seq: ++this.violationSeq,
+            violation_type: type,
+            severity: severity,
+            details: JSON.stringify(details),
+            timestamp: Date.now()
+        });
+
+        if (!this.violationTimer) {
+            this.violationTimer = setTimeout(() => this.flushViolations(), VIOLATION_BATCH_DELAY_MS);
+        }
+    }
+
+    async flushViolations() {
+        clearTimeout(this.violationTimer);
+        this.violationTimer = null;
+        if (this.violationsInFlight || this.pendingViolations.length === 0) return;
+
+        // One batch at a time; events logged meanwhile go in the next one
+        const batch = this.pendingViolations.slice(0, VIOLATION_BATCH_MAX);
+        this.violationsInFlight = true;
+        let nextDelay = VIOLATION_BATCH_DELAY_MS;
+
         try {
-            const result = await apiCall('/proctoring/violation', {
+            const result = await apiCall('/proctoring/violations', {
                 method: 'POST',
                 body: JSON.stringify({
                     student_exam_id: this.studentExamId,
-                    violation_type: type,
-                    severity: severity,
-                    details: JSON.stringify(details)
+                    client_id: this.clientId,
+                    events: batch
                 })
             });
+            this.pendingViolations.splice(0, batch.length);
 
             this.violationCount = result.violation_count;
             this.updateViolationDisplay();
+            this.applyCaptureInterval(result.capture_interval);
 
             if (result.auto_submitted) {
-                alert('Exam auto-submitted due to excessive violations.');
-                window.location.href = 'results.html';
-            } else if (result.warning) {
+                this.handleAutoSubmit();
+                return;
+            } else if (result.warning && result.accepted) {
                 this.showWarning(result.warning);
             }
 
         } catch (error) {
-            console.error('Failed to log violation:', error);
+            if (error.status >= 400 && error.status < 500 && error.status !== 429) {
+                // The server refused this batch; re-sending it would only fail again
+                console.error('Violations rejected:', error);
+                this.pendingViolations.splice(0, batch.length);
+            } else {
+                // Network or server error: kept queued; a re-sent batch is not counted twice
+                console.error('Failed to log violations:', error);
+                nextDelay = VIOLATION_RETRY_MS;
+            }
+        } finally {
+            this.violationsInFlight = false;
+        }
+
+        if (this.pendingViolations.length && !this.violationTimer) {
+            this.violationTimer = setTimeout(() => this.flushViolations(), nextDelay);
         }
     }
 
@@ -294,12 +552,18 @@ class ExamProctor {
 
     // Cleanup
     stopProctoring() {
-        if (this.frameInterval) {
-            clearInterval(this.frameInterval);
-        }
+        clearTimeout(this.frameTimer);
+        this.flushViolations();
 
         if (this.stream) {
             this.stream.getTracks().forEach(track => track.stop());
+            // Late server answers must not schedule another capture
+            this.stream = null;
+        }
+
+        if (this.frameSocket) {
+            this.frameSocket.close();
+            this.frameSocket = null;
         }
 
         // Exit fullscreen
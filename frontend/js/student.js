@@ -13,13 +13,14 @@ async function loadDashboardData() {
         // Load applications
         const appsData = await apiCall('/jobs/applications');
 
-        // Load exams
-        const examsData = await apiCall('/exams');
-        const completedExams = examsData.exams.filter(e => e.attempt_status === 'evaluated');
+        // Load exams (only the total is needed for completed exams)
+        const completedData = await apiCall('/exams?status=evaluated&per_page=1');
+        const completedCount = completedData.pagination.total;
+        const upcomingExams = await apiCallAllPages('/exams?status=not_started', 'exams');
 
         // Calculate average score
         let avgScore = 0;
-        if (completedExams.length > 0) {
+        if (completedCount > 0) {
             // Would need to fetch results for each exam - simplified here
             avgScore = '-';
         }
@@ -27,14 +28,14 @@ async function loadDashboardData() {
         // Update stats
         document.getElementById('stat-courses').textContent = enrolledCourses.length;
         document.getElementById('stat-jobs').textContent = appsData.applications.length;
-        document.getElementById('stat-exams').textContent = completedExams.length;
+        document.getElementById('stat-exams').textContent = completedCount;
         document.getElementById('stat-average').textContent = avgScore;
 
         // Display courses
         displayDashboardCourses(enrolledCourses);
 
         // Display upcoming exams
-        displayUpcomingExams(examsData.exams);
+        displayUpcomingExams(upcomingExams);
 
         // Load and display jobs
         const jobsData = await apiCall('/jobs');